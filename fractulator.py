@@ -1,30 +1,380 @@
 #!/usr/bin/env python
-from sys import argv
+import asyncio
+import atexit
+import csv
+import ipaddress
+import mmap
+import os
+import re
+import signal
+import struct
+import sys
+from array import array
+from bisect import bisect_right
+from collections import OrderedDict, deque
+from concurrent.futures import ProcessPoolExecutor
+from decimal import Decimal
+from functools import lru_cache
+from itertools import groupby, islice
+from math import isfinite
+from operator import eq, ge, gt, itemgetter, le, lt, mul, neg
+from threading import Lock
+from time import perf_counter
+
+try:
+    from math import gcd as _native_gcd
+except ImportError:  # pragma: no cover
+    _native_gcd = None
+
+try:
+    import numpy
+except ImportError:  # pragma: no cover
+    numpy = None
 
 __author__ = "John Mahoney"
 
+# Dispatch gcf to the C implementation in the math module when it is available. Set to False to use the pure Python
+# engines below instead
+USE_NATIVE_GCD = _native_gcd is not None
+# Operands below this many bits take the tight machine word Euclid loop in gcf
+_WORD_BITS = 64
+
+# Operands at or above this many bits are handed to lehmer_gcf, below it plain Euclid is faster in pure Python
+LEHMER_THRESHOLD_BITS = 8192
+# Number of leading bits of each operand used for Lehmer's single precision quotient simulation
+_LEHMER_DIGIT_BITS = 62
+# Defer reducing arithmetic results to lowest terms until they are observed, see Fraction
+LAZY_REDUCTION = False
+# Under lazy reduction, results whose numerator or denominator reach this many bits are reduced immediately
+LAZY_REDUCTION_BITS = 1024
+# Output forms understood by Fraction.to_string, format_many and write_many
+FORMS = ("mixed", "improper", "decimal", "repeating")
+# Default number of digits after the decimal point for the decimal form
+DECIMAL_DIGITS = 10
+# Digit characters of expansions in bases up to 36, see Fraction.to_decimal
+_DIGIT_CHARACTERS = "0123456789abcdefghijklmnopqrstuvwxyz"
+# Fraction arithmetic results whose numerator or denominator exceed this many bits raise OverflowError, or are
+# approximated when APPROXIMATE_RESULTS is set. None for no limit. Change both with set_bit_limit
+MAX_RESULT_BITS = None
+# Replace results over MAX_RESULT_BITS with their best approximation within the limit instead of raising
+APPROXIMATE_RESULTS = False
+# Approximated powers estimated to have at most this many bits are computed exactly and rounded once, larger ones
+# are rounded after every product of binary powering
+EXACT_POWER_BITS = 1 << 20
+# Bit limit --serve applies when no --max-bits is given, so no one request can stall the server for long
+SERVER_MAX_BITS = 65536
+# Parameters of the numeric hash shared by int, float and fractions.Fraction, see Fraction.__hash__
+_HASH_MODULUS = sys.hash_info.modulus
+_HASH_INFINITY = sys.hash_info.inf
+# Exponent giving the modular inverse with pow. Negative exponents are supported from Python 3.8, before that Fermat's
+# little theorem is used, which is much slower
+try:
+    _HASH_INVERSE_EXPONENT = pow(2, -1, 3) and -1
+except ValueError:  # pragma: no cover
+    _HASH_INVERSE_EXPONENT = _HASH_MODULUS - 2
+_INFINITY = float("inf")
+# Number of terms per chunk fsum, fprod, mean and variance reduce to lowest terms at once in tree mode
+REDUCE_EVERY = 64
+
+
+class LRUCache:
+    """
+    Bounded, thread safe mapping which evicts the least recently used entry once it holds capacity entries, and
+    counts lookup hits and misses. A capacity of 0 disables the cache
+    """
+    __slots__ = ("capacity", "hits", "misses", "_entries", "_lock")
+
+    def __init__(self, capacity):
+        """
+        Build an empty cache
+
+        :param capacity: Maximum number of entries, 0 disables the cache
+        """
+        self.capacity = capacity
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = Lock()
+
+    def get(self, key):
+        """
+        Look up a key, marking it as the most recently used
+
+        :param key: Hashable key
+        :return: Cached value, or None if the key is not cached
+        """
+        if not self.capacity:
+            return None
+        with self._lock:
+            try:
+                value = self._entries[key]
+            except KeyError:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key, value):
+        """
+        Store a value, evicting the least recently used entry if the cache is full
+
+        :param key: Hashable key
+        :param value: Value to cache, cannot be None
+        :return: None
+        """
+        if not self.capacity:
+            return
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            if len(self._entries) > self.capacity:
+                self._entries.popitem(last=False)
+
+    def resize(self, capacity):
+        """
+        Change the capacity, evicting least recently used entries if the cache now holds too many
+
+        :param capacity: Maximum number of entries, 0 disables and empties the cache
+        :return: None
+        """
+        with self._lock:
+            self.capacity = capacity
+            while len(self._entries) > capacity:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        """
+        Remove every entry and reset the hit and miss counters
+
+        :return: None
+        """
+        with self._lock:
+            self._entries.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def stats(self):
+        """
+        :return: Dict of the capacity, current size, hits and misses of this cache
+        """
+        return {"capacity": self.capacity, "size": len(self._entries), "hits": self.hits, "misses": self.misses}
+
+    def __len__(self):
+        """
+        :return: Number of cached entries
+        """
+        return len(self._entries)
+
+
+# Fractions parsed by Fraction.parse, keyed by input string
+PARSE_CACHE = LRUCache(4096)
+# Results of parse_command_line, keyed by the token sequence of the expression
+RESULT_CACHE = LRUCache(4096)
+# gcf results keyed by operand pair, only used for operands below GCF_CACHE_BITS bits. Disabled by default as gcf on
+# small operands is usually cheaper than the lookup, enable it with configure_caches(gcf_size=...)
+GCF_CACHE = LRUCache(0)
+GCF_CACHE_BITS = 32
+
+
+def configure_caches(parse_size=None, result_size=None, gcf_size=None):
+    """
+    Change the capacity of the memoization caches, a capacity of 0 disables a cache
+
+    :param parse_size: Capacity of PARSE_CACHE, unchanged if None
+    :param result_size: Capacity of RESULT_CACHE, unchanged if None
+    :param gcf_size: Capacity of GCF_CACHE, unchanged if None
+    :return: None
+    """
+    for cache, size in ((PARSE_CACHE, parse_size), (RESULT_CACHE, result_size), (GCF_CACHE, gcf_size)):
+        if size is not None:
+            if size < 0:
+                raise ValueError(f"Invalid cache size: {size}")
+            cache.resize(size)
+
+
+def clear_caches():
+    """
+    Empty every memoization cache and reset its counters
+
+    :return: None
+    """
+    for cache in (PARSE_CACHE, RESULT_CACHE, GCF_CACHE):
+        cache.clear()
+    compile_expression.cache_clear()
+
+
+def cache_stats():
+    """
+    Snapshot of the size, capacity, hits and misses of every memoization cache
+
+    :return: Dict of cache name to a dict of its statistics
+    """
+    info = compile_expression.cache_info()
+    return {
+        "parse": PARSE_CACHE.stats(),
+        "result": RESULT_CACHE.stats(),
+        "gcf": GCF_CACHE.stats(),
+        "expression": {"capacity": info.maxsize, "size": info.currsize, "hits": info.hits, "misses": info.misses},
+    }
+
+
+def set_bit_limit(max_bits=None, approximate=False):
+    """
+    Limit the size of Fraction arithmetic results so one pathological expression cannot grow its operands, and the gcf
+    work on them, without bound. RESULT_CACHE is cleared as its results may have been computed under another limit
+
+    :param max_bits: Maximum bits of a result numerator or denominator, None for no limit
+    :param approximate: Replace results over the limit with their best approximation within it, see
+                        Fraction.limit_denominator, rather than raising OverflowError
+    :return: None
+    """
+    global MAX_RESULT_BITS, APPROXIMATE_RESULTS
+    if max_bits is not None and max_bits < 1:
+        raise ValueError(f"Invalid bit limit: {max_bits}")
+    MAX_RESULT_BITS = max_bits
+    APPROXIMATE_RESULTS = approximate
+    RESULT_CACHE.clear()
+
 
 def gcf(a, b):
     """
-    Determine the greatest common positive factor which a and b share
+    Determine the greatest common positive factor which a and b share. Only exact integer operations are used, so the
+    result is correct for operands of any size. Uses math.gcd when USE_NATIVE_GCD is set, otherwise word sized
+    operands take a tight Euclid loop and very large operands are dispatched to lehmer_gcf
 
     :param a: First integer
     :param b: Second integer
     :return: Greatest common factor of both integer
     """
-    if abs(a) < abs(b):
-        x = a
-        y = b
-    else:
-        x = b
-        y = a
+    if GCF_CACHE.capacity and not ((a if a >= 0 else -a) | (b if b >= 0 else -b)) >> GCF_CACHE_BITS:
+        return _cached_gcf(a, b)
+
+    if USE_NATIVE_GCD:
+        return _native_gcd(a, b)
+
+    if a < 0:
+        a = -a
+    if b < 0:
+        b = -b
+
+    if not (a | b) >> _WORD_BITS:
+        while b:
+            a, b = b, a % b
+        return a
 
-    y = y % x
+    if a < b:
+        a, b = b, a
 
-    if y == 0:
-        return abs(x)
+    if b.bit_length() >= LEHMER_THRESHOLD_BITS:
+        return lehmer_gcf(a, b)
 
-    return gcf(x, y)
+    while b:
+        a, b = b, a % b
+    return a
+
+
+def _cached_gcf(a, b):
+    """
+    gcf of two small operands, looked up in GCF_CACHE first
+
+    :param a: First integer, below GCF_CACHE_BITS bits
+    :param b: Second integer, below GCF_CACHE_BITS bits
+    :return: Greatest common factor of both integers
+    """
+    key = (a, b)
+    result = GCF_CACHE.get(key)
+    if result is None:
+        if USE_NATIVE_GCD:
+            result = _native_gcd(a, b)
+        else:
+            a = abs(a)
+            b = abs(b)
+            while b:
+                a, b = b, a % b
+            result = a
+        GCF_CACHE.put(key, result)
+    return result
+
+
+def gcf_many(values):
+    """
+    Determine the greatest common positive factor of every integer in values in a single pass, stopping early once
+    the running factor reaches 1 ( i.e. gcf_many([12, 18, 30]) returns 6 )
+
+    :param values: Iterable of integers
+    :return: Greatest common factor of all values, 0 if values is empty or all zero
+    """
+    result = 0
+    for value in values:
+        result = gcf(result, value)
+        if result == 1:
+            break
+    return result
+
+
+def binary_gcf(a, b):
+    """
+    Determine the greatest common positive factor of a and b with Stein's binary algorithm, which only uses shifts
+    and subtraction ( i.e. binary_gcf(12, 18) returns 6 )
+
+    :param a: First integer
+    :param b: Second integer
+    :return: Greatest common factor of both integers
+    """
+    a = abs(a)
+    b = abs(b)
+    if a == 0:
+        return b
+    if b == 0:
+        return a
+
+    shift = ((a | b) & -(a | b)).bit_length() - 1
+    a >>= (a & -a).bit_length() - 1
+    while b:
+        b >>= (b & -b).bit_length() - 1
+        if a > b:
+            a, b = b, a
+        b -= a
+    return a << shift
+
+
+def lehmer_gcf(a, b):
+    """
+    Determine the greatest common positive factor of a and b with Lehmer's algorithm (Knuth, TAOCP vol. 2, algorithm
+    4.5.2L). Runs of Euclid quotients are simulated on the leading bits of the operands so that most steps only touch
+    word sized integers, which is much faster than plain Euclid for multi-thousand digit operands
+
+    :param a: First integer
+    :param b: Second integer
+    :return: Greatest common factor of both integers
+    """
+    a = abs(a)
+    b = abs(b)
+    if a < b:
+        a, b = b, a
+
+    while b.bit_length() > _LEHMER_DIGIT_BITS:
+        shift = a.bit_length() - _LEHMER_DIGIT_BITS
+        x = a >> shift
+        y = b >> shift
+        A, B, C, D = 1, 0, 0, 1
+        while y + C != 0 and y + D != 0:
+            q = (x + A) // (y + C)
+            if q != (x + B) // (y + D):
+                break
+            A, C = C, A - q * C
+            B, D = D, B - q * D
+            x, y = y, x - q * y
+
+        if B == 0:
+            a, b = b, a % b
+        else:
+            a, b = A * a + B * b, C * a + D * b
+
+    while b:
+        a, b = b, a % b
+    return a
 
 
 def lcm(a, b):
@@ -35,82 +385,448 @@ def lcm(a, b):
     :param b: Second integer
     :return: Least common multiple of both integers
     """
-    return abs(int(a / gcf(a, b) * b))
+    if a == 0 or b == 0:
+        return 0
+    return abs(a // gcf(a, b) * b)
+
+
+def _canonical(numerator, denominator):
+    """
+    Reduce numerator and denominator to lowest terms with a positive denominator
+
+    :param numerator: Integer numerator
+    :param denominator: Non zero integer denominator
+    :return: Tuple of the reduced (numerator, denominator)
+    """
+    scalar = gcf(numerator, denominator)
+    if denominator < 0:
+        scalar = -scalar
+    if scalar != 1:
+        numerator //= scalar
+        denominator //= scalar
+    return numerator, denominator
+
+
+def _add_canonical(a, b, c, d):
+    """
+    Add a/b and c/d, both in lowest terms with positive denominators, into a Fraction in lowest terms. Only the gcf of
+    the denominators and of the sum with that gcf are needed, both of which are usually small
+
+    :param a: Numerator of the first fraction
+    :param b: Denominator of the first fraction
+    :param c: Numerator of the second fraction
+    :param d: Denominator of the second fraction
+    :return: Fraction a/b + c/d
+    """
+    g = gcf(b, d)
+    if g == 1:
+        return Fraction._from_canonical(a * d + b * c, b * d)
+    s = b // g
+    t = a * (d // g) + c * s
+    g2 = gcf(t, g)
+    if g2 == 1:
+        return Fraction._from_canonical(t, s * d)
+    return Fraction._from_canonical(t // g2, s * (d // g2))
+
+
+def _mul_canonical(a, b, c, d):
+    """
+    Multiply a/b and c/d, both in lowest terms with positive denominators, into a Fraction in lowest terms by
+    cancelling common factors across the operands before multiplying
+
+    :param a: Numerator of the first fraction
+    :param b: Denominator of the first fraction
+    :param c: Numerator of the second fraction
+    :param d: Denominator of the second fraction
+    :return: Fraction a/b * c/d
+    """
+    g1 = gcf(a, d)
+    if g1 > 1:
+        a //= g1
+        d //= g1
+    g2 = gcf(c, b)
+    if g2 > 1:
+        c //= g2
+        b //= g2
+    return Fraction._from_canonical(a * c, b * d)
+
+
+def _add_int(fraction, n, sign=1):
+    """
+    Add the integer n to a fraction a/b, or to -a/b when sign is -1. As gcf(a + n * b, b) = gcf(a, b) the sum of a
+    fraction in lowest terms is already in lowest terms, so no gcf is needed at all
+
+    :param fraction: Fraction instance
+    :param n: Integer to add
+    :param sign: 1, or -1 to negate the fraction first
+    :return: Fraction sign * fraction + n
+    """
+    numerator = sign * fraction._numerator + n * fraction._denominator
+    if fraction._reduced:
+        return Fraction._from_canonical(numerator, fraction._denominator)
+    return Fraction._from_parts(numerator, fraction._denominator)
+
+
+def _mul_int(numerator, denominator, reduced, n):
+    """
+    Multiply numerator/denominator by the integer n. Only n and the denominator can share a factor, so a fraction in
+    lowest terms needs a single gcf instead of the two _mul_canonical takes
+
+    :param numerator: Integer numerator
+    :param denominator: Positive integer denominator
+    :param reduced: True if numerator/denominator is in lowest terms, otherwise the product is stored unreduced
+    :param n: Integer to multiply by
+    :return: Fraction numerator/denominator * n
+    """
+    if not reduced:
+        return Fraction._from_parts(numerator * n, denominator)
+    g = gcf(n, denominator)
+    if g > 1:
+        n //= g
+        denominator //= g
+    return Fraction._from_canonical(numerator * n, denominator)
+
+
+def _div_int(numerator, denominator, reduced, n):
+    """
+    Divide numerator/denominator by the non zero integer n. Only n and the numerator can share a factor, so a fraction
+    in lowest terms needs a single gcf
+
+    :param numerator: Integer numerator
+    :param denominator: Positive integer denominator
+    :param reduced: True if numerator/denominator is in lowest terms, otherwise the quotient is stored unreduced
+    :param n: Non zero integer to divide by
+    :return: Fraction numerator/denominator / n
+    """
+    if n < 0:
+        numerator, n = -numerator, -n
+    if not reduced:
+        return Fraction._from_parts(numerator, denominator * n)
+    g = gcf(numerator, n)
+    if g > 1:
+        numerator //= g
+        n //= g
+    return Fraction._from_canonical(numerator, denominator * n)
+
+
+def _compare_inexact(fraction, other, compare):
+    """
+    Compare a fraction against a float or Decimal. Finite values are converted to fractions exactly, so the comparison
+    is exact, infinities and nan compare like they would against any finite float
+
+    :param fraction: Fraction instance
+    :param other: Value to compare against
+    :param compare: Comparison function from the operator module
+    :return: Boolean result of compare(fraction, other), NotImplemented if other is not a float or Decimal
+    """
+    if isinstance(other, float):
+        if not isfinite(other):
+            return compare(0.0, other)
+        return compare(fraction, Fraction.from_float(other))
+    if isinstance(other, Decimal):
+        if not other.is_finite():
+            return compare(0.0, float(other))
+        return compare(fraction, Fraction.from_decimal(other))
+    return NotImplemented
+
+
+def _closest_fraction(numerator, denominator, max_denominator, max_numerator=None):
+    """
+    Find the closest fraction to numerator/denominator with a denominator of at most max_denominator and, if given, a
+    numerator of at most max_numerator in magnitude. The continued fraction expansion is followed while both bounds
+    hold, leaving the two fractions either side of the value with no fraction within the bounds between them
+
+    :param numerator: Numerator of the value
+    :param denominator: Positive denominator of the value
+    :param max_denominator: Largest allowed denominator, at least 1
+    :param max_numerator: Largest allowed numerator magnitude, None for no bound
+    :return: Tuple of (numerator, denominator) in lowest terms, None if the value is too large for any fraction to fit
+    """
+    negative = numerator < 0
+    magnitude = -numerator if negative else numerator
+    n, d = magnitude, denominator
+    p0, q0, p1, q1 = 0, 1, 1, 0
+    while True:
+        a = n // d
+        p2, q2 = p0 + a * p1, q0 + a * q1
+        if q2 > max_denominator or (max_numerator is not None and p2 > max_numerator):
+            break
+        p0, q0, p1, q1 = p1, q1, p2, q2
+        n, d = d, n - a * d
+        if not d:
+            return (-p1 if negative else p1), q1
+    if not q1:
+        return None
+
+    k = (max_denominator - q0) // q1
+    if max_numerator is not None and p1:
+        k = min(k, (max_numerator - p0) // p1)
+    p0, q0 = p0 + k * p1, q0 + k * q1
+    if abs(p1 * denominator - magnitude * q1) * q0 > abs(p0 * denominator - magnitude * q0) * q1:
+        p1, q1 = p0, q0
+    return (-p1 if negative else p1), q1
+
+
+def _bounded_power(base, exponent):
+    """
+    Raise base to a positive exponent for powers which may exceed MAX_RESULT_BITS. The exact power is rounded once
+    when its size estimate is within EXACT_POWER_BITS, otherwise binary powering applies the bit limit to every
+    product and rounding errors compound, so the result is only approximately the closest fraction within the limit.
+    Raises OverflowError early rather than computing a result to be rejected
+
+    :param base: Fraction base in lowest terms
+    :param exponent: Positive integer exponent
+    :return: base ** exponent, approximated when APPROXIMATE_RESULTS is set
+    """
+    if not APPROXIMATE_RESULTS:
+        raise OverflowError(f"Result exceeds the {MAX_RESULT_BITS} bit limit")
+    if max(base._numerator.bit_length(), base._denominator.bit_length()) * exponent <= EXACT_POWER_BITS:
+        return _bound_result(Fraction._from_canonical(base._numerator ** exponent, base._denominator ** exponent))
+    result = Fraction._from_canonical(1, 1)
+    while exponent:
+        if exponent & 1:
+            result = result * base
+        exponent >>= 1
+        if exponent:
+            base = base * base
+    return result
+
+
+def _bound_result(result):
+    """
+    Apply the MAX_RESULT_BITS limit to an arithmetic result
+
+    :param result: Fraction result of an arithmetic operator
+    :return: result, or its best approximation within the limit when APPROXIMATE_RESULTS is set
+    """
+    if (
+        result._numerator.bit_length() <= MAX_RESULT_BITS
+        and result._denominator.bit_length() <= MAX_RESULT_BITS
+    ):
+        return result
+    result.simplify()
+    if result._numerator.bit_length() <= MAX_RESULT_BITS and result._denominator.bit_length() <= MAX_RESULT_BITS:
+        return result
+    if APPROXIMATE_RESULTS:
+        largest = (1 << MAX_RESULT_BITS) - 1
+        closest = _closest_fraction(result._numerator, result._denominator, largest, largest)
+        if closest is not None:
+            return Fraction._from_canonical(*closest)
+        raise OverflowError(f"Result magnitude exceeds the {MAX_RESULT_BITS} bit limit")
+    raise OverflowError(f"Result exceeds the {MAX_RESULT_BITS} bit limit")
+
+
+def _float_value(numerator, denominator):
+    """
+    Nearest float to a fraction, infinite when out of float range
+
+    :param numerator: Integer numerator
+    :param denominator: Positive integer denominator
+    :return: float
+    """
+    try:
+        return numerator / denominator
+    except OverflowError:
+        return _INFINITY if numerator > 0 else -_INFINITY
 
 
 class Fraction:
     """
-    Class which contains all of the logic for parsing, printing, manipulation, and arithmetic of fractions
+    Class which contains all of the logic for parsing, printing, manipulation, and arithmetic of fractions.
+    Fractions are immutable and always observed in lowest terms with a positive denominator. When LAZY_REDUCTION is
+    enabled the reduction of arithmetic results is deferred until the value is observed, or until the numerator or
+    denominator grows past LAZY_REDUCTION_BITS
     """
-    def __init__(self, numerator, denominator=1, simplify=False):
+    __slots__ = ("_numerator", "_denominator", "_reduced")
+
+    def __init__(self, numerator, denominator=1, simplify=True):
         """
         Build a fraction from the given numerator and (optional) denominator.
 
         :param numerator: Numerator of fraction
         :param denominator: Denominator of fraction (optional), if not specified defaults to 1. Cannot be zero
-        :param simplify: Boolean specifying if you wish for this fraction to be simplified in initialization
+        :param simplify: Kept for backwards compatibility, fractions are always kept in lowest terms
         """
-        self.numerator = int(numerator)
-        self.denominator = int(denominator)
-        if self.denominator == 0:
+        numerator = int(numerator)
+        denominator = int(denominator)
+        if denominator == 0:
             raise ZeroDivisionError("Cannot have 0 as a denominator.")
-        if simplify:
+        self._store(numerator, denominator)
+
+    @classmethod
+    def _from_parts(cls, numerator, denominator):
+        """
+        Build a fraction from integers already known to be valid, skipping conversion and the zero check. Used by the
+        arithmetic operators to avoid the overhead of __init__
+
+        :param numerator: Integer numerator
+        :param denominator: Non zero integer denominator
+        :return: New Fraction instance
+        """
+        result = object.__new__(cls)
+        result._store(numerator, denominator)
+        return result
+
+    def _store(self, numerator, denominator):
+        """
+        Store the given numerator and denominator, reducing them now unless lazy reduction allows it to be deferred
+
+        :param numerator: Integer numerator
+        :param denominator: Non zero integer denominator
+        :return: None
+        """
+        if (
+            LAZY_REDUCTION
+            and numerator.bit_length() < LAZY_REDUCTION_BITS
+            and denominator.bit_length() < LAZY_REDUCTION_BITS
+        ):
+            if denominator < 0:
+                numerator = -numerator
+                denominator = -denominator
+            self._reduced = False
+        else:
+            numerator, denominator = _canonical(numerator, denominator)
+            self._reduced = True
+        self._numerator = numerator
+        self._denominator = denominator
+
+    @classmethod
+    def _from_canonical(cls, numerator, denominator):
+        """
+        Build a fraction from a numerator and positive denominator already known to be in lowest terms
+
+        :param numerator: Integer numerator
+        :param denominator: Positive integer denominator, coprime to numerator
+        :return: New Fraction instance
+        """
+        result = object.__new__(cls)
+        result._numerator = numerator
+        result._denominator = denominator
+        result._reduced = True
+        return result
+
+    @classmethod
+    def from_float(cls, value):
+        """
+        Build the fraction exactly equal to a float, from its binary representation: the mantissa over a power of two,
+        which is always in lowest terms ( i.e. 0.75 returns 3/4, 0.1 returns 3602879701896397/36028797018963968 ).
+        Use limit_denominator to find the simplest nearby fraction instead
+
+        :param value: Finite float, or int
+        :return: New Fraction instance
+        """
+        if isinstance(value, int):
+            return cls._from_canonical(value, 1)
+        if not isinstance(value, float):
+            raise TypeError(f"Expected a float, not {type(value).__name__}")
+        if not isfinite(value):
+            raise ValueError(f"Cannot convert {value} to a Fraction")
+        return cls._from_canonical(*value.as_integer_ratio())
+
+    @classmethod
+    def from_decimal(cls, value):
+        """
+        Build the fraction exactly equal to a Decimal, from its coefficient and power of ten exponent reduced to lowest
+        terms ( i.e. Decimal("1.25") returns 5/4 )
+
+        :param value: Finite decimal.Decimal, or int
+        :return: New Fraction instance
+        """
+        if isinstance(value, int):
+            return cls._from_canonical(value, 1)
+        if not isinstance(value, Decimal):
+            raise TypeError(f"Expected a Decimal, not {type(value).__name__}")
+        if not value.is_finite():
+            raise ValueError(f"Cannot convert {value} to a Fraction")
+        return cls._from_canonical(*value.as_integer_ratio())
+
+    @property
+    def numerator(self):
+        """
+        Numerator of this fraction in lowest terms, carries the sign of the fraction
+        """
+        if not self._reduced:
+            self.simplify()
+        return self._numerator
+
+    @property
+    def denominator(self):
+        """
+        Denominator of this fraction in lowest terms, always positive
+        """
+        if not self._reduced:
             self.simplify()
+        return self._denominator
 
     def simplify(self):
         """
-        Function which simplifies this fraction to it's lowest terms ( i.e. 6/4 -> 3/2 )
+        Function which performs any reduction to lowest terms deferred by lazy reduction. The value of the fraction
+        never changes, only its internal representation ( i.e. a lazily stored 6/4 -> 3/2 )
 
         :return: None
         """
-        self_simplified = self.simplified()
-        self.numerator = self_simplified.numerator
-        self.denominator = self_simplified.denominator
+        if not self._reduced:
+            self._numerator, self._denominator = _canonical(self._numerator, self._denominator)
+            self._reduced = True
 
     def simplified(self):
         """
-        Function which returns the simplified version of this fraction ( i.e. 6/4 returns 3/2 )
+        Function which returns the simplified version of this fraction ( i.e. 6/4 returns 3/2 ). As fractions are
+        immutable and kept in lowest terms this is the fraction itself
 
         :return: Simplified instance of this Fraction
         """
-        scalar = gcf(self.numerator, self.denominator)
-        numerator = int(self.numerator / scalar)
-        denominator = int(self.denominator / scalar)
-        if denominator < 0:
-            numerator *= -1
-            denominator *= -1
-        return Fraction(numerator, denominator)
+        self.simplify()
+        return self
 
     def scale(self, scalar):
         """
-        Function used to scale fraction for comparison in addition and subtraction operations
+        Function used to scale fraction for comparison in addition and subtraction operations. Kept for backwards
+        compatibility, the result is reduced so it is equal to this fraction
 
         :param scalar: Amount to multiply both the numerator and denominator by
-        :return: Scaled instance of this fraction ( i.e. Fraction(3, 2).scale(3) -> Fraction(9, 6) )
+        :return: Scaled instance of this fraction ( i.e. Fraction(3, 2).scale(3) -> Fraction(3, 2) )
         """
-        return Fraction(self.numerator * scalar, self.denominator * scalar)
+        return Fraction(self._numerator * scalar, self._denominator * scalar)
 
     def inverse(self, simplify=False):
         """
         Returns the inverse of this fraction for use in division operations
 
-        :param simplify: Should the inverted fraction be simplified ( i.e. 6/4 -> 2/3 )
-        :return: Inverse of this fraction ( i.e. 6/4 returns 4/6)
+        :param simplify: Kept for backwards compatibility, the inverse is always in lowest terms
+        :return: Inverse of this fraction ( i.e. 6/4 returns 2/3)
+        """
+        if self._numerator == 0:
+            raise ZeroDivisionError("Cannot have 0 as a denominator.")
+        return Fraction._from_parts(self._denominator, self._numerator)
+
+    def limit_denominator(self, max_denominator):
+        """
+        Find the closest fraction to this one with a denominator of at most max_denominator, from the convergents and
+        semiconvergents of its continued fraction expansion ( i.e. 355/113 limited to 100 returns 311/99 )
+
+        :param max_denominator: Largest allowed denominator, at least 1
+        :return: Closest Fraction with a denominator of at most max_denominator, this fraction if it already fits
         """
-        return Fraction(self.denominator, self.numerator, simplify=simplify)
+        if max_denominator < 1:
+            raise ValueError("max_denominator should be at least 1")
+        if self.denominator <= max_denominator:
+            return self
+        return Fraction._from_canonical(*_closest_fraction(self._numerator, self._denominator, max_denominator))
 
     def normalize(self, other):
         """
         Return a normalized pair where both denominators are equal to support addition, subtraction, and comparison
-        ( i.e. Fraction(2, 3).normalize(Fraction(3, 5)) returns ( Fraction(10, 15), Fraction(9, 15) )
+        ( i.e. Fraction(2, 3).normalize(Fraction(3, 5)) returns ( Fraction(10, 15), Fraction(9, 15) ). Kept for
+        backwards compatibility, the returned fractions are reduced so they are equal to self and other
 
         :param other: The other fraction to normalize against
         :return: Normalized pair of fractions with matching denominators
         """
         if not self.is_normalized(other):
             lcm_denominator = lcm(self.denominator, other.denominator)
-            self_scale = lcm_denominator / self.denominator
-            other_scale = lcm_denominator / other.denominator
+            self_scale = lcm_denominator // self.denominator
+            other_scale = lcm_denominator // other.denominator
             return self.scale(self_scale), other.scale(other_scale)
         return self, other
 
@@ -125,208 +841,3714 @@ class Fraction:
 
     def __add__(self, other):
         """
-        Addition operator between two fractions, will normalize before addition and simplify after
+        Addition operator between this and other fraction or integer. Uses the gcf of the two denominators rather than
+        their full lcm, so only the small remaining factor needs reducing afterwards (Knuth, TAOCP vol. 2, 4.5.1).
+        Adding an integer needs no gcf at all
 
-        :param other: Other fraction instance to add
+        :param other: Other fraction or int to add
         :return: Fraction instance of self added to other ( i.e. 4/3 + 1/6 = 9/6 )
         """
-        self_scaled, other_scaled = self.normalize(other)
-        return Fraction(
-            self_scaled.numerator + other_scaled.numerator,
-            self_scaled.denominator,
-            simplify=True,
-        )
+        if isinstance(other, Fraction):
+            if LAZY_REDUCTION:
+                result = Fraction._from_parts(
+                    self._numerator * other._denominator + other._numerator * self._denominator,
+                    self._denominator * other._denominator,
+                )
+            else:
+                result = _add_canonical(self.numerator, self.denominator, other.numerator, other.denominator)
+        elif isinstance(other, int):
+            result = _add_int(self, other)
+        else:
+            return NotImplemented
+        return result if MAX_RESULT_BITS is None else _bound_result(result)
+
+    __radd__ = __add__
 
     def __sub__(self, other):
         """
-        Subtraction operator between two fractions, will normalize before subtraction and simplify after
+        Subtraction operator between this and other fraction or integer, computed like addition with the other
+        numerator negated
 
-        :param other: Other fraction instance to subtract
+        :param other: Other fraction or int to subtract
         :return: Fraction instance of other subtracted from self ( i.e. 4/3 - 1/6 = 7/6 )
         """
-        self_scaled, other_scaled = self.normalize(other)
-        return Fraction(
-            self_scaled.numerator - other_scaled.numerator,
-            self_scaled.denominator,
-            simplify=True,
-        )
+        if isinstance(other, Fraction):
+            if LAZY_REDUCTION:
+                result = Fraction._from_parts(
+                    self._numerator * other._denominator - other._numerator * self._denominator,
+                    self._denominator * other._denominator,
+                )
+            else:
+                result = _add_canonical(self.numerator, self.denominator, -other.numerator, other.denominator)
+        elif isinstance(other, int):
+            result = _add_int(self, -other)
+        else:
+            return NotImplemented
+        return result if MAX_RESULT_BITS is None else _bound_result(result)
+
+    def __rsub__(self, other):
+        """
+        Reflected subtraction, an integer minus this fraction
+
+        :param other: Integer to subtract from
+        :return: Fraction instance of self subtracted from other ( i.e. 1 - 1/3 = 2/3 )
+        """
+        if not isinstance(other, int):
+            return NotImplemented
+        result = _add_int(self, other, -1)
+        return result if MAX_RESULT_BITS is None else _bound_result(result)
 
     def __mul__(self, other):
         """
-        Multiplication operator between two fractions, will simplify after multiplication
+        Multiplication operator between this and other fraction or integer. Common factors are cancelled across the
+        operands before multiplying, so the products are already in lowest terms
 
-        :param other: Other fraction instance to multiply
+        :param other: Other fraction or int to multiply
         :return: Fraction instance of other multiplied by self ( i.e. 2/3 * 5/10 = 1/3 )
         """
-        return Fraction(
-            self.numerator * other.numerator,
-            self.denominator * other.denominator,
-            simplify=True,
-        )
+        if isinstance(other, Fraction):
+            if LAZY_REDUCTION:
+                result = Fraction._from_parts(
+                    self._numerator * other._numerator,
+                    self._denominator * other._denominator,
+                )
+            else:
+                result = _mul_canonical(self.numerator, self.denominator, other.numerator, other.denominator)
+        elif isinstance(other, int):
+            result = _mul_int(self._numerator, self._denominator, self._reduced, other)
+        else:
+            return NotImplemented
+        return result if MAX_RESULT_BITS is None else _bound_result(result)
+
+    __rmul__ = __mul__
 
     def __truediv__(self, other):
         """
-        Division operator between two fractions, will simplify after division
+        Division operator between this and other fraction or integer, multiplies by the inverse of other without
+        building it
 
-        :param other: Other fraction instance to divide by
+        :param other: Other fraction or int to divide by
         :return: Fraction instance of self divided by other ( i.e. 2/3 / 1/2 = 4/3 )
         """
-        return self * other.inverse()
+        if isinstance(other, Fraction):
+            if other._numerator == 0:
+                raise ZeroDivisionError("Cannot have 0 as a denominator.")
+            if LAZY_REDUCTION:
+                result = Fraction._from_parts(
+                    self._numerator * other._denominator,
+                    self._denominator * other._numerator,
+                )
+            elif other.numerator < 0:
+                result = _mul_canonical(self.numerator, self.denominator, -other.denominator, -other.numerator)
+            else:
+                result = _mul_canonical(self.numerator, self.denominator, other.denominator, other.numerator)
+        elif isinstance(other, int):
+            if other == 0:
+                raise ZeroDivisionError("Cannot have 0 as a denominator.")
+            result = _div_int(self._numerator, self._denominator, self._reduced, other)
+        else:
+            return NotImplemented
+        return result if MAX_RESULT_BITS is None else _bound_result(result)
 
-    def __eq__(self, other):
+    def __rtruediv__(self, other):
         """
-        Equality comparator between this and other fraction, will normalize before comparison
+        Reflected division, an integer divided by this fraction. n / (a/b) is n * b/a, so only n and a can share a
+        factor
 
-        :param other: Other fraction to compare for equality
-        :return: Boolean specifying equality between self and other ( i.e. 2/3 == 1/2 -> False, 2/3 == 4/6 -> True )
+        :param other: Integer to divide
+        :return: Fraction instance of other divided by self ( i.e. 2 / 4/3 = 3/2 )
         """
-        if not self.is_normalized(other):
-            self_normalized, other_normalized = self.normalize(other)
-            return self_normalized == other_normalized
+        if not isinstance(other, int):
+            return NotImplemented
+        if self._numerator == 0:
+            raise ZeroDivisionError("Cannot have 0 as a denominator.")
+        if self._numerator < 0:
+            result = _mul_int(-self._denominator, -self._numerator, self._reduced, other)
+        else:
+            result = _mul_int(self._denominator, self._numerator, self._reduced, other)
+        return result if MAX_RESULT_BITS is None else _bound_result(result)
 
-        return self.numerator == other.numerator
+    def __neg__(self):
+        """
+        Negation operator
 
-    def __str__(self):
+        :return: Fraction instance of self negated ( i.e. -(2/3) = -2/3 )
         """
-        Stringify this fraction.
-        Fractions simplifying to whole numbers will be displayed as only the whole number: 4/2 -> 2
-        Proper fractions will display as such: 2/4 -> 2/4
-        Improper fractions will be displayed as mixed numbers: 5/2 -> 2_1/2
+        return Fraction._from_canonical(-self.numerator, self.denominator)
 
-        :return: Stringified version of self
+    def __pow__(self, other):
+        """
+        Power operator with a whole number exponent. As the numerator and denominator are coprime so are their powers,
+        which are found by exact binary powering without any reduction
+
+        :param other: Whole number exponent, an int or a Fraction with a denominator of 1
+        :return: Fraction instance of self raised to other ( i.e. 2/3 ** 2 = 4/9, 2/3 ** -1 = 3/2 )
         """
-        if self.numerator == 0:
-            return "0"
-        if abs(self.numerator) >= abs(self.denominator):
-            whole_part = int(self.numerator / self.denominator)
-            numerator = self.numerator - (whole_part * self.denominator)
+        if isinstance(other, Fraction):
+            if other.denominator != 1:
+                raise ValueError(f"Exponent must be a whole number, not {other}")
+            exponent = other.numerator
+        elif isinstance(other, int):
+            exponent = other
+        else:
+            return NotImplemented
+        numerator = self.numerator
+        denominator = self.denominator
+        if exponent < 0:
             if numerator == 0:
-                return str(whole_part)
-            if whole_part < 0 and numerator < 0:
-                numerator *= -1
-            return f"{whole_part}_{numerator}/{self.denominator}"
+                raise ZeroDivisionError("Cannot have 0 as a denominator.")
+            numerator, denominator, exponent = denominator, numerator, -exponent
+            if denominator < 0:
+                numerator, denominator = -numerator, -denominator
+        if MAX_RESULT_BITS is None:
+            return Fraction._from_canonical(numerator ** exponent, denominator ** exponent)
+        # A power of a b bit integer has more than (b - 1) * exponent bits, so this result is certain to be too large
+        if (max(numerator.bit_length(), denominator.bit_length()) - 1) * exponent >= MAX_RESULT_BITS:
+            return _bounded_power(Fraction._from_canonical(numerator, denominator), exponent)
+        return _bound_result(Fraction._from_canonical(numerator ** exponent, denominator ** exponent))
 
-        return f"{self.numerator}/{self.denominator}"
+    def __rpow__(self, other):
+        """
+        Reflected power, an integer raised to this fraction, which must be a whole number
 
-    def __repr__(self):   # pragma: no cover
+        :param other: Integer base
+        :return: Fraction instance of other raised to self ( i.e. 2 ** -1 = 1/2 )
         """
-        Copy of str, for use in debugger etc.
+        if not isinstance(other, int):
+            return NotImplemented
+        return Fraction._from_canonical(other, 1) ** self
 
-        :return: Stringified version of self
+    def __eq__(self, other):
         """
-        return str(self)
+        Equality comparator between this and other fraction or integer. Fractions in lowest terms are equal exactly
+        when their numerators and denominators are, otherwise the values are cross multiplied. No fractions are
+        built. Finite floats and Decimals compare equal to the fraction of exactly the same value, see from_float
 
-    @classmethod
-    def parse(cls, input_str):
+        :param other: Other fraction, int, float or Decimal to compare for equality
+        :return: Boolean specifying equality between self and other ( i.e. 2/3 == 1/2 -> False, 2/3 == 4/6 -> True )
         """
-        Parse a string from the command line into a fraction. Will simplify the input value
-        For whole numbers: 3 -> 3/1
-        For proper/improper fractions: 4/5 -> 4/5
-        For mixed numbers: 2_1/3 -> 7/3
+        if isinstance(other, Fraction):
+            if self._reduced and other._reduced:
+                return self._numerator == other._numerator and self._denominator == other._denominator
+            return self._numerator * other._denominator == other._numerator * self._denominator
+        if isinstance(other, int):
+            return self._numerator == other * self._denominator
+        return _compare_inexact(self, other, eq)
 
-        :param input_str: Input from command line to parse as fraction
-        :return: Constructed, simplified Fraction instance
+    def __lt__(self, other):
         """
-        parsed = input_str.split("_")
-        whole = 0
-        if len(parsed) == 2:
-            try:
-                whole = int(parsed[0])
-            except ValueError:
-                raise ValueError(f"Invalid fraction input: {input_str}")
-            fraction = parsed[1]
-        elif len(parsed) != 1:
-            raise ValueError(f"Invalid fraction input: {input_str}")
-        else:
-            fraction = input_str
+        Less than comparator between this and other fraction or integer, by cross multiplication as both denominators
+        are positive ( i.e. a/b < c/d exactly when a * d < c * b ). No fractions are built. Floats and Decimals are
+        converted exactly, so 1/10 < 0.1 as the float is slightly larger than a tenth
 
-        fraction_parsed = fraction.split("/")
-        if len(fraction_parsed) == 1:
-            try:
-                whole = int(fraction_parsed[0])
-            except ValueError:
-                raise ValueError(f"Invalid fraction input: {input_str}")
-            return cls(whole)
+        :param other: Other fraction, int, float or Decimal to compare to
+        :return: Boolean specifying if self is less than other ( i.e. 1/3 < 1/2 -> True )
+        """
+        if isinstance(other, Fraction):
+            return self._numerator * other._denominator < other._numerator * self._denominator
+        if isinstance(other, int):
+            return self._numerator < other * self._denominator
+        return _compare_inexact(self, other, lt)
 
-        try:
-            denominator = int(fraction_parsed[1])
-            numerator = int(fraction_parsed[0])
-        except ValueError:
-            raise ValueError(f"Invalid fraction input: {input_str}")
+    def __le__(self, other):
+        """
+        Less than or equal comparator, see __lt__
 
-        return_fraction = Fraction(numerator, denominator, simplify=True)
-        if return_fraction.numerator < 0 and whole != 0:
-            raise ValueError(
-                f"Invalid fraction input: {input_str}: Please input negative mixed fractions with the "
-                "minus sign at the beginning to reduce ambiguity "
-                f"(i.e. -{abs(whole)}_{abs(numerator)}/{abs(denominator)})"
-            )
+        :param other: Other fraction, int, float or Decimal to compare to
+        :return: Boolean specifying if self is less than or equal to other
+        """
+        if isinstance(other, Fraction):
+            return self._numerator * other._denominator <= other._numerator * self._denominator
+        if isinstance(other, int):
+            return self._numerator <= other * self._denominator
+        return _compare_inexact(self, other, le)
+
+    def __gt__(self, other):
+        """
+        Greater than comparator, see __lt__
+
+        :param other: Other fraction, int, float or Decimal to compare to
+        :return: Boolean specifying if self is greater than other
+        """
+        if isinstance(other, Fraction):
+            return self._numerator * other._denominator > other._numerator * self._denominator
+        if isinstance(other, int):
+            return self._numerator > other * self._denominator
+        return _compare_inexact(self, other, gt)
+
+    def __ge__(self, other):
+        """
+        Greater than or equal comparator, see __lt__
+
+        :param other: Other fraction, int, float or Decimal to compare to
+        :return: Boolean specifying if self is greater than or equal to other
+        """
+        if isinstance(other, Fraction):
+            return self._numerator * other._denominator >= other._numerator * self._denominator
+        if isinstance(other, int):
+            return self._numerator >= other * self._denominator
+        return _compare_inexact(self, other, ge)
+
+    def __hash__(self):
+        """
+        Hash of this fraction, equal to the hash of the equal int or fractions.Fraction so they can be mixed as dict
+        keys and set members. Follows the numeric hash of the Python documentation: the numerator times the inverse of
+        the denominator modulo sys.hash_info.modulus, a prime
+
+        :return: Integer hash
+        """
+        numerator = self.numerator
+        denominator = self.denominator
+        if denominator == 1:
+            return hash(numerator)
+        if not denominator % _HASH_MODULUS:
+            result = _HASH_INFINITY
+        else:
+            result = hash(hash(abs(numerator)) * pow(denominator, _HASH_INVERSE_EXPONENT, _HASH_MODULUS))
+        if numerator < 0:
+            result = -result
+        return -2 if result == -1 else result
+
+    def sort_key(self):
+        """
+        Key for sorted, heapq and bisect which orders exactly like the fraction itself but mostly compares as a float.
+        The float is the correctly rounded value, and rounding never reverses order, so the fraction itself is only
+        compared to break ties between equal floats ( i.e. sorted(fractions, key=Fraction.sort_key) )
+
+        :return: Tuple of the nearest float and this fraction
+        """
+        return _float_value(self._numerator, self._denominator), self
+
+    @classmethod
+    def sort_many(cls, fractions, reverse=False, unique=False):
+        """
+        Sort fractions by their nearest float, then sort each run of equal floats exactly. Much faster than sorting on
+        exact comparisons as almost every comparison is a float comparison
+
+        :param fractions: Iterable of Fraction instances
+        :param reverse: Sort in descending order
+        :param unique: Keep only the first of each run of equal fractions
+        :return: Sorted list of fractions
+        """
+        keyed = [(_float_value(fraction._numerator, fraction._denominator), fraction) for fraction in fractions]
+        keyed.sort(key=itemgetter(0), reverse=reverse)
+        result = []
+        for _, run in groupby(keyed, itemgetter(0)):
+            run = [fraction for _, fraction in run]
+            if len(run) > 1:
+                run.sort(reverse=reverse)
+                if unique:
+                    run = [fraction for index, fraction in enumerate(run) if not index or fraction != run[index - 1]]
+            result.extend(run)
+        return result
+
+    def __reduce__(self):
+        """
+        Pickle support, a fraction is rebuilt from its numerator and denominator
+
+        :return: Tuple of the constructor and its arguments
+        """
+        return Fraction, (self.numerator, self.denominator)
+
+    def __str__(self):
+        """
+        Stringify this fraction.
+        Fractions simplifying to whole numbers will be displayed as only the whole number: 4/2 -> 2
+        Proper fractions will display as such: 2/4 -> 2/4
+        Improper fractions will be displayed as mixed numbers: 5/2 -> 2_1/2
+        The whole part is found with exact integer division, so this is correct for values of any size
+
+        :return: Stringified version of self
+        """
+        return _mixed_string(self.numerator, self.denominator, 0)
+
+    def to_string(self, form="mixed", digits=DECIMAL_DIGITS):
+        """
+        Stringify this fraction in the given form
+        mixed: as __str__, 7/3 -> 2_1/3
+        improper: 7/3 -> 7/3
+        decimal: rounded to digits places, 7/3 -> 2.3333333333
+        repeating: exact, with the repeating digits in parentheses, 7/3 -> 2.(3)
+
+        :param form: One of FORMS
+        :param digits: Number of digits after the decimal point for the decimal form
+        :return: Stringified version of self
+        """
+        return fraction_formatter(form, digits)(self)
+
+    def decimal_digits(self, base=10):
+        """
+        Lazily generate the digits after the radix point of the absolute value of this fraction by long division,
+        stopping if the expansion terminates ( i.e. 3/8 yields 3, 7, 5 and 1/7 yields 1, 4, 2, 8, 5, 7, 1, ... without
+        end ). Only the remainder, which is smaller than the denominator, is kept between digits. The whole part is
+        abs(numerator) // denominator
+
+        :param base: Base of the expansion, from 2 to 36
+        :return: Generator of integer digits
+        """
+        _check_base(base)
+        return _expansion_digits(abs(self.numerator) % self.denominator, self.denominator, base)
+
+    def continued_fraction(self):
+        """
+        Lazily generate the terms of the continued fraction of this fraction by Euclid's algorithm ( i.e. 415/93
+        yields 4, 2, 6, 7 as 415/93 = 4 + 1/(2 + 1/(6 + 1/7)) ). The first term is the floor of the fraction, every
+        later term is positive
+
+        :return: Generator of integer terms
+        """
+        return _continued_fraction_terms(self.numerator, self.denominator)
+
+    def to_decimal(self, n_digits=None, base=10):
+        """
+        Expansion of this fraction as a string. With n_digits the expansion is truncated to at most that many digits
+        after the point, stopping early if it terminates ( i.e. 1/3 to 5 digits is 0.33333, 1/4 is 0.25 ), so only
+        n_digits long division steps are needed whatever the size of the fraction. Without n_digits the exact
+        expansion is written with its repeating digits in parentheses ( i.e. 1/7 is 0.(142857), -1/6 is -0.1(6) ),
+        which takes time and memory proportional to the length of the period
+
+        :param n_digits: Number of digits after the point (optional), if not specified the exact repeating form
+        :param base: Base of the expansion, from 2 to 36
+        :return: String expansion
+        """
+        _check_base(base)
+        numerator = self.numerator
+        denominator = self.denominator
+        if n_digits is None:
+            return _repeating_string(numerator, denominator, 0, base)
+        if n_digits < 0:
+            raise ValueError(f"Invalid number of digits: {n_digits}")
+        whole, remainder = divmod(abs(numerator), denominator)
+        text = ("-" if numerator < 0 else "") + _whole_string(whole, base)
+        digits = "".join(
+            _DIGIT_CHARACTERS[digit] for digit in islice(_expansion_digits(remainder, denominator, base), n_digits)
+        )
+        return f"{text}.{digits}" if digits else text
+
+    def __repr__(self):   # pragma: no cover
+        """
+        Copy of str, for use in debugger etc.
+
+        :return: Stringified version of self
+        """
+        return str(self)
+
+    @classmethod
+    def parse(cls, input_str):
+        """
+        Parse a string from the command line into a fraction. Will simplify the input value
+        For whole numbers: 3 -> 3/1
+        For proper/improper fractions: 4/5 -> 4/5
+        For mixed numbers: 2_1/3 -> 7/3
+        Parsed fractions are kept in PARSE_CACHE, so repeated inputs are only scanned once
+
+        :param input_str: Input from command line to parse as fraction
+        :return: Constructed, simplified Fraction instance
+        """
+        if cls is not Fraction:
+            return cls._from_canonical(*_scan_fraction(input_str, "_", "/"))
+        result = PARSE_CACHE.get(input_str)
+        if result is None:
+            result = Fraction._from_canonical(*_scan_fraction(input_str, "_", "/"))
+            PARSE_CACHE.put(input_str, result)
+        return result
+
+    @classmethod
+    def parse_many(cls, input_strs):
+        """
+        Parse every string in input_strs as Fraction.parse would
+
+        :param input_strs: Iterable of input strings
+        :return: List of constructed, simplified Fraction instances
+        """
+        from_canonical = cls._from_canonical
+        return [from_canonical(*_scan_fraction(input_str, "_", "/")) for input_str in input_strs]
+
+    @classmethod
+    def parse_buffer(cls, buffer):
+        """
+        Lazily parse newline separated values straight out of a bytes, bytearray or mmap buffer, without decoding the
+        buffer to text first. Blank lines are skipped
+
+        :param buffer: Buffer holding ASCII encoded values, one per line
+        :return: Generator of constructed, simplified Fraction instances
+        """
+        from_canonical = cls._from_canonical
+        find = buffer.find
+        buffer_end = len(buffer)
+        start = 0
+        while start < buffer_end:
+            end = find(b"\n", start)
+            if end == -1:
+                end = buffer_end
+            line = buffer[start:end]
+            if not line.isspace() and line:
+                yield from_canonical(*_scan_fraction(line, b"_", b"/"))
+            start = end + 1
+
+
+def _scan_fraction(text, underscore, slash):
+    """
+    Single pass scan of a whole number, fraction or mixed number into its numerator and denominator in lowest terms,
+    with a single gcf. Works on both str and bytes, underscore and slash must be of the same type as text
+
+    :param text: Input to scan ( i.e. -2_1/3 )
+    :param underscore: Separator between the whole part and fraction of a mixed number
+    :param slash: Separator between numerator and denominator
+    :return: Tuple of the reduced (numerator, denominator)
+    """
+    whole_text, mixed, fraction_text = text.partition(underscore)
+    try:
+        if mixed:
+            if underscore in fraction_text:
+                raise ValueError
+            whole = int(whole_text)
+        else:
+            fraction_text = whole_text
+            whole = 0
+        numerator_text, is_fraction, denominator_text = fraction_text.partition(slash)
+        numerator = int(numerator_text)
+        if not is_fraction:
+            if mixed:
+                raise ValueError
+            return numerator, 1
+        denominator = int(denominator_text)
+    except ValueError:
+        raise ValueError(f"Invalid fraction input: {_as_text(text)}")
+
+    if denominator == 0:
+        raise ZeroDivisionError("Cannot have 0 as a denominator.")
+    if whole:
+        if (numerator < 0) != (denominator < 0) and numerator:
+            raise ValueError(
+                f"Invalid fraction input: {_as_text(text)}: Please input negative mixed fractions with the "
+                "minus sign at the beginning to reduce ambiguity "
+                f"(i.e. -{abs(whole)}_{abs(numerator)}/{abs(denominator)})"
+            )
+        numerator = abs(numerator)
+        denominator = abs(denominator)
+        if whole < 0:
+            numerator = whole * denominator - numerator
+        else:
+            numerator = whole * denominator + numerator
+    elif denominator < 0:
+        numerator = -numerator
+        denominator = -denominator
+
+    scalar = gcf(numerator, denominator)
+    if scalar != 1:
+        numerator //= scalar
+        denominator //= scalar
+    return numerator, denominator
+
+
+def _as_text(text):
+    """
+    Text of an input for use in error messages
+
+    :param text: str or bytes-like input
+    :return: str version of text
+    """
+    if isinstance(text, str):
+        return text
+    return bytes(text).decode("ascii", "replace")
+
+
+def _mixed_string(numerator, denominator, digits):
+    """
+    Mixed number form of a fraction in lowest terms, see Fraction.__str__
+
+    :param numerator: Integer numerator
+    :param denominator: Positive integer denominator
+    :param digits: Unused, accepted so every form has the same signature
+    :return: String such as -2_1/3, 1/3 or 2
+    """
+    if denominator == 1:
+        return str(numerator)
+    if numerator < 0:
+        whole, remainder = divmod(-numerator, denominator)
+        if whole:
+            return f"-{whole}_{remainder}/{denominator}"
+    else:
+        whole, remainder = divmod(numerator, denominator)
+        if whole:
+            return f"{whole}_{remainder}/{denominator}"
+    return f"{numerator}/{denominator}"
+
+
+def _improper_string(numerator, denominator, digits):
+    """
+    Improper form of a fraction in lowest terms
+
+    :param numerator: Integer numerator
+    :param denominator: Positive integer denominator
+    :param digits: Unused, accepted so every form has the same signature
+    :return: String such as -7/3 or 2
+    """
+    if denominator == 1:
+        return str(numerator)
+    return f"{numerator}/{denominator}"
+
+
+def _decimal_string(numerator, denominator, digits):
+    """
+    Decimal form of a fraction, computed exactly with integer division and rounded half away from zero
+
+    :param numerator: Integer numerator
+    :param denominator: Positive integer denominator
+    :param digits: Number of digits after the decimal point
+    :return: String such as -2.3333 for digits=4
+    """
+    scaled, remainder = divmod(abs(numerator) * 10 ** digits, denominator)
+    if remainder * 2 >= denominator:
+        scaled += 1
+    text = str(scaled)
+    if digits:
+        text = text.rjust(digits + 1, "0")
+        text = f"{text[:-digits]}.{text[-digits:]}"
+    if numerator < 0 and scaled:
+        return "-" + text
+    return text
+
+
+def _check_base(base):
+    """
+    :param base: Base of a digit expansion
+    :return: None, raises ValueError unless base is from 2 to 36
+    """
+    if not 2 <= base <= len(_DIGIT_CHARACTERS):
+        raise ValueError(f"Invalid base: {base}, must be from 2 to {len(_DIGIT_CHARACTERS)}")
+
+
+def _whole_string(value, base):
+    """
+    Digits of a non negative integer in the given base
+
+    :param value: Non negative integer
+    :param base: Base from 2 to 36
+    :return: String such as 1f for 31 in base 16
+    """
+    if base == 10:
+        return str(value)
+    characters = []
+    while True:
+        value, digit = divmod(value, base)
+        characters.append(_DIGIT_CHARACTERS[digit])
+        if not value:
+            return "".join(reversed(characters))
+
+
+def _expansion_digits(remainder, denominator, base):
+    """
+    Generate the digits after the radix point of remainder/denominator by long division, stopping when the expansion
+    terminates. Only the current remainder is kept between digits
+
+    :param remainder: Non negative integer smaller than denominator
+    :param denominator: Positive integer denominator
+    :param base: Base from 2 to 36
+    :return: Generator of integer digits
+    """
+    while remainder:
+        digit, remainder = divmod(remainder * base, denominator)
+        yield digit
+
+
+def _preperiod(denominator, base):
+    """
+    Number of digits before the repeating part of an expansion with this denominator in lowest terms, found by
+    dividing out the factors the denominator shares with the base one digit at a time
+
+    :param denominator: Positive integer denominator
+    :param base: Base from 2 to 36
+    :return: Tuple of the number of digits and the denominator left coprime to base, 1 if the expansion terminates
+    """
+    count = 0
+    shared = gcf(denominator, base)
+    while shared > 1:
+        denominator //= shared
+        count += 1
+        shared = gcf(denominator, base)
+    return count, denominator
+
+
+def _repeating_string(numerator, denominator, digits, base=10):
+    """
+    Exact expansion of a fraction in lowest terms with the repeating part in parentheses. After the preperiod the
+    remainders repeat exactly, so the period ends when the remainder first returns to its value at the start and only
+    the digits of the period are held
+
+    :param numerator: Integer numerator
+    :param denominator: Positive integer denominator
+    :param digits: Unused, accepted so every form has the same signature
+    :param base: Base from 2 to 36
+    :return: String such as -0.1(6)
+    """
+    whole, remainder = divmod(abs(numerator), denominator)
+    text = ("-" if numerator < 0 else "") + _whole_string(whole, base)
+    if not remainder:
+        return text
+    preperiod, coprime = _preperiod(denominator, base)
+    prefix = []
+    for _ in range(preperiod):
+        digit, remainder = divmod(remainder * base, denominator)
+        prefix.append(_DIGIT_CHARACTERS[digit])
+    if coprime == 1:
+        return f"{text}.{''.join(prefix)}"
+    start = remainder
+    period = []
+    while True:
+        digit, remainder = divmod(remainder * base, denominator)
+        period.append(_DIGIT_CHARACTERS[digit])
+        if remainder == start:
+            return f"{text}.{''.join(prefix)}({''.join(period)})"
+
+
+def _continued_fraction_terms(numerator, denominator):
+    """
+    Generate the continued fraction terms of numerator/denominator by Euclid's algorithm
+
+    :param numerator: Integer numerator
+    :param denominator: Positive integer denominator
+    :return: Generator of integer terms
+    """
+    while denominator:
+        term, remainder = divmod(numerator, denominator)
+        yield term
+        numerator, denominator = denominator, remainder
+
+
+_FORMATTERS = {
+    "mixed": _mixed_string,
+    "improper": _improper_string,
+    "decimal": _decimal_string,
+    "repeating": _repeating_string,
+}
+
+
+def fraction_formatter(form="mixed", digits=DECIMAL_DIGITS):
+    """
+    Build a function which stringifies a fraction in the given form
+
+    :param form: One of FORMS
+    :param digits: Number of digits after the decimal point for the decimal form
+    :return: Function taking a Fraction and returning a string
+    """
+    if form not in _FORMATTERS:
+        raise ValueError(f"Invalid output form: {form}, must be one of {', '.join(FORMS)}")
+    if digits < 0:
+        raise ValueError(f"Invalid number of digits: {digits}")
+    formatter = _FORMATTERS[form]
+
+    def format_fraction(fraction):
+        return formatter(fraction.numerator, fraction.denominator, digits)
+
+    return format_fraction
+
+
+def format_many(fractions, form="mixed", digits=DECIMAL_DIGITS, separator="\n"):
+    """
+    Stringify every fraction in fractions and join them into one string
+
+    :param fractions: Iterable of Fraction instances
+    :param form: One of FORMS
+    :param digits: Number of digits after the decimal point for the decimal form
+    :param separator: String placed between fractions
+    :return: Joined string
+    """
+    return separator.join(map(fraction_formatter(form, digits), fractions))
+
+
+def write_many(fractions, output_stream, form="mixed", digits=DECIMAL_DIGITS, block_size=4096):
+    """
+    Write fractions to a text stream, one per line, joining them into blocks of block_size lines per write
+
+    :param fractions: Iterable of Fraction instances
+    :param output_stream: Writable text stream
+    :param form: One of FORMS
+    :param digits: Number of digits after the decimal point for the decimal form
+    :param block_size: Number of lines per write
+    :return: Number of fractions written
+    """
+    texts = map(fraction_formatter(form, digits), fractions)
+    count = 0
+    block = list(islice(texts, block_size))
+    while block:
+        count += len(block)
+        block.append("")
+        output_stream.write("\n".join(block))
+        block = list(islice(texts, block_size))
+    return count
+
+
+def _write_varint(out, value):
+    """
+    Append a non negative integer to out as an unsigned LEB128 varint, 7 bits per byte, least significant first
+
+    :param out: bytearray to append to
+    :param value: Non negative integer
+    :return: None
+    """
+    while value > 0x7F:
+        out.append(value & 0x7F | 0x80)
+        value >>= 7
+    out.append(value)
+
+
+def _read_varint(data, offset):
+    """
+    Read an unsigned LEB128 varint
+
+    :param data: Bytes-like object
+    :param offset: Position of the first byte of the varint
+    :return: Tuple of the value and the position after the varint
+    """
+    value = 0
+    shift = 0
+    while True:
+        byte = data[offset]
+        offset += 1
+        value |= (byte & 0x7F) << shift
+        if byte < 0x80:
+            return value, offset
+        shift += 7
+
+
+def _write_int(out, value):
+    """
+    Append an integer of any size to out as a varint header holding its byte length and sign, followed by the little
+    endian bytes of its magnitude. Zero takes a single byte
+
+    :param out: bytearray to append to
+    :param value: Integer
+    :return: None
+    """
+    magnitude = -value if value < 0 else value
+    length = (magnitude.bit_length() + 7) >> 3
+    _write_varint(out, length << 1 | (value < 0))
+    out += magnitude.to_bytes(length, "little")
+
+
+def _read_int(data, offset):
+    """
+    Read an integer written by _write_int
+
+    :param data: Bytes-like object
+    :param offset: Position of the header varint
+    :return: Tuple of the value and the position after the integer
+    """
+    header, offset = _read_varint(data, offset)
+    end = offset + (header >> 1)
+    value = int.from_bytes(data[offset:end], "little")
+    if header & 1:
+        value = -value
+    return value, end
+
+
+def encode_fractions(fractions):
+    """
+    Serialize fractions into a compact binary form, the numerator and then the denominator of each fraction written
+    as a varint length header followed by the little endian bytes of the value
+
+    :param fractions: Iterable of Fraction instances
+    :return: bytes holding the encoded fractions
+    """
+    out = bytearray()
+    for fraction in fractions:
+        _write_int(out, fraction.numerator)
+        _write_int(out, fraction.denominator)
+    return bytes(out)
+
+
+def decode_fractions(data):
+    """
+    Lazily deserialize fractions written by encode_fractions
+
+    :param data: bytes, bytearray, memoryview or mmap holding encoded fractions
+    :return: Generator of Fraction instances
+    """
+    offset = 0
+    end = len(data)
+    while offset < end:
+        numerator, offset = _read_int(data, offset)
+        denominator, offset = _read_int(data, offset)
+        if denominator <= 0:
+            raise ValueError(f"Invalid encoded fraction at byte {offset}: denominator {denominator}")
+        yield Fraction(numerator, denominator)
+
+
+# First bytes of every fraction store file, the last byte is the format version
+STORE_MAGIC = b"FRACTUL\x01"
+# Number of fractions per block written by FractionWriter
+STORE_BLOCK_SIZE = 65536
+# Header of each block: the number of fractions and the padded size of its overflow heap, little endian
+_BLOCK_HEADER = struct.Struct("<QQ")
+
+
+def _int64_column(data):
+    """
+    View little endian int64 values as a sequence of ints, without copying on little endian machines
+
+    :param data: memoryview of the values, a multiple of 8 bytes long
+    :return: memoryview, or a byte swapped array copy on big endian machines
+    """
+    if sys.byteorder == "little":
+        return data.cast("q")
+    column = array("q")  # pragma: no cover
+    column.frombytes(data)  # pragma: no cover
+    column.byteswap()  # pragma: no cover
+    return column  # pragma: no cover
+
+
+class FractionWriter:
+    """
+    Write fractions to a binary store file, read back with FractionStore. The file is the 8 byte STORE_MAGIC followed
+    by blocks, each holding a 16 byte header with its count and heap size, an int64 column of numerators, an int64
+    column of denominators and a heap of varint records. A fraction whose numerator or denominator does not fit in
+    int64 is written to the heap as two _write_int records, and its row holds the offset of the record within the heap
+    as the numerator and 0 as the denominator. Fractions are buffered and written a block at a time, and opening an
+    existing file with append=True adds new blocks after the old ones without rewriting them
+    """
+    __slots__ = ("_file", "_block_size", "_numerators", "_denominators", "_heap", "count")
+
+    def __init__(self, path, append=False, block_size=STORE_BLOCK_SIZE):
+        """
+        Open a store file for writing
+
+        :param path: File path
+        :param append: Boolean specifying if fractions should be added to an existing store instead of replacing it
+        :param block_size: Number of fractions per block
+        """
+        if block_size < 1:
+            raise ValueError(f"Invalid block size: {block_size}")
+        self._file = open(path, "ab" if append else "wb")
+        if not self._file.tell():
+            self._file.write(STORE_MAGIC)
+        self._block_size = block_size
+        self._numerators = array("q")
+        self._denominators = array("q")
+        self._heap = bytearray()
+        # Number of fractions written by this writer
+        self.count = 0
+
+    def write(self, fraction):
+        """
+        Add one fraction
+
+        :param fraction: Fraction instance
+        :return: None
+        """
+        numerator = fraction.numerator
+        denominator = fraction.denominator
+        if _INT64_MIN <= numerator <= _INT64_MAX and denominator <= _INT64_MAX:
+            self._numerators.append(numerator)
+            self._denominators.append(denominator)
+        else:
+            self._numerators.append(len(self._heap))
+            self._denominators.append(0)
+            _write_int(self._heap, numerator)
+            _write_int(self._heap, denominator)
+        self.count += 1
+        if len(self._numerators) >= self._block_size:
+            self.flush()
+
+    def write_many(self, fractions):
+        """
+        Add every fraction of an iterable, or of a FractionArray whose columns are written directly
+
+        :param fractions: Iterable of Fraction instances, or FractionArray
+        :return: Number of fractions written
+        """
+        if isinstance(fractions, FractionArray):
+            return self._write_columns(fractions.numerators, fractions.denominators)
+        count = self.count
+        write = self.write
+        for fraction in fractions:
+            write(fraction)
+        return self.count - count
+
+    def _write_columns(self, numerators, denominators):
+        """
+        Write the columns of a FractionArray, copying int64 columns into whole blocks at a time
+
+        :param numerators: numpy column of numerators
+        :param denominators: numpy column of positive denominators
+        :return: Number of fractions written
+        """
+        if numerators.dtype == object or denominators.dtype == object:
+            return self.write_many(iter(FractionArray._from_columns(numerators, denominators)))
+        self.flush()
+        size = self._block_size
+        for start in range(0, len(numerators), size):
+            self._write_block(
+                numerators[start:start + size].astype("<i8").tobytes(),
+                denominators[start:start + size].astype("<i8").tobytes(),
+                b"",
+            )
+        self.count += len(numerators)
+        return len(numerators)
+
+    def flush(self):
+        """
+        Write any buffered fractions as a block
+
+        :return: None
+        """
+        if self._numerators:
+            if sys.byteorder != "little":  # pragma: no cover
+                self._numerators.byteswap()
+                self._denominators.byteswap()
+            self._write_block(self._numerators.tobytes(), self._denominators.tobytes(), self._heap)
+            self._numerators = array("q")
+            self._denominators = array("q")
+            self._heap = bytearray()
+        self._file.flush()
+
+    def _write_block(self, numerators, denominators, heap):
+        """
+        Write one block, padding the heap so the columns of the next block stay 8 byte aligned
+
+        :param numerators: Little endian int64 bytes of the numerator column
+        :param denominators: Little endian int64 bytes of the denominator column
+        :param heap: Bytes of the varint records
+        :return: None
+        """
+        padding = -len(heap) % 8
+        self._file.write(_BLOCK_HEADER.pack(len(numerators) // 8, len(heap) + padding))
+        self._file.write(numerators)
+        self._file.write(denominators)
+        self._file.write(heap)
+        self._file.write(bytes(padding))
+
+    def close(self):
+        """
+        Write any buffered fractions and close the file
+
+        :return: None
+        """
+        if not self._file.closed:
+            self.flush()
+            self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+class FractionStore:
+    """
+    Read only, random access view of a store file written by FractionWriter. The file is memory mapped and only its
+    block headers are read up front, so opening even a very large store takes milliseconds. Fractions are built
+    lazily as they are indexed or iterated, and array() slices the int64 columns straight into a FractionArray without
+    copying ( i.e. with FractionStore(path) as store: store[123456], store.array(0, 1000).sum() )
+    """
+    __slots__ = ("_file", "_mapped", "_blocks", "_starts", "_length")
+
+    def __init__(self, path):
+        """
+        Open and map a store file
+
+        :param path: File path
+        """
+        # Each block as (index of its first fraction, count, numerator column, denominator column, heap offset)
+        self._blocks = []
+        self._file = open(path, "rb")
+        try:
+            self._mapped = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            self._file.close()
+            raise ValueError(f"Not a fraction store: {path}")
+        if self._mapped[:len(STORE_MAGIC)] != STORE_MAGIC:
+            self.close()
+            raise ValueError(f"Not a fraction store: {path}")
+
+        self._starts = []
+        self._length = 0
+        offset, end = len(STORE_MAGIC), len(self._mapped)
+        while offset < end:
+            if offset + _BLOCK_HEADER.size > end:
+                self.close()
+                raise ValueError(f"Truncated fraction store: {path}")
+            count, heap_size = _BLOCK_HEADER.unpack_from(self._mapped, offset)
+            columns = offset + _BLOCK_HEADER.size
+            heap = columns + 16 * count
+            if heap + heap_size > end:
+                self.close()
+                raise ValueError(f"Truncated fraction store: {path}")
+            view = memoryview(self._mapped)
+            self._blocks.append((
+                self._length,
+                count,
+                _int64_column(view[columns:columns + 8 * count]),
+                _int64_column(view[columns + 8 * count:heap]),
+                heap,
+            ))
+            view.release()
+            self._starts.append(self._length)
+            self._length += count
+            offset = heap + heap_size
+
+    def __len__(self):
+        """
+        :return: Number of fractions in the store
+        """
+        return self._length
+
+    def _locate(self, index):
+        """
+        :param index: Index of a fraction, negative indexes count from the end
+        :return: Tuple of the block holding it and its row within the block
+        """
+        if index < 0:
+            index += self._length
+        if not 0 <= index < self._length:
+            raise IndexError("FractionStore index out of range")
+        block = self._blocks[bisect_right(self._starts, index) - 1]
+        return block, index - block[0]
+
+    def _fraction(self, numerator, denominator, heap):
+        """
+        Build the fraction of one row
+
+        :param numerator: Numerator column value
+        :param denominator: Denominator column value, 0 if the fraction is stored in the heap
+        :param heap: Position of the block heap in the file
+        :return: Fraction instance
+        """
+        if denominator:
+            return Fraction._from_canonical(numerator, denominator)
+        numerator, offset = _read_int(self._mapped, heap + numerator)
+        return Fraction._from_canonical(numerator, _read_int(self._mapped, offset)[0])
+
+    def __getitem__(self, index):
+        """
+        :param index: Index of a fraction, or a slice
+        :return: Fraction, or a list of Fractions for a slice
+        """
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(self._length))]
+        (_, _, numerators, denominators, heap), row = self._locate(index)
+        return self._fraction(numerators[row], denominators[row], heap)
+
+    def __iter__(self):
+        """
+        :return: Generator of every fraction in order, built one at a time
+        """
+        build = self._fraction
+        for _, _, numerators, denominators, heap in self._blocks:
+            for numerator, denominator in zip(numerators, denominators):
+                if denominator:
+                    yield Fraction._from_canonical(numerator, denominator)
+                else:
+                    yield build(numerator, denominator, heap)
+
+    def array(self, start=0, stop=None):
+        """
+        Slice the store into a FractionArray. Within a single block and without heap fractions the columns are numpy
+        views of the mapped file, so no values are copied. Requires numpy
+
+        :param start: Index of the first fraction
+        :param stop: Index just past the last fraction, defaults to the end of the store
+        :return: FractionArray instance
+        """
+        _require_numpy()
+        start, stop, _ = slice(start, stop).indices(self._length)
+        numerators, denominators = [], []
+        for first, count, _, _, heap in self._blocks:
+            low, high = max(start - first, 0), min(stop - first, count)
+            if low >= high:
+                continue
+            columns = heap - 16 * count
+            block_numerators = numpy.frombuffer(self._mapped, "<i8", high - low, columns + 8 * low)
+            block_denominators = numpy.frombuffer(self._mapped, "<i8", high - low, columns + 8 * (count + low))
+            spilled = numpy.flatnonzero(block_denominators == 0)
+            if spilled.size:
+                block_numerators = block_numerators.astype(object)
+                block_denominators = block_denominators.astype(object)
+                for row in spilled:
+                    fraction = self._fraction(int(block_numerators[row]), 0, heap)
+                    block_numerators[row] = fraction.numerator
+                    block_denominators[row] = fraction.denominator
+            numerators.append(block_numerators)
+            denominators.append(block_denominators)
+        if not numerators:
+            return FractionArray([])
+        if len(numerators) == 1:
+            return FractionArray._from_columns(numerators[0], denominators[0])
+        return FractionArray._from_columns(
+            _fit(numpy.concatenate(numerators)), _fit(numpy.concatenate(denominators))
+        )
+
+    def close(self):
+        """
+        Unmap and close the file. The mapping stays alive while arrays returned by array() still view it
+
+        :return: None
+        """
+        for _, _, numerators, denominators, _ in self._blocks:
+            if isinstance(numerators, memoryview):
+                numerators.release()
+                denominators.release()
+        self._blocks = []
+        try:
+            self._mapped.close()
+        except BufferError:
+            pass
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+class _RunningSum:
+    """
+    Exact running sum over a common denominator. Each term only needs the gcf of its own denominator with the running
+    one, which is cheap as one of them is small, and terms whose denominator divides the running one need no gcf at
+    all. Reducing the sum to lowest terms is deferred: in tree mode every chunk_size terms form a partial sum, reduced
+    once, and partials of equal size are combined pairwise so operands stay balanced while only log2(n) partials are
+    held. Otherwise the sum is reduced once at the end
+    """
+    __slots__ = ("numerator", "denominator", "count", "chunk_size", "tree", "_pending", "_partials")
+
+    def __init__(self, chunk_size, tree):
+        """
+        Build an empty sum
+
+        :param chunk_size: Number of terms per partial sum in tree mode
+        :param tree: Boolean specifying if partial sums should be combined pairwise
+        """
+        if chunk_size < 1:
+            raise ValueError(f"Invalid chunk size: {chunk_size}")
+        self.numerator = 0
+        self.denominator = 1
+        self.count = 0
+        self.chunk_size = chunk_size
+        self.tree = tree
+        self._pending = 0
+        self._partials = []
+
+    def add(self, numerator, denominator):
+        """
+        Add numerator/denominator to the sum
+
+        :param numerator: Integer numerator
+        :param denominator: Positive integer denominator
+        :return: None
+        """
+        common = self.denominator
+        if denominator == common:
+            self.numerator += numerator
+        elif common % denominator == 0:
+            self.numerator += numerator * (common // denominator)
+        else:
+            scalar = gcf(common, denominator)
+            scale = denominator // scalar
+            self.numerator = self.numerator * scale + numerator * (common // scalar)
+            self.denominator = common * scale
+        self.count += 1
+        if self.tree:
+            self._pending += 1
+            if self._pending >= self.chunk_size:
+                self._flush()
+
+    def _flush(self):
+        """
+        Move the running sum onto the stack of partial sums, combining partials of equal size
+
+        :return: None
+        """
+        self._pending = 0
+        partial = Fraction._from_parts(self.numerator, self.denominator)
+        size = 1
+        while self._partials and self._partials[-1][1] == size:
+            partial = self._partials.pop()[0] + partial
+            size *= 2
+        self._partials.append((partial, size))
+        self.numerator = 0
+        self.denominator = 1
+
+    def result(self):
+        """
+        :return: Fraction holding the sum of every term added so far
+        """
+        result = Fraction._from_parts(self.numerator, self.denominator)
+        for partial, _ in reversed(self._partials):
+            result = partial + result
+        return result
+
+
+def _fraction_parts(value):
+    """
+    Numerator and denominator of a Fraction or int
+
+    :param value: Fraction or int
+    :return: Tuple of (numerator, denominator)
+    """
+    if isinstance(value, Fraction):
+        return value.numerator, value.denominator
+    if isinstance(value, int):
+        return value, 1
+    raise TypeError(f"Expected a Fraction or int, got {type(value).__name__}")
+
+
+def fsum(fractions, tree=True, chunk_size=REDUCE_EVERY):
+    """
+    Exact sum of an iterable of fractions, consumed lazily in constant memory. See _RunningSum for how reduction is
+    deferred to chunk boundaries
+
+    :param fractions: Iterable of Fraction or int values
+    :param tree: Boolean specifying if chunk sums should be combined pairwise to keep operand sizes balanced. Much
+                 faster when the denominators share few factors, otherwise a single running sum is used
+    :param chunk_size: Number of terms per chunk in tree mode
+    :return: Fraction sum, 0 for an empty iterable
+    """
+    running = _RunningSum(chunk_size, tree)
+    add = running.add
+    for value in fractions:
+        add(*_fraction_parts(value))
+    return running.result()
+
+
+def fprod(fractions, tree=True, chunk_size=REDUCE_EVERY):
+    """
+    Exact product of an iterable of fractions, consumed lazily in constant memory. Numerators and denominators are
+    multiplied unreduced and only reduced every chunk_size factors, and in tree mode reduced chunk products are
+    combined pairwise
+
+    :param fractions: Iterable of Fraction or int values
+    :param tree: Boolean specifying if chunk products should be combined pairwise to keep operand sizes balanced
+    :param chunk_size: Number of factors multiplied between reductions
+    :return: Fraction product, 1 for an empty iterable
+    """
+    if chunk_size < 1:
+        raise ValueError(f"Invalid chunk size: {chunk_size}")
+    numerator = 1
+    denominator = 1
+    pending = 0
+    partials = []
+    for value in fractions:
+        value_numerator, value_denominator = _fraction_parts(value)
+        numerator *= value_numerator
+        denominator *= value_denominator
+        pending += 1
+        if pending >= chunk_size:
+            pending = 0
+            if tree:
+                partial = Fraction._from_parts(numerator, denominator)
+                size = 1
+                while partials and partials[-1][1] == size:
+                    partial = partials.pop()[0] * partial
+                    size *= 2
+                partials.append((partial, size))
+                numerator = 1
+                denominator = 1
+            else:
+                numerator, denominator = _canonical(numerator, denominator)
+
+    result = Fraction._from_parts(numerator, denominator)
+    for partial, _ in reversed(partials):
+        result = partial * result
+    return result
+
+
+def mean(fractions, tree=True, chunk_size=REDUCE_EVERY):
+    """
+    Exact arithmetic mean of an iterable of fractions, computed in a single lazy pass
+
+    :param fractions: Non empty iterable of Fraction or int values
+    :param tree: Boolean specifying if chunk sums should be combined pairwise, see fsum
+    :param chunk_size: Number of terms per chunk in tree mode
+    :return: Fraction mean
+    """
+    running = _RunningSum(chunk_size, tree)
+    for value in fractions:
+        running.add(*_fraction_parts(value))
+    if not running.count:
+        raise ValueError("mean requires at least one value")
+    return running.result() / running.count
+
+
+def variance(fractions, sample=False, tree=True, chunk_size=REDUCE_EVERY):
+    """
+    Exact variance of an iterable of fractions, computed in a single lazy pass from the sum and the sum of squares.
+    Arithmetic is exact so this has none of the cancellation problems it has with floats
+
+    :param fractions: Iterable of Fraction or int values, at least two for the sample variance
+    :param sample: Boolean specifying the sample variance (divide by n - 1) instead of the population variance
+    :param tree: Boolean specifying if chunk sums should be combined pairwise, see fsum
+    :param chunk_size: Number of terms per chunk in tree mode
+    :return: Fraction variance
+    """
+    total = _RunningSum(chunk_size, tree)
+    squares = _RunningSum(chunk_size, tree)
+    for value in fractions:
+        numerator, denominator = _fraction_parts(value)
+        total.add(numerator, denominator)
+        squares.add(numerator * numerator, denominator * denominator)
+
+    count = total.count
+    if count < 1 + sample:
+        raise ValueError(f"{'sample ' if sample else ''}variance requires at least {1 + sample} values")
+    total_sum = total.result()
+    deviation = squares.result() - total_sum * total_sum / count
+    return deviation / (count - sample)
+
+
+# Elementwise results whose magnitude may reach this bound are computed with Python ints instead of int64
+_INT64_SAFE_BOUND = float(2 ** 62)
+_INT64_MIN = -(2 ** 63)
+_INT64_MAX = 2 ** 63 - 1
+
+
+def _require_numpy():
+    """
+    Raise an ImportError explaining that numpy is needed, if it is not installed
+
+    :return: None
+    """
+    if numpy is None:
+        raise ImportError("FractionArray requires numpy, install it with 'pip install numpy'")
+
+
+def _fit(column):
+    """
+    Store an integer column as int64 if every element fits, otherwise as an object array of exact Python ints
+
+    :param column: numpy array of integers
+    :return: numpy array with int64 or object dtype
+    """
+    if column.dtype == object:
+        if column.size and not ((column >= _INT64_MIN) & (column <= _INT64_MAX)).all():
+            return column
+        return column.astype(numpy.int64)
+    return column.astype(numpy.int64, copy=False)
+
+
+def _as_column(values):
+    """
+    Convert integers, or a sequence of them, into an integer column
+
+    :param values: Integer or (nested) sequence of integers
+    :return: numpy array with int64 dtype, or object dtype if some value does not fit in int64
+    """
+    try:
+        return numpy.asarray(values, dtype=numpy.int64)
+    except OverflowError:
+        return _fit(numpy.array(values, dtype=object))
+
+
+def _may_overflow(estimate):
+    """
+    Mask of elements whose float estimate is too close to the int64 range to trust int64 arithmetic
+
+    :param estimate: numpy float array estimating the magnitude of each result
+    :return: numpy boolean array
+    """
+    return estimate >= _INT64_SAFE_BOUND
+
+
+def _exact(operation, a, b, risky):
+    """
+    Apply an elementwise integer operation computed with int64, redoing the risky elements with exact Python ints
+
+    :param operation: Binary function on numpy arrays such as numpy.multiply
+    :param a: First int64 column
+    :param b: Second int64 column, broadcast against a
+    :param risky: Boolean mask of elements which could overflow int64
+    :return: numpy array with int64 or object dtype
+    """
+    a, b, risky = numpy.broadcast_arrays(a, b, risky)
+    with numpy.errstate(over="ignore"):
+        result = operation(a, b)
+    if risky.any():
+        result = result.astype(object)
+        result[risky] = operation(a[risky].astype(object), b[risky].astype(object))
+    return result
+
+
+def _multiply(a, b):
+    """
+    Exact elementwise product of two integer columns
+
+    :param a: First integer column
+    :param b: Second integer column
+    :return: numpy array with int64 or object dtype
+    """
+    if a.dtype == object or b.dtype == object:
+        return _fit(a.astype(object) * b.astype(object))
+    estimate = numpy.abs(a.astype(numpy.float64)) * numpy.abs(b.astype(numpy.float64))
+    return _exact(numpy.multiply, a, b, _may_overflow(estimate))
+
+
+def _add(a, b):
+    """
+    Exact elementwise sum of two integer columns
+
+    :param a: First integer column
+    :param b: Second integer column
+    :return: numpy array with int64 or object dtype
+    """
+    if a.dtype == object or b.dtype == object:
+        return _fit(a.astype(object) + b.astype(object))
+    estimate = numpy.abs(a.astype(numpy.float64)) + numpy.abs(b.astype(numpy.float64))
+    return _exact(numpy.add, a, b, _may_overflow(estimate))
+
+
+def _negate(a):
+    """
+    Exact elementwise negation of an integer column
+
+    :param a: Integer column
+    :return: numpy array with int64 or object dtype
+    """
+    if a.dtype != object and (a == _INT64_MIN).any():
+        a = a.astype(object)
+    # Negating a 0-d array, such as a broadcast scalar operand, returns a scalar rather than an array
+    return numpy.asarray(-a, dtype=a.dtype)
+
+
+def _reduce_columns(numerators, denominators):
+    """
+    Vectorized counterpart of Fraction.simplified, reduces every element to lowest terms with a positive denominator
+
+    :param numerators: Integer column of numerators
+    :param denominators: Integer column of non zero denominators
+    :return: Tuple of the reduced (numerators, denominators) columns
+    """
+    scalars = numpy.gcd(numerators, denominators)
+    if (denominators < 0).any():
+        scalars = numpy.where(denominators < 0, _negate(scalars), scalars)
+    return _fit(numerators // scalars), _fit(denominators // scalars)
+
+
+class FractionArray:
+    """
+    Array of fractions stored as parallel numpy columns of numerators and denominators, supporting elementwise
+    arithmetic and comparison, broadcasting against Fraction and int scalars, and sum/prod reductions. Columns are
+    int64 for speed, an element which would overflow int64 is computed exactly with Python ints instead. Like
+    Fraction, every element is kept in lowest terms with a positive denominator. Requires numpy
+    """
+    __slots__ = ("numerators", "denominators")
+
+    def __init__(self, numerators, denominators=1):
+        """
+        Build a fraction array from numerators and (optional) denominators, broadcast against each other
+
+        :param numerators: Integer or sequence of integers
+        :param denominators: Integer or sequence of integers (optional), if not specified defaults to 1. Cannot
+                             contain zero
+        """
+        _require_numpy()
+        numerators, denominators = numpy.broadcast_arrays(_as_column(numerators), _as_column(denominators))
+        if (denominators == 0).any():
+            raise ZeroDivisionError("Cannot have 0 as a denominator.")
+        self.numerators, self.denominators = _reduce_columns(numerators, denominators)
+
+    @classmethod
+    def _from_columns(cls, numerators, denominators):
+        """
+        Build a fraction array from columns already known to be in lowest terms with positive denominators
+
+        :param numerators: Integer column of numerators
+        :param denominators: Integer column of denominators
+        :return: New FractionArray instance
+        """
+        result = object.__new__(cls)
+        result.numerators = numerators
+        result.denominators = denominators
+        return result
+
+    @classmethod
+    def from_fractions(cls, fractions):
+        """
+        Build a fraction array from an iterable of Fraction instances
+
+        :param fractions: Iterable of Fraction instances
+        :return: New FractionArray instance
+        """
+        _require_numpy()
+        fractions = list(fractions)
+        return cls._from_columns(
+            _as_column([f.numerator for f in fractions]),
+            _as_column([f.denominator for f in fractions]),
+        )
+
+    @staticmethod
+    def _columns(other):
+        """
+        Columns of the other operand of an arithmetic or comparison operator
+
+        :param other: FractionArray, Fraction or int
+        :return: Tuple of (numerators, denominators) columns, or None for an unsupported type
+        """
+        if isinstance(other, FractionArray):
+            return other.numerators, other.denominators
+        if isinstance(other, Fraction):
+            return _as_column(other.numerator), _as_column(other.denominator)
+        if isinstance(other, int):
+            return _as_column(other), _as_column(1)
+        return None
+
+    def __len__(self):
+        """
+        :return: Number of fractions along the first axis
+        """
+        return len(self.numerators)
+
+    @property
+    def shape(self):
+        """
+        Shape of the array
+        """
+        return self.numerators.shape
+
+    def __getitem__(self, index):
+        """
+        Index into the array with numpy indexing rules
+
+        :param index: Integer, slice, mask or index array
+        :return: Fraction for a single element, otherwise a FractionArray
+        """
+        numerators = self.numerators[index]
+        denominators = self.denominators[index]
+        if numpy.ndim(numerators) == 0:
+            return Fraction._from_canonical(int(numerators), int(denominators))
+        return FractionArray._from_columns(numerators, denominators)
+
+    def __iter__(self):
+        """
+        Iterate over the fractions along the first axis
+        """
+        for index in range(len(self)):
+            yield self[index]
+
+    def tolist(self):
+        """
+        :return: Flat list of the Fraction instances in this array
+        """
+        return [
+            Fraction._from_canonical(int(n), int(d))
+            for n, d in zip(self.numerators.ravel().tolist(), self.denominators.ravel().tolist())
+        ]
+
+    def simplified(self):
+        """
+        Elements are always kept in lowest terms, so this is the array itself
+
+        :return: This FractionArray
+        """
+        return self
+
+    def __neg__(self):
+        """
+        :return: FractionArray with every element negated
+        """
+        return FractionArray._from_columns(_negate(self.numerators), self.denominators)
+
+    def __add__(self, other):
+        """
+        Elementwise addition, following Fraction.__add__ by only scaling with the gcf of the two denominators
+
+        :param other: FractionArray, Fraction or int
+        :return: FractionArray of the sums
+        """
+        columns = self._columns(other)
+        if columns is None:
+            return NotImplemented
+        return _add_columns(self.numerators, self.denominators, *columns)
+
+    __radd__ = __add__
+
+    def __sub__(self, other):
+        """
+        Elementwise subtraction
+
+        :param other: FractionArray, Fraction or int
+        :return: FractionArray of the differences
+        """
+        columns = self._columns(other)
+        if columns is None:
+            return NotImplemented
+        return _add_columns(self.numerators, self.denominators, _negate(columns[0]), columns[1])
+
+    def __rsub__(self, other):
+        """
+        Elementwise subtraction with this array on the right
+
+        :param other: Fraction or int
+        :return: FractionArray of the differences
+        """
+        columns = self._columns(other)
+        if columns is None:
+            return NotImplemented
+        return _add_columns(columns[0], columns[1], _negate(self.numerators), self.denominators)
+
+    def __mul__(self, other):
+        """
+        Elementwise multiplication, cancelling common factors across the operands first like Fraction.__mul__
+
+        :param other: FractionArray, Fraction or int
+        :return: FractionArray of the products
+        """
+        columns = self._columns(other)
+        if columns is None:
+            return NotImplemented
+        return _multiply_columns(self.numerators, self.denominators, *columns)
+
+    __rmul__ = __mul__
+
+    def __truediv__(self, other):
+        """
+        Elementwise division
+
+        :param other: FractionArray, Fraction or int
+        :return: FractionArray of the quotients
+        """
+        columns = self._columns(other)
+        if columns is None:
+            return NotImplemented
+        return _multiply_columns(self.numerators, self.denominators, *_reciprocal(*columns))
+
+    def __rtruediv__(self, other):
+        """
+        Elementwise division with this array on the right
+
+        :param other: Fraction or int
+        :return: FractionArray of the quotients
+        """
+        columns = self._columns(other)
+        if columns is None:
+            return NotImplemented
+        return _multiply_columns(columns[0], columns[1], *_reciprocal(self.numerators, self.denominators))
+
+    def _compare(self, other, comparison):
+        """
+        Elementwise comparison by cross multiplication, a/b < c/d exactly when a * d < c * b as denominators are
+        positive
+
+        :param other: FractionArray, Fraction or int
+        :param comparison: numpy comparison function such as numpy.less
+        :return: numpy boolean array
+        """
+        columns = self._columns(other)
+        if columns is None:
+            return NotImplemented
+        return comparison(
+            _multiply(self.numerators, columns[1]), _multiply(columns[0], self.denominators)
+        ).astype(bool)
+
+    def __eq__(self, other):
+        """
+        :param other: FractionArray, Fraction or int
+        :return: numpy boolean array, True where self is equal to other
+        """
+        return self._compare(other, numpy.equal)
+
+    def __ne__(self, other):
+        """
+        :param other: FractionArray, Fraction or int
+        :return: numpy boolean array, True where self is not equal to other
+        """
+        return self._compare(other, numpy.not_equal)
+
+    def __lt__(self, other):
+        """
+        :param other: FractionArray, Fraction or int
+        :return: numpy boolean array, True where self is less than other
+        """
+        return self._compare(other, numpy.less)
+
+    def __le__(self, other):
+        """
+        :param other: FractionArray, Fraction or int
+        :return: numpy boolean array, True where self is less than or equal to other
+        """
+        return self._compare(other, numpy.less_equal)
+
+    def __gt__(self, other):
+        """
+        :param other: FractionArray, Fraction or int
+        :return: numpy boolean array, True where self is greater than other
+        """
+        return self._compare(other, numpy.greater)
+
+    def __ge__(self, other):
+        """
+        :param other: FractionArray, Fraction or int
+        :return: numpy boolean array, True where self is greater than or equal to other
+        """
+        return self._compare(other, numpy.greater_equal)
+
+    __hash__ = None
+
+    def _tree_reduce(self, combine, empty):
+        """
+        Reduce the array to one fraction by combining its halves elementwise until one element is left, so the
+        reduction takes log2(n) vectorized steps and operands stay balanced in size
+
+        :param combine: Function combining two sets of columns into a FractionArray
+        :param empty: Fraction to return for an empty array
+        :return: Fraction result
+        """
+        numerators = self.numerators.ravel()
+        denominators = self.denominators.ravel()
+        if not len(numerators):
+            return empty
+        while len(numerators) > 1:
+            half = len(numerators) // 2
+            combined = combine(
+                numerators[:half], denominators[:half], numerators[half:2 * half], denominators[half:2 * half]
+            )
+            if len(numerators) % 2:
+                numerators = numpy.concatenate([combined.numerators, numerators[-1:]])
+                denominators = numpy.concatenate([combined.denominators, denominators[-1:]])
+            else:
+                numerators = combined.numerators
+                denominators = combined.denominators
+        return Fraction._from_canonical(int(numerators[0]), int(denominators[0]))
+
+    def sum(self):
+        """
+        :return: Fraction sum of every element
+        """
+        return self._tree_reduce(_add_columns, Fraction(0))
+
+    def prod(self):
+        """
+        :return: Fraction product of every element
+        """
+        return self._tree_reduce(_multiply_columns, Fraction(1))
+
+    def __str__(self):
+        """
+        :return: Stringified elements, formatted like Fraction
+        """
+        return "[" + ", ".join(str(f) for f in self.tolist()) + "]"
+
+    def __repr__(self):  # pragma: no cover
+        """
+        :return: Stringified version of self
+        """
+        return f"FractionArray({self})"
+
+
+def _add_columns(a, b, c, d):
+    """
+    Vectorized counterpart of _add_canonical, adds a/b and c/d elementwise
+
+    :param a: Numerators of the first operand
+    :param b: Positive denominators of the first operand
+    :param c: Numerators of the second operand
+    :param d: Positive denominators of the second operand
+    :return: FractionArray of the sums in lowest terms
+    """
+    g = numpy.gcd(b, d)
+    s = b // g
+    t = _add(_multiply(a, d // g), _multiply(c, s))
+    g2 = numpy.gcd(t, g)
+    return FractionArray._from_columns(_fit(t // g2), _fit(_multiply(s, d // g2)))
+
+
+def _multiply_columns(a, b, c, d):
+    """
+    Vectorized counterpart of _mul_canonical, multiplies a/b and c/d elementwise with cross cancellation
+
+    :param a: Numerators of the first operand
+    :param b: Positive denominators of the first operand
+    :param c: Numerators of the second operand
+    :param d: Positive denominators of the second operand
+    :return: FractionArray of the products in lowest terms
+    """
+    g1 = numpy.gcd(a, d)
+    g2 = numpy.gcd(c, b)
+    return FractionArray._from_columns(
+        _fit(_multiply(a // g1, c // g2)), _fit(_multiply(b // g2, d // g1))
+    )
+
+
+def _reciprocal(numerators, denominators):
+    """
+    Columns of the reciprocal of every element, with the sign moved to the numerator
+
+    :param numerators: Integer column of numerators
+    :param denominators: Integer column of positive denominators
+    :return: Tuple of (numerators, denominators) columns
+    """
+    if (numerators == 0).any():
+        raise ZeroDivisionError("Cannot have 0 as a denominator.")
+    negative = numerators < 0
+    if negative.any():
+        return numpy.where(negative, _negate(denominators), denominators), numpy.where(
+            negative, _negate(numerators), numerators
+        )
+    return denominators, numerators
+
+
+class FractionMatrix:
+    """
+    Immutable matrix of fractions supporting exact products, determinants, inverses and linear solves. Elimination
+    is fraction free (Bareiss): every row is scaled to integers once, all intermediate values stay integers divided
+    exactly by the previous pivot, and each result entry is reduced to lowest terms only once at the end
+    """
+    __slots__ = ("_rows", "shape")
+
+    def __init__(self, rows):
+        """
+        Build a matrix from rows of values
+
+        :param rows: Iterable of rows, each an iterable of Fraction, int or fraction string values. Every row must
+                     have the same, non zero, length
+        """
+        self._rows = tuple(tuple(_as_operand(value) for value in row) for row in rows)
+        widths = {len(row) for row in self._rows}
+        if len(widths) > 1:
+            raise ValueError("Matrix rows must all have the same length")
+        if not self._rows or 0 in widths:
+            raise ValueError("Matrix must have at least one row and one column")
+        self.shape = (len(self._rows), len(self._rows[0]))
+
+    @classmethod
+    def _from_rows(cls, rows):
+        """
+        Build a matrix from a non empty rectangular tuple of tuples of Fraction instances, skipping validation
+
+        :param rows: Tuple of row tuples
+        :return: New FractionMatrix instance
+        """
+        result = object.__new__(cls)
+        result._rows = rows
+        result.shape = (len(rows), len(rows[0]))
+        return result
+
+    @classmethod
+    def identity(cls, size):
+        """
+        Build the identity matrix of the given size
+
+        :param size: Number of rows and columns, at least 1
+        :return: New FractionMatrix instance
+        """
+        one, zero = Fraction._from_canonical(1, 1), Fraction._from_canonical(0, 1)
+        return cls([[one if i == j else zero for j in range(size)] for i in range(size)])
+
+    def __getitem__(self, index):
+        """
+        :param index: Row number, or tuple of (row, column)
+        :return: Tuple of the Fractions in a row, or the Fraction at (row, column)
+        """
+        if isinstance(index, tuple):
+            row, column = index
+            return self._rows[row][column]
+        return self._rows[index]
+
+    def __iter__(self):
+        """
+        :return: Iterator over the rows, each a tuple of Fractions
+        """
+        return iter(self._rows)
+
+    def __len__(self):
+        """
+        :return: Number of rows
+        """
+        return len(self._rows)
+
+    def tolist(self):
+        """
+        :return: List of rows, each a list of Fractions
+        """
+        return [list(row) for row in self._rows]
+
+    def transpose(self):
+        """
+        :return: New FractionMatrix with rows and columns swapped
+        """
+        return FractionMatrix._from_rows(tuple(zip(*self._rows)))
+
+    def __eq__(self, other):
+        """
+        :param other: FractionMatrix to compare against
+        :return: True if both matrices have the same shape and equal entries
+        """
+        if not isinstance(other, FractionMatrix):
+            return NotImplemented
+        return self.shape == other.shape and all(
+            a == b for row, other_row in zip(self._rows, other._rows) for a, b in zip(row, other_row)
+        )
+
+    def __hash__(self):
+        """
+        :return: Hash of the entries, consistent with __eq__
+        """
+        return hash(self._rows)
+
+    def __mul__(self, scalar):
+        """
+        Multiply every entry by a scalar, use the @ operator for the matrix product
+
+        :param scalar: Fraction or int
+        :return: New FractionMatrix instance
+        """
+        if not isinstance(scalar, (Fraction, int)):
+            return NotImplemented
+        return FractionMatrix._from_rows(tuple(tuple(value * scalar for value in row) for row in self._rows))
+
+    __rmul__ = __mul__
+
+    def __matmul__(self, other):
+        """
+        Matrix product. The rows of self and the columns of other are each scaled to integers once, every entry is
+        then an integer dot product followed by a single reduction
+
+        :param other: FractionMatrix with as many rows as self has columns
+        :return: New FractionMatrix instance
+        """
+        if not isinstance(other, FractionMatrix):
+            return NotImplemented
+        if self.shape[1] != other.shape[0]:
+            raise ValueError(f"Cannot multiply a {self.shape[0]}x{self.shape[1]} matrix "
+                             f"by a {other.shape[0]}x{other.shape[1]} matrix")
+        rows, row_scales = _integer_rows(self._rows)
+        columns, column_scales = _integer_rows(tuple(zip(*other._rows)))
+        return FractionMatrix._from_rows(tuple(
+            tuple(
+                Fraction._from_parts(sum(map(mul, row, column)), row_scale * column_scale)
+                for column, column_scale in zip(columns, column_scales)
+            )
+            for row, row_scale in zip(rows, row_scales)
+        ))
+
+    def multiply(self, other):
+        """
+        Matrix product, same as self @ other
+
+        :param other: FractionMatrix with as many rows as self has columns
+        :return: New FractionMatrix instance
+        """
+        return self @ other
+
+    def _require_square(self):
+        """
+        :return: None, raises ValueError if the matrix is not square
+        """
+        if self.shape[0] != self.shape[1]:
+            raise ValueError(f"Matrix must be square, not {self.shape[0]}x{self.shape[1]}")
+
+    def determinant(self):
+        """
+        Exact determinant, found by fraction free elimination over the integer scaled rows
+
+        :return: Fraction determinant
+        """
+        self._require_square()
+        rows, scales = _integer_rows(self._rows)
+        determinant = _bareiss(rows, len(rows))
+        scale = 1
+        for value in scales:
+            scale *= value
+        return Fraction._from_parts(determinant, scale)
+
+    def solve(self, values):
+        """
+        Solve self @ x = values exactly
+
+        :param values: Sequence of Fraction, int or fraction string values, one per row, or a FractionMatrix with
+                       as many rows as self to solve for several right hand sides at once
+        :return: List of Fractions, or a FractionMatrix when values is a FractionMatrix
+        """
+        self._require_square()
+        if isinstance(values, FractionMatrix):
+            right = values._rows
+        else:
+            right = tuple((_as_operand(value),) for value in values)
+        if len(right) != self.shape[0]:
+            raise ValueError(f"Expected {self.shape[0]} right hand side rows, got {len(right)}")
+        solution = _solve_rows(
+            tuple(row + other_row for row, other_row in zip(self._rows, right)), self.shape[0]
+        )
+        if isinstance(values, FractionMatrix):
+            return FractionMatrix._from_rows(solution)
+        return [row[0] for row in solution]
+
+    def inverse(self):
+        """
+        Exact inverse, solving against the identity with a single fraction free elimination
+
+        :return: New FractionMatrix instance, raises ZeroDivisionError if the matrix is singular
+        """
+        self._require_square()
+        return self.solve(FractionMatrix.identity(self.shape[0]))
+
+    def __str__(self):
+        """
+        :return: Stringified rows, one per line, with entries formatted like Fraction
+        """
+        return "\n".join("[" + ", ".join(str(value) for value in row) + "]" for row in self._rows)
+
+    def __repr__(self):  # pragma: no cover
+        """
+        :return: Stringified version of self
+        """
+        return f"FractionMatrix({self.tolist()})"
+
+
+def _integer_rows(rows):
+    """
+    Scale every row of fractions by the least common multiple of its denominators
+
+    :param rows: Sequence of rows of Fraction instances
+    :return: Tuple of (list of integer row lists, list of the positive scale of each row)
+    """
+    integer_rows, scales = [], []
+    for row in rows:
+        scale = 1
+        for value in row:
+            denominator = value._denominator
+            if scale % denominator:
+                scale = scale // gcf(scale, denominator) * denominator
+        integer_rows.append([value._numerator * (scale // value._denominator) for value in row])
+        scales.append(scale)
+    return integer_rows, scales
+
+
+def _bareiss(rows, size):
+    """
+    Bareiss forward elimination, in place, over the first size columns of the integer rows. Every update
+    (a * pivot - b * c) // previous divides exactly, so entries stay integers bounded by minors of the input
+
+    :param rows: List of integer row lists, at least size long and wide. Rows are swapped and updated in place
+    :param size: Number of rows and leading columns to eliminate
+    :return: Determinant of the leading size x size block, 0 if it is singular
+    """
+    sign, previous = 1, 1
+    for k in range(size):
+        if not rows[k][k]:
+            swap = next((i for i in range(k + 1, size) if rows[i][k]), None)
+            if swap is None:
+                return 0
+            rows[k], rows[swap] = rows[swap], rows[k]
+            sign = -sign
+        pivot_row = rows[k]
+        pivot = pivot_row[k]
+        tail = pivot_row[k + 1:]
+        for i in range(k + 1, size):
+            row = rows[i]
+            factor = row[k]
+            if factor:
+                row[k + 1:] = [(a * pivot - factor * b) // previous for a, b in zip(row[k + 1:], tail)]
+            elif pivot != previous:
+                row[k + 1:] = [a * pivot // previous for a in row[k + 1:]]
+            row[k] = 0
+        previous = pivot
+    return sign * previous
+
+
+def _solve_rows(rows, size):
+    """
+    Solve an augmented system with fraction free elimination and back substitution. With d the determinant of the
+    integer scaled system, d * x is integral by Cramer's rule, so back substitution divides exactly and each entry of
+    x needs just one reduction
+
+    :param rows: Tuple of augmented rows of Fraction instances, size coefficients followed by the right hand sides
+    :param size: Number of unknowns
+    :return: Tuple of solution rows, one Fraction per right hand side
+    """
+    rows = _integer_rows(rows)[0]
+    determinant = _bareiss(rows, size)
+    if not determinant:
+        raise ZeroDivisionError("Matrix is singular")
+    # _bareiss reports the signed determinant, the eliminated rows themselves carry the unsigned one
+    determinant = rows[size - 1][size - 1]
+    scaled = [None] * size
+    for i in range(size - 1, -1, -1):
+        row = rows[i]
+        totals = [determinant * value for value in row[size:]]
+        for j in range(i + 1, size):
+            coefficient = row[j]
+            if coefficient:
+                totals = [total - coefficient * value for total, value in zip(totals, scaled[j])]
+        diagonal = row[i]
+        scaled[i] = [total // diagonal for total in totals]
+    if determinant < 0:
+        determinant = -determinant
+        scaled = [[-value for value in row] for row in scaled]
+    return tuple(tuple(Fraction._from_parts(value, determinant) for value in row) for row in scaled)
+
+
+# Binary operators understood by the expression compiler, mapped to their precedence and implementation
+OPERATORS = {
+    "+": (1, Fraction.__add__),
+    "-": (1, Fraction.__sub__),
+    "*": (2, Fraction.__mul__),
+    "/": (2, Fraction.__truediv__),
+    "**": (3, Fraction.__pow__),
+}
+# Binary operators which group right to left, so 2 ** 3 ** 2 is 2 ** 9
+RIGHT_ASSOCIATIVE = {"**"}
+# Precedence of unary minus, which binds tighter than * and / but looser than **, so -2 ** 2 is -4
+_UNARY_PRECEDENCE = 3
+# Program step negating the value on top of the stack. A builtin rather than a function, so evaluation can tell the
+# binary operator functions of OPERATORS apart by class alone
+_NEGATE = neg
+# Class of the binary operator functions in OPERATORS
+_FUNCTION = type(Fraction.__add__)
+# Tokens which may precede an operand, parentheses open a group and minus negates
+_PREFIXES = {"(", "-"}
+# Matches arguments holding parentheses or a minus sign directly before a name, which tokenize splits off
+_SPLIT_PATTERN = re.compile(r"[()]|-[^\W\d]|-\$")
+# Number of compiled expression shapes kept by compile_expression
+EXPRESSION_CACHE_SIZE = 1024
+
+
+class CompiledExpression:
+    """
+    Postfix program for an expression shape, meaning its sequence of operators, parentheses and variable names with
+    the literal operands left as numbered slots. The program is built once and can be evaluated against any list of
+    operands and any variable bindings ( i.e. the shape of 1/2 + 3/4 * 5 compiles to [0, 1, 2, *, +] ). Program steps
+    are slot indexes, variable names, Fraction constants and operator functions
+    """
+    __slots__ = ("shape", "program", "names")
+
+    def __init__(self, shape):
+        """
+        Compile the given expression shape into a postfix program
+
+        :param shape: Sequence of tokens, where None marks a literal operand slot, "-" in operand position is unary
+                      minus and any identifier is a variable name
+        """
+        self.shape = tuple(shape)
+        program = []
+        end = self._compile(0, 1, program, [0])
+        if end != len(self.shape):
+            raise ValueError(f"Invalid expression shape: {self.shape}")
+        self.program = tuple(program)
+        self.names = tuple(sorted({step for step in program if step.__class__ is str}))
+
+    def _compile(self, position, min_precedence, program, slots):
+        """
+        Compile the subexpression starting at position by precedence climbing, stopping at the first operator binding
+        looser than min_precedence
+
+        :param position: Index into shape of the first token of the subexpression
+        :param min_precedence: Lowest operator precedence consumed
+        :param program: List the postfix steps are appended to
+        :param slots: One element list holding the index of the next literal slot
+        :return: Index into shape just past the subexpression
+        """
+        shape = self.shape
+        if position >= len(shape):
+            raise ValueError(f"Invalid expression shape: {shape}")
+        token = shape[position]
+        if token is None:
+            program.append(slots[0])
+            slots[0] += 1
+            position += 1
+        elif token == "-":
+            position = self._compile(position + 1, _UNARY_PRECEDENCE, program, slots)
+            program.append(_NEGATE)
+        elif token == "(":
+            position = self._compile(position + 1, 1, program, slots)
+            if position >= len(shape) or shape[position] != ")":
+                raise ValueError(f"Invalid expression shape: {shape}")
+            position += 1
+        elif _is_name(token):
+            program.append(token)
+            position += 1
+        else:
+            raise ValueError(f"Invalid expression shape: {shape}")
+
+        while position < len(shape) and shape[position] in OPERATORS:
+            symbol = shape[position]
+            precedence, operation = OPERATORS[symbol]
+            if precedence < min_precedence:
+                break
+            position = self._compile(
+                position + 1, precedence if symbol in RIGHT_ASSOCIATIVE else precedence + 1, program, slots
+            )
+            program.append(operation)
+        return position
+
+    def fold(self, operands):
+        """
+        Build a program with the literal slots filled in from operands and every subexpression without variables
+        evaluated, so only the variable dependent work is left for evaluation ( i.e. a * (2 + 1/2) folds to
+        [a, 5/2, *] )
+
+        :param operands: List of Fraction operands, one per literal slot
+        :return: New CompiledExpression taking no operands
+        """
+        stack = []
+        for step in self.program:
+            kind = step.__class__
+            if kind is int:
+                stack.append([operands[step]])
+            elif kind is str or kind is Fraction:
+                stack.append([step])
+            elif step is _NEGATE:
+                top = stack[-1]
+                if len(top) == 1 and top[0].__class__ is Fraction:
+                    top[0] = -top[0]
+                else:
+                    top.append(step)
+            else:
+                right = stack.pop()
+                left = stack[-1]
+                if len(left) == 1 == len(right) and left[0].__class__ is Fraction is right[0].__class__:
+                    left[0] = step(left[0], right[0])
+                else:
+                    left.extend(right)
+                    left.append(step)
+
+        result = object.__new__(CompiledExpression)
+        result.shape = self.shape
+        result.program = tuple(stack[0])
+        result.names = self.names
+        return result
+
+    def slotted(self, names):
+        """
+        Build a program reading the given variables from operand slots instead of variable bindings, which skips the
+        binding lookups when the same variables are evaluated many times ( i.e. [a, 2, *] slotted by (a,) becomes
+        [0, 2, *] )
+
+        :param names: Sequence of variable names covering every name of this program, the nth is read from operand n.
+                      This program must take no operands itself, see fold
+        :return: New CompiledExpression taking the variable values as its operands
+        """
+        slots = {name: index for index, name in enumerate(names)}
+        missing = set(self.names) - set(slots)
+        if missing:
+            raise ValueError(f"Unbound variable: {min(missing)}")
+        result = object.__new__(CompiledExpression)
+        result.shape = self.shape
+        result.program = tuple(slots[step] if step.__class__ is str else step for step in self.program)
+        result.names = ()
+        return result
+
+    def evaluate(self, operands=(), variables=None):
+        """
+        Run the program against the given operands and variable bindings
+
+        :param operands: List of Fraction operands, one per literal slot
+        :param variables: Dict of variable name to its value, a Fraction, int or fraction string
+        :return: Fraction result of the expression
+        """
+        values = {}
+        if self.names:
+            variables = variables or {}
+            for name in self.names:
+                if name not in variables:
+                    raise ValueError(f"Unbound variable: {name}")
+                values[name] = _as_operand(variables[name])
+
+        stack = []
+        push = stack.append
+        pop = stack.pop
+        for step in self.program:
+            kind = step.__class__
+            if kind is int:
+                push(operands[step])
+            elif kind is _FUNCTION:
+                right = pop()
+                push(step(pop(), right))
+            elif kind is Fraction:
+                push(step)
+            elif kind is str:
+                push(values[step])
+            else:
+                push(step(pop()))
+        return stack[0]
+
+    def __call__(self, **variables):
+        """
+        Evaluate a folded program, see compile_template, with the given variable bindings
+
+        :param variables: Value of each variable, a Fraction, int or fraction string
+        :return: Fraction result of the expression
+        """
+        return self.evaluate((), variables)
+
+
+def _is_name(token):
+    """
+    Whether an expression token is a variable name, either an identifier or a column reference such as $2
+
+    :param token: Token string
+    :return: Boolean
+    """
+    return token.isidentifier() or (token[:1] == "$" and token[1:].isdigit())
+
+
+def _as_operand(value):
+    """
+    Convert a variable binding into a Fraction
+
+    :param value: Fraction, int or fraction string
+    :return: Fraction instance
+    """
+    if isinstance(value, Fraction):
+        return value
+    if isinstance(value, int):
+        return Fraction._from_canonical(value, 1)
+    if isinstance(value, str):
+        return Fraction.parse(value)
+    raise TypeError(f"Unsupported variable value: {value!r}")
+
+
+@lru_cache(maxsize=EXPRESSION_CACHE_SIZE)
+def compile_expression(shape):
+    """
+    Return the compiled program for an expression shape, reusing a cached program when the same shape was seen before
+
+    :param shape: Tuple of tokens, see CompiledExpression
+    :return: CompiledExpression instance
+    """
+    return CompiledExpression(shape)
+
+
+def compile_template(expression):
+    """
+    Compile an expression with variables once, for evaluation against many variable bindings. Literal
+    subexpressions are folded at compile time ( i.e. compile_template("(a + b) * 3/4 - 1_1/2")(a=1, b="1/2") )
+
+    :param expression: Expression string, or list of arguments as for parse_command_line
+    :return: CompiledExpression, call it with the variable bindings as keyword arguments
+    """
+    arguments = [expression] if isinstance(expression, str) else expression
+    shape, operands = _parse_tokens(tokenize(arguments), arguments)
+    return compile_expression(shape).fold(operands)
+
+
+def tokenize(arguments):
+    """
+    Split command line arguments into expression tokens. Each argument may hold several whitespace separated tokens,
+    so ["1/2", "+", "3/4"] and ["1/2 + 3/4"] tokenize the same. Parentheses, and a minus sign directly before a
+    parenthesis or variable name, are split from the token they are attached to, so (-a + 1/2) tokenizes to
+    ["(", "-", "a", "+", "1/2", ")"]
+
+    :param arguments: Iterable of argument strings
+    :return: List of token strings
+    """
+    tokens = []
+    for argument in arguments:
+        if (
+            ("(" not in argument and ")" not in argument and "-" not in argument)
+            or not _SPLIT_PATTERN.search(argument)
+        ):
+            tokens.extend(argument.split())
+            continue
+        for word in argument.split():
+            _split_word(word, tokens)
+    return tokens
+
+
+def _split_word(word, tokens):
+    """
+    Split leading parentheses and unary minus signs, and trailing parentheses, off a whitespace delimited word
+
+    :param word: Word holding at least one token
+    :param tokens: List the tokens are appended to
+    :return: None
+    """
+    start = 0
+    end = len(word)
+    while start < end:
+        following = word[start + 1:start + 2]
+        negates = word[start] == "-" and (following == "(" or following == "$" or following.isidentifier())
+        if word[start] != "(" and not negates:
+            break
+        tokens.append(word[start])
+        start += 1
+    closing = 0
+    while end > start and word[end - 1] == ")":
+        end -= 1
+        closing += 1
+    if start < end:
+        tokens.append(word[start:end])
+    tokens.extend(")" * closing)
+
+
+def parse_command_line(arguments):
+    """
+    Parse the command line arguments into operands and operators and evaluate the resulting expression with the usual
+    precedence. Parentheses, unary minus and ** with whole number exponents are supported, operators must be
+    separated from their operands by whitespace. Raise an exception if any improperly formatted fractions or operators
+    are found, or if the expression uses a variable. Expressions are compiled per shape and cached, so evaluating the
+    same shape again with new operands skips compilation, and results are kept in RESULT_CACHE so repeating an
+    expression skips evaluation entirely. If 'set -f' is not set before running this script, then * characters must
+    be escaped or quoted when used on the command line.
+
+    :param arguments: Arguments passed in from command line.
+    :return: Fraction result from evaluated expression
+    """
+    tokens = tokenize(arguments)
+    key = tuple(tokens)
+    result = RESULT_CACHE.get(key)
+    if result is not None:
+        return result
+
+    shape, operands = _parse_tokens(tokens, arguments)
+    result = _evaluate_expression(shape, operands)
+    RESULT_CACHE.put(key, result)
+    return result
+
+
+def _parse_tokens(tokens, arguments):
+    """
+    Parse the literal operands out of expression tokens, leaving the shape of the expression, and check that operands
+    and operators alternate and parentheses balance
+
+    :param tokens: List of token strings from tokenize
+    :param arguments: Original arguments, used in error messages
+    :return: Tuple of the shape tuple, see CompiledExpression, and a list of Fraction operands
+    """
+    shape = []
+    operands = []
+    depth = 0
+
+    is_fraction = True
+    for index, item in enumerate(tokens):
+        if is_fraction:
+            if item in _PREFIXES:
+                if item == "(":
+                    depth += 1
+            elif _is_name(item):
+                is_fraction = False
+            else:
+                if item[:1] == "-" and tokens[index + 1:index + 2] == ["**"]:
+                    # A negative literal raised to a power is a negated power, as in Python -2 ** 2 is -4
+                    shape.append("-")
+                    item = item[1:]
+                operands.append(Fraction.parse(item))
+                item = None
+                is_fraction = False
+        elif item in OPERATORS:
+            is_fraction = True
+        elif item == ")":
+            depth -= 1
+            if depth < 0:
+                raise ValueError(f"Invalid input: {' '.join(arguments)}, unbalanced parentheses")
+        else:
+            raise ValueError(
+                f"Invalid input: {' '.join(arguments)}, {item} is not a valid operator"
+            )
+        shape.append(item)
+
+    if is_fraction:
+        raise ValueError(f"Invalid input: {' '.join(arguments)}, incorrect number of operands")
+    if depth:
+        raise ValueError(f"Invalid input: {' '.join(arguments)}, unbalanced parentheses")
+    return tuple(shape), operands
+
+
+def _evaluate_expression(shape, operands):
+    """
+    Evaluate parsed operands with the compiled program for their expression shape
+
+    :param shape: Shape tuple from _parse_tokens
+    :param operands: List of Fraction operands
+    :return: Fraction result of the expression
+    """
+    compiled = compile_expression(shape)
+    if compiled.names:
+        # Without variable bindings a name can only be an operand which is not a fraction
+        name = next(token for token in shape if token is not None and _is_name(token))
+        raise ValueError(f"Invalid fraction input: {name}")
+    return compiled.evaluate(operands)
+
+
+class Sheet:
+    """
+    Named cells holding fractions, or formulas over other cells in the parse_command_line expression syntax, which
+    are recalculated incrementally ( i.e. sheet["total"] = "price * quantity" ). Setting a cell only marks it stale;
+    recalculate then visits just the cells depending on what changed, in topological order, and stops propagating
+    wherever a recomputed value comes out unchanged. A formula which would make a cell depend on itself is rejected.
+    A cell whose formula fails to evaluate holds the error, which is raised when the cell is read and passed on to the
+    cells depending on it
+    """
+    __slots__ = ("_formulas", "_values", "_dependents", "_stale", "_changed")
+
+    def __init__(self, cells=None):
+        """
+        Build a sheet, optionally with initial cells
+
+        :param cells: Dict of cell name to its value or formula (optional), see __setitem__
+        """
+        # Compiled formula of each formula cell
+        self._formulas = {}
+        # Current value of every cell which has one, a Fraction or the exception its formula raised
+        self._values = {}
+        # Names of the formula cells referencing each name, whether or not that name is a cell
+        self._dependents = {}
+        # Formula cells which must be recomputed, and cells whose value changed, since the last recalculate
+        self._stale = set()
+        self._changed = set()
+        if cells:
+            self.update(cells)
+
+    def __setitem__(self, name, value):
+        """
+        Set a cell to a value or a formula
+
+        :param name: Cell name, an identifier
+        :param value: Fraction or int value, or a formula string which may reference other cells by name
+        :return: None, raises ValueError for an invalid formula or one which would create a circular reference
+        """
+        if not isinstance(name, str) or not name.isidentifier():
+            raise ValueError(f"Invalid cell name: {name!r}")
+        if isinstance(value, str):
+            formula = compile_template(value)
+            self._check_cycle(name, formula.names)
+            self._unlink(name)
+            self._formulas[name] = formula
+            for reference in formula.names:
+                self._dependents.setdefault(reference, set()).add(name)
+            self._stale.add(name)
+            return
+        value = _as_operand(value)
+        self._unlink(name)
+        self._stale.discard(name)
+        previous = self._values.get(name)
+        if previous.__class__ is not Fraction or previous != value:
+            self._values[name] = value
+            self._changed.add(name)
+
+    def __getitem__(self, name):
+        """
+        Current value of a cell, recalculating first if anything changed
+
+        :param name: Cell name
+        :return: Fraction value, raises the error of a formula which failed to evaluate
+        """
+        if self._stale or self._changed:
+            self.recalculate()
+        value = self._values[name]
+        if isinstance(value, Exception):
+            raise value
+        return value
+
+    def __delitem__(self, name):
+        """
+        Remove a cell. Formulas still referencing it fail with an unbound variable error until it is set again
+
+        :param name: Cell name
+        :return: None
+        """
+        if name not in self._values and name not in self._formulas:
+            raise KeyError(name)
+        self._unlink(name)
+        self._stale.discard(name)
+        self._values.pop(name, None)
+        self._changed.add(name)
+
+    def __contains__(self, name):
+        """
+        :param name: Cell name
+        :return: True if the sheet has a cell with this name
+        """
+        return name in self._values or name in self._formulas
+
+    def __iter__(self):
+        """
+        :return: Iterator over the cell names
+        """
+        return iter(set(self._values).union(self._formulas))
+
+    def __len__(self):
+        """
+        :return: Number of cells
+        """
+        return len(set(self._values).union(self._formulas))
+
+    def update(self, cells):
+        """
+        Set many cells at once, see __setitem__. Formulas may reference cells set later in the same call
+
+        :param cells: Dict of cell name to its value or formula
+        :return: None
+        """
+        for name, value in cells.items():
+            self[name] = value
 
-        if whole < 0:
-            return_fraction *= Fraction(-1)
-        return_fraction += Fraction(whole)
+    def dependencies(self, name):
+        """
+        :param name: Cell name
+        :return: Sorted tuple of the names referenced by the cell's formula, empty for a value cell
+        """
+        formula = self._formulas.get(name)
+        return formula.names if formula else ()
 
-        return return_fraction.simplified()
+    def dependents(self, name):
+        """
+        :param name: Cell name
+        :return: Set of the names of the formula cells referencing it directly
+        """
+        return set(self._dependents.get(name, ()))
 
+    def _unlink(self, name):
+        """
+        Forget the formula of a cell, if it has one, and its edges in the dependency graph
 
-def parse_command_line(arguments):
+        :param name: Cell name
+        :return: None
+        """
+        formula = self._formulas.pop(name, None)
+        if formula:
+            for reference in formula.names:
+                dependents = self._dependents[reference]
+                dependents.discard(name)
+                if not dependents:
+                    del self._dependents[reference]
+
+    def _check_cycle(self, name, references):
+        """
+        Check that giving a cell a formula with the given references creates no circular reference, by searching the
+        cells depending on it for any of those references. Only the cells downstream of name are visited
+
+        :param name: Cell name
+        :param references: Names the new formula references
+        :return: None, raises ValueError naming the cycle if there would be one
+        """
+        if name in references:
+            raise ValueError(f"Circular reference: {name} -> {name}")
+        references = set(references)
+        parents = {name: None}
+        pending = [name]
+        while pending:
+            cell = pending.pop()
+            for dependent in self._dependents.get(cell, ()):
+                if dependent in parents:
+                    continue
+                parents[dependent] = cell
+                if dependent in references:
+                    cycle = [name, dependent]
+                    while cycle[-1] != name:
+                        cycle.append(parents[cycle[-1]])
+                    raise ValueError(f"Circular reference: {' -> '.join(cycle)}")
+                pending.append(dependent)
+
+    def recalculate(self):
+        """
+        Recompute the formula cells affected by changes since the last recalculation. The affected cells are ordered
+        topologically, and a cell is only recomputed if its formula changed or one of the cells it references came
+        out with a different value
+
+        :return: List of the names of the recomputed cells, in the order they were computed
+        """
+        stale, changed = self._stale, self._changed
+        if not stale and not changed:
+            return []
+        dependents = self._dependents
+
+        affected = set(stale)
+        pending = list(stale.union(changed))
+        while pending:
+            for dependent in dependents.get(pending.pop(), ()):
+                if dependent not in affected:
+                    affected.add(dependent)
+                    pending.append(dependent)
+
+        waiting = {}
+        for cell in affected:
+            waiting[cell] = sum(reference in affected for reference in self._formulas[cell].names)
+        ready = deque(cell for cell, count in waiting.items() if not count)
+        recomputed = []
+        while ready:
+            cell = ready.popleft()
+            formula = self._formulas[cell]
+            if cell in stale or any(reference in changed for reference in formula.names):
+                recomputed.append(cell)
+                previous = self._values.get(cell)
+                value = self._compute(formula)
+                self._values[cell] = value
+                if previous.__class__ is not Fraction or value.__class__ is not Fraction or previous != value:
+                    changed.add(cell)
+            for dependent in dependents.get(cell, ()):
+                if dependent in affected:
+                    waiting[dependent] -= 1
+                    if not waiting[dependent]:
+                        ready.append(dependent)
+
+        self._stale = set()
+        self._changed = set()
+        return recomputed
+
+    def _compute(self, formula):
+        """
+        Evaluate a formula against the current cell values
+
+        :param formula: CompiledExpression of the formula
+        :return: Fraction value, or the exception raised by the formula or by a cell it references
+        """
+        values = self._values
+        for reference in formula.names:
+            value = values.get(reference)
+            if value is None:
+                return ValueError(f"Unbound variable: {reference}")
+            if isinstance(value, Exception):
+                return value
+        try:
+            return formula.evaluate((), values)
+        except (ArithmeticError, ValueError) as e:
+            return e
+
+
+# Environment variable which, when set to a non empty value, enables instrumentation on import and writes the
+# statistics to standard error when the process exits
+STATS_VARIABLE = "FRACTULATOR_STATS"
+# Counters collected while instrumentation is enabled, None when it is disabled
+STATS = None
+# Original functions replaced by their instrumented versions while instrumentation is enabled
+_UNINSTRUMENTED = {}
+
+
+class Stats:
+    """
+    Counters collected while instrumentation is enabled, see enable_stats. Updates are not locked, so counts from
+    threads running at the same time may be slightly low
+    """
+    __slots__ = (
+        "gcf_calls",
+        "gcf_seconds",
+        "gcf_bits",
+        "gcf_max_bits",
+        "gcf_steps",
+        "gcf_max_steps",
+        "fractions",
+        "calls",
+        "expressions",
+        "evaluations",
+        "parse_seconds",
+        "eval_seconds",
+        "max_parse_seconds",
+        "max_eval_seconds",
+    )
+
+    def __init__(self):
+        """
+        Build a set of counters, all zero
+        """
+        self.gcf_calls = 0
+        self.gcf_seconds = 0.0
+        self.gcf_bits = {}
+        self.gcf_max_bits = 0
+        self.gcf_steps = 0
+        self.gcf_max_steps = 0
+        self.fractions = 0
+        self.calls = {"simplify": 0, "simplified": 0, "normalize": 0}
+        self.expressions = 0
+        self.evaluations = 0
+        self.parse_seconds = 0.0
+        self.eval_seconds = 0.0
+        self.max_parse_seconds = 0.0
+        self.max_eval_seconds = 0.0
+
+    def snapshot(self):
+        """
+        Copy of the counters as plain dicts
+
+        :return: Dict with gcf, fractions, calls and parse_command_line entries
+        """
+        return {
+            "gcf": {
+                "calls": self.gcf_calls,
+                "seconds": self.gcf_seconds,
+                "max_bits": self.gcf_max_bits,
+                "bits": dict(sorted(self.gcf_bits.items())),
+                "steps": self.gcf_steps,
+                "max_steps": self.gcf_max_steps,
+            },
+            "fractions": self.fractions,
+            "calls": dict(self.calls),
+            "parse_command_line": {
+                "calls": self.expressions,
+                "evaluations": self.evaluations,
+                "parse_seconds": self.parse_seconds,
+                "eval_seconds": self.eval_seconds,
+                "max_parse_seconds": self.max_parse_seconds,
+                "max_eval_seconds": self.max_eval_seconds,
+            },
+        }
+
+    def merge(self, snapshot):
+        """
+        Add the counters of a snapshot, such as one taken in a worker process, to these counters
+
+        :param snapshot: Dict of counters as returned by snapshot
+        :return: None
+        """
+        gcf = snapshot["gcf"]
+        self.gcf_calls += gcf["calls"]
+        self.gcf_seconds += gcf["seconds"]
+        for bucket, count in gcf["bits"].items():
+            self.gcf_bits[bucket] = self.gcf_bits.get(bucket, 0) + count
+        self.gcf_max_bits = max(self.gcf_max_bits, gcf["max_bits"])
+        self.gcf_steps += gcf["steps"]
+        self.gcf_max_steps = max(self.gcf_max_steps, gcf["max_steps"])
+        self.fractions += snapshot["fractions"]
+        for name, count in snapshot["calls"].items():
+            self.calls[name] += count
+        parsing = snapshot["parse_command_line"]
+        self.expressions += parsing["calls"]
+        self.evaluations += parsing["evaluations"]
+        self.parse_seconds += parsing["parse_seconds"]
+        self.eval_seconds += parsing["eval_seconds"]
+        self.max_parse_seconds = max(self.max_parse_seconds, parsing["max_parse_seconds"])
+        self.max_eval_seconds = max(self.max_eval_seconds, parsing["max_eval_seconds"])
+
+
+def _traced_gcf(a, b):
+    """
+    Instrumented gcf, records the call, its operand size and its duration. Euclid steps are only counted when gcf
+    would run its own Euclid loop, as math.gcd, GCF_CACHE and lehmer_gcf do not expose them
+
+    :param a: First integer
+    :param b: Second integer
+    :return: Greatest common factor of both integers
+    """
+    start = perf_counter()
+    bits = max(a.bit_length(), b.bit_length())
+    steps = 0
+    if USE_NATIVE_GCD or GCF_CACHE.capacity or bits >= LEHMER_THRESHOLD_BITS:
+        result = _UNINSTRUMENTED["gcf"](a, b)
+    else:
+        a = abs(a)
+        b = abs(b)
+        while b:
+            a, b = b, a % b
+            steps += 1
+        result = a
+    stats = STATS
+    stats.gcf_seconds += perf_counter() - start
+    stats.gcf_calls += 1
+    bucket = 1 << (bits - 1).bit_length() if bits else 0
+    stats.gcf_bits[bucket] = stats.gcf_bits.get(bucket, 0) + 1
+    if bits > stats.gcf_max_bits:
+        stats.gcf_max_bits = bits
+    stats.gcf_steps += steps
+    if steps > stats.gcf_max_steps:
+        stats.gcf_max_steps = steps
+    return result
+
+
+def _traced_parse_command_line(arguments):
     """
-    Parse the command line arguments into an eval function to return the result. Raise an exception if any improperly
-    formatted fractions or operators are found. This eval is safe because all inputs are either cast into integers or
-    sanitized against a list of allowed operands. If 'set -f' is not set before running this script, then * characters
-    must be escaped or quoted when used on the command line.
+    Instrumented parse_command_line, counts every call including those answered from RESULT_CACHE
 
     :param arguments: Arguments passed in from command line.
     :return: Fraction result from evaluated expression
     """
-    valid_operators = ["+", "-", "*", "/"]
-    parsed_list = []
-    full_command = " ".join(arguments)
+    STATS.expressions += 1
+    return _UNINSTRUMENTED["parse_command_line"](arguments)
 
-    is_fraction = True
-    for item in arguments:
-        if is_fraction:
-            f = Fraction.parse(item)
-            parsed_list.append(f)
-        else:
-            if item in valid_operators:
-                parsed_list.append(item)
-            else:
-                raise ValueError(
-                    f"Invalid input: {full_command}, {item} is not a valid operator"
-                )
-        is_fraction = not is_fraction
 
-    if is_fraction:
-        raise ValueError(f"Invalid input: {full_command}, incorrect number of operands")
+def _traced_parse_tokens(tokens, arguments):
+    """
+    Instrumented _parse_tokens, records the time spent parsing an expression
+
+    :param tokens: List of token strings from tokenize
+    :param arguments: Original arguments, used in error messages
+    :return: Tuple of the shape tuple and a list of Fraction operands
+    """
+    start = perf_counter()
+    try:
+        return _UNINSTRUMENTED["_parse_tokens"](tokens, arguments)
+    finally:
+        elapsed = perf_counter() - start
+        STATS.parse_seconds += elapsed
+        if elapsed > STATS.max_parse_seconds:
+            STATS.max_parse_seconds = elapsed
+
 
-    constructed_eval = ""
-    for item in parsed_list:
-        if isinstance(item, Fraction):
-            constructed_eval += f"Fraction({item.numerator},{item.denominator}) "
+def _traced_evaluate_expression(shape, operands):
+    """
+    Instrumented _evaluate_expression, records the time spent evaluating an expression
+
+    :param shape: Shape tuple from _parse_tokens
+    :param operands: List of Fraction operands
+    :return: Fraction result of the expression
+    """
+    start = perf_counter()
+    try:
+        return _UNINSTRUMENTED["_evaluate_expression"](shape, operands)
+    finally:
+        elapsed = perf_counter() - start
+        STATS.evaluations += 1
+        STATS.eval_seconds += elapsed
+        if elapsed > STATS.max_eval_seconds:
+            STATS.max_eval_seconds = elapsed
+
+
+def _counting_constructor(constructor):
+    """
+    Wrap a Fraction constructor so every fraction it builds is counted
+
+    :param constructor: Function taking the class or instance first, as found in Fraction.__dict__
+    :return: Wrapped function
+    """
+    def counted(*args, **kwargs):
+        STATS.fractions += 1
+        return constructor(*args, **kwargs)
+    return counted
+
+
+def _counting_method(name, method):
+    """
+    Wrap a Fraction method so its calls are counted under name
+
+    :param name: Key in Stats.calls
+    :param method: Unbound method
+    :return: Wrapped function
+    """
+    def counted(*args, **kwargs):
+        STATS.calls[name] += 1
+        return method(*args, **kwargs)
+    return counted
+
+
+def enable_stats():
+    """
+    Start collecting instrumentation counters: gcf calls with their operand sizes, Euclid steps and time, Fraction
+    allocations, simplify/simplified/normalize calls, and parse and evaluation time of parse_command_line. The
+    instrumented functions replace the originals in this module and on Fraction, so while disabled nothing is
+    measured and nothing is paid. Names imported from this module beforehand keep the uninstrumented versions
+
+    :return: None
+    """
+    global STATS
+    if STATS is not None:
+        return
+    STATS = Stats()
+    module = globals()
+    for name, traced in (
+        ("gcf", _traced_gcf),
+        ("parse_command_line", _traced_parse_command_line),
+        ("_parse_tokens", _traced_parse_tokens),
+        ("_evaluate_expression", _traced_evaluate_expression),
+    ):
+        _UNINSTRUMENTED[name] = module[name]
+        module[name] = traced
+    for name in ("__init__", "_from_parts", "_from_canonical", "simplify", "simplified", "normalize"):
+        _UNINSTRUMENTED["Fraction." + name] = Fraction.__dict__[name]
+    Fraction.__init__ = _counting_constructor(Fraction.__dict__["__init__"])
+    for name in ("_from_parts", "_from_canonical"):
+        setattr(Fraction, name, classmethod(_counting_constructor(Fraction.__dict__[name].__func__)))
+    for name in ("simplify", "simplified", "normalize"):
+        setattr(Fraction, name, _counting_method(name, Fraction.__dict__[name]))
+
+
+def disable_stats():
+    """
+    Stop collecting instrumentation counters and restore the uninstrumented functions
+
+    :return: None
+    """
+    global STATS
+    if STATS is None:
+        return
+    module = globals()
+    for name, original in _UNINSTRUMENTED.items():
+        if name.startswith("Fraction."):
+            setattr(Fraction, name[len("Fraction."):], original)
         else:
-            constructed_eval += f"{item} "
+            module[name] = original
+    _UNINSTRUMENTED.clear()
+    STATS = None
 
-    result = eval(constructed_eval)
-    return result
+
+def reset_stats():
+    """
+    Zero the instrumentation counters, if instrumentation is enabled
+
+    :return: None
+    """
+    global STATS
+    if STATS is not None:
+        STATS = Stats()
+
+
+def stats_snapshot():
+    """
+    Snapshot of the instrumentation counters
+
+    :return: Dict of counters as returned by Stats.snapshot, None if instrumentation is disabled
+    """
+    return STATS.snapshot() if STATS is not None else None
+
+
+def format_stats(snapshot):
+    """
+    Render an instrumentation snapshot as human readable lines
+
+    :param snapshot: Dict returned by stats_snapshot
+    :return: String of newline terminated lines
+    """
+    gcf_stats = snapshot["gcf"]
+    expressions = snapshot["parse_command_line"]
+    bits = ", ".join(f"<={bucket}: {count}" for bucket, count in gcf_stats["bits"].items())
+    lines = [
+        f"gcf calls: {gcf_stats['calls']} in {gcf_stats['seconds']:.6f}s, max operand bits: {gcf_stats['max_bits']}",
+        f"gcf operand bits: {bits or '-'}",
+        f"gcf Euclid steps: {gcf_stats['steps']}, max per call: {gcf_stats['max_steps']}",
+        f"Fraction allocations: {snapshot['fractions']}",
+        ", ".join(f"{name} calls: {count}" for name, count in snapshot["calls"].items()),
+        f"parse_command_line calls: {expressions['calls']}, evaluated: {expressions['evaluations']}",
+        f"parse time: {expressions['parse_seconds']:.6f}s, max {expressions['max_parse_seconds']:.6f}s",
+        f"eval time: {expressions['eval_seconds']:.6f}s, max {expressions['max_eval_seconds']:.6f}s",
+    ]
+    return "".join(line + "\n" for line in lines)
+
+
+def _write_stats_at_exit():
+    """
+    Write the instrumentation counters to standard error, registered at exit when STATS_VARIABLE is set
+
+    :return: None
+    """
+    if STATS is not None:
+        sys.stderr.write(format_stats(STATS.snapshot()))
 
 
 helptext = (
-    'Input expression to evaluate. \n\nValid operators are + - / "*" \n(Asterisk must be quoted or escaped to prevent '
-    "glob expansion in shell, or you can run 'set -f' beforehand to disable shell expansion) \n\nFractions should be "
-    "expressed as X/Y or -X/Y, and X_Y/Z or -X_Y/Z for mixed fractions"
+    'Input expression to evaluate. \n\nValid operators are + - / "*" "**" \n(Asterisk must be quoted or escaped to '
+    "prevent glob expansion in shell, or you can run 'set -f' beforehand to disable shell expansion) \n\nOperators "
+    "must be separated from their operands by spaces. Use parentheses to group, quoted like the asterisk, and a minus "
+    "sign to negate a group. Exponents of ** must be whole numbers \n\nFractions should be "
+    "expressed as X/Y or -X/Y, and X_Y/Z or -X_Y/Z for mixed fractions \n\nRun with --batch [FILE] to evaluate one "
+    "expression per line of FILE, or of standard input if FILE is omitted or -. Add --jobs N to spread a batch over N "
+    "worker processes (0 for one per CPU) and --chunk-size N to set how many lines each worker takes at a time \n\n"
+    "Run with --columns --expr EXPRESSION FILE to evaluate EXPRESSION over every row of a CSV or TSV FILE, with $1, "
+    "$2 and so on standing for the columns of the row. Each row is written out with the result appended as a new "
+    "column. Add --delimiter C to set the field delimiter (tab for a tab) and --header if the first row is a header. "
+    "--jobs and --chunk-size work as in batch mode \n\n"
+    "Use --format improper, --format decimal or --format repeating to change how results are written, and --digits N "
+    "to set the number of decimal places \n\nRun with --serve ADDRESS to start a server evaluating newline delimited "
+    "expressions sent to ADDRESS, either a Unix socket path or a [HOST:]PORT on localhost. Results are limited to "
+    f"{SERVER_MAX_BITS} bits unless --max-bits is given. Use fractulator_client.py to send it expressions \n\n"
+    "Use --max-bits N to reject results whose numerator or denominator grow past N bits, and add "
+    "--approximate to replace them with the closest fraction within N bits instead \n\nAdd --stats to write gcf, "
+    "allocation, parse and evaluation counters to standard error when done, "
+    f"or set {STATS_VARIABLE}=1 in the environment to do the same for any program using fractulator"
 )
 
+# Number of result lines collected before each write in batch mode
+BATCH_FLUSH_LINES = 4096
+# Number of lines sent to a worker process at a time when batch mode runs with --jobs
+BATCH_CHUNK_LINES = 2048
+# Number of chunks queued per worker process, bounds memory use when the input is larger than memory
+_CHUNKS_PER_JOB = 4
+# Prefix of the output line written in place of a result when a batch line fails to evaluate
+ERROR_PREFIX = "error: "
+# Name of the result column appended to the header row by evaluate_columns
+COLUMN_HEADER = "result"
+# Maximum number of bytes of pipelined requests the server reads from a connection at a time
+SERVER_READ_BYTES = 65536
+# Longest request line the server buffers, a connection sending a longer line gets an error and is closed
+SERVER_MAX_LINE_BYTES = 1 << 20
+# Command line options which are switched on by their presence
+FLAG_OPTIONS = {"--batch", "--columns", "--header", "--stats", "--approximate"}
+# Command line options which take a value, mapped to the type of the value
+VALUE_OPTIONS = {
+    "--jobs": int,
+    "--chunk-size": int,
+    "--format": str,
+    "--digits": int,
+    "--serve": str,
+    "--max-bits": int,
+    "--expr": str,
+    "--delimiter": str,
+}
+
+
+def evaluate_line(line, formatter=str):
+    """
+    Evaluate one line of batch input into the text to output for it. Failures are reported in the returned text
+    rather than raised, so one bad line cannot stop a batch
+
+    :param line: Expression string, may end with a newline
+    :param formatter: Function stringifying the resulting Fraction, see fraction_formatter
+    :return: Stringified result, an empty string for a blank line, or the error message prefixed with ERROR_PREFIX
+    """
+    line = line.strip()
+    if not line:
+        return ""
+    try:
+        return formatter(parse_command_line([line]))
+    except (ArithmeticError, ValueError) as e:
+        return ERROR_PREFIX + str(e)
+
+
+def _evaluate_chunk(lines):
+    """
+    Worker process side of parallel batch evaluation. Results are returned as plain integer pairs, which are much
+    cheaper to send back to the parent process than pickled Fraction instances
+
+    :param lines: List of expression lines
+    :return: List holding a (numerator, denominator) tuple, None for a blank line or an error string for each line
+    """
+    results = []
+    for line in lines:
+        line = line.strip()
+        if not line:
+            results.append(None)
+            continue
+        try:
+            result = parse_command_line([line])
+        except (ArithmeticError, ValueError) as e:
+            results.append(ERROR_PREFIX + str(e))
+        else:
+            results.append((result.numerator, result.denominator))
+    return results
+
+
+def _worker_settings():
+    """
+    Module settings changing arithmetic results, which worker processes started by spawn rather than fork do not
+    inherit from the parent process, so they are sent along with every chunk. Whether instrumentation is enabled is
+    sent too, so workers can collect counters for the parent process to merge
+
+    :return: Tuple of (MAX_RESULT_BITS, APPROXIMATE_RESULTS, LAZY_REDUCTION, whether STATS is enabled)
+    """
+    return MAX_RESULT_BITS, APPROXIMATE_RESULTS, LAZY_REDUCTION, STATS is not None
+
+
+def _in_worker(settings, function, *args):
+    """
+    Worker process side of every parallel evaluation, applies the settings of the parent process then runs function.
+    With instrumentation enabled the counters start from zero for each call, so the parent process can merge them
+
+    :param settings: Tuple returned by _worker_settings in the parent process
+    :param function: Function to run
+    :param args: Arguments of function
+    :return: Tuple of the result of function and its stats_snapshot, see _worker_result
+    """
+    global LAZY_REDUCTION
+    max_bits, approximate, lazy, stats = settings
+    if max_bits != MAX_RESULT_BITS or approximate != APPROXIMATE_RESULTS:
+        set_bit_limit(max_bits, approximate)
+    LAZY_REDUCTION = lazy
+    if stats:
+        enable_stats()
+        reset_stats()
+    else:
+        disable_stats()
+    return function(*args), stats_snapshot()
+
+
+def _worker_result(future):
+    """
+    Parent process side of _in_worker, waits for its result and merges the counters collected by the worker
+
+    :param future: Future returned by submitting _in_worker to the pool
+    :return: Result of the function run by _in_worker
+    """
+    result, snapshot = future.result()
+    if snapshot is not None and STATS is not None:
+        STATS.merge(snapshot)
+    return result
+
+
+def _process_pool(jobs):
+    """
+    :param jobs: Number of worker processes
+    :return: ProcessPoolExecutor running parallel evaluations, submit work to it through _in_worker
+    """
+    return ProcessPoolExecutor(max_workers=jobs)
+
+
+def _chunks(lines, size):
+    """
+    Group an iterable of lines into lists of at most size lines
+
+    :param lines: Iterable of lines
+    :param size: Maximum number of lines per chunk
+    :return: Generator of lists of lines
+    """
+    lines = iter(lines)
+    chunk = list(islice(lines, size))
+    while chunk:
+        yield chunk
+        chunk = list(islice(lines, size))
+
+
+def evaluate_lines_parallel(lines, jobs=None, chunk_size=BATCH_CHUNK_LINES, formatter=str):
+    """
+    Evaluate expression lines on a pool of worker processes, yielding the output text of each line in input order.
+    Lines are sent to the workers in chunks, and only a few chunks per worker are in flight at any time
+
+    :param lines: Iterable of expression lines
+    :param jobs: Number of worker processes, defaults to the number of CPUs
+    :param chunk_size: Number of lines per chunk
+    :param formatter: Function stringifying each resulting Fraction, see fraction_formatter
+    :return: Generator of output text, as evaluate_line would return for each line
+    """
+    jobs = jobs or os.cpu_count() or 1
+    pending = deque()
+    settings = _worker_settings()
+    with _process_pool(jobs) as pool:
+        for chunk in _chunks(lines, chunk_size):
+            pending.append(pool.submit(_in_worker, settings, _evaluate_chunk, chunk))
+            if len(pending) >= jobs * _CHUNKS_PER_JOB:
+                yield from _format_chunk(_worker_result(pending.popleft()), formatter)
+        while pending:
+            yield from _format_chunk(_worker_result(pending.popleft()), formatter)
+
+
+def _format_chunk(results, formatter):
+    """
+    Turn the results of _evaluate_chunk back into output text
+
+    :param results: List of results from _evaluate_chunk
+    :param formatter: Function stringifying a Fraction
+    :return: Generator of output text
+    """
+    for result in results:
+        if result is None:
+            yield ""
+        elif result.__class__ is tuple:
+            yield formatter(Fraction._from_canonical(*result))
+        else:
+            yield result
+
+
+def run_batch(input_stream, output_stream, jobs=1, chunk_size=BATCH_CHUNK_LINES, formatter=str):
+    """
+    Evaluate newline delimited expressions from input_stream and write one output line per input line, in order.
+    Output is written in blocks of BATCH_FLUSH_LINES lines
+
+    :param input_stream: Iterable of expression lines, such as an open file or sys.stdin
+    :param output_stream: Writable text stream for the results
+    :param jobs: Number of worker processes, 1 evaluates in this process and None uses one per CPU
+    :param chunk_size: Number of lines sent to a worker process at a time
+    :param formatter: Function stringifying each resulting Fraction, see fraction_formatter
+    :return: Number of lines which failed to evaluate
+    """
+    if jobs == 1:
+        texts = (evaluate_line(line, formatter) for line in input_stream)
+    else:
+        texts = evaluate_lines_parallel(input_stream, jobs, chunk_size, formatter)
+
+    errors = 0
+    buffer = []
+    for text in texts:
+        if text.startswith(ERROR_PREFIX):
+            errors += 1
+        buffer.append(text)
+        if len(buffer) >= BATCH_FLUSH_LINES:
+            buffer.append("")
+            output_stream.write("\n".join(buffer))
+            buffer = []
+    if buffer:
+        buffer.append("")
+        output_stream.write("\n".join(buffer))
+    output_stream.flush()
+    return errors
+
+
+def compile_columns(expression):
+    """
+    Compile an expression template over the columns of a row, where $1 is the first column ( i.e. "$1 * $2 + 1/2" )
+
+    :param expression: Expression string
+    :return: Tuple of a CompiledExpression taking the referenced column values as its operands, and a tuple of the
+             zero based index of the column read into each operand
+    """
+    template = compile_template(expression)
+    for name in template.names:
+        if name[:1] != "$" or int(name[1:]) < 1:
+            raise ValueError(f"Invalid column reference: {name}, columns are referenced as $1, $2 and so on")
+    return template.slotted(template.names), tuple(int(name[1:]) - 1 for name in template.names)
+
+
+def _evaluate_rows(lines, compiled, delimiter):
+    """
+    Evaluate a column expression against each row, also run on worker processes for parallel column evaluation.
+    Fields are split on the delimiter and scanned straight from bytes, rows holding a double quote are split by the
+    csv module instead
+
+    :param lines: List of rows as bytes
+    :param compiled: Compiled expression and column indexes, as returned by compile_columns
+    :param delimiter: Field delimiter
+    :return: List holding a (numerator, denominator) tuple, None for a blank row or an error string for each row
+    """
+    program, columns = compiled
+    width = max(columns) + 1 if columns else 0
+    separator = delimiter.encode()
+    from_canonical = Fraction._from_canonical
+    results = []
+    for line in lines:
+        line = line.rstrip(b"\r\n")
+        if not line or line.isspace():
+            results.append(None)
+            continue
+        if b'"' in line:
+            fields = [field.encode() for field in next(csv.reader([line.decode("utf-8")], delimiter=delimiter))]
+        else:
+            fields = line.split(separator)
+        try:
+            if len(fields) < width:
+                raise ValueError(f"Row has {len(fields)} columns, expression reads column {width}")
+            operands = [from_canonical(*_scan_fraction(fields[column], b"_", b"/")) for column in columns]
+            result = program.evaluate(operands)
+        except (ArithmeticError, ValueError) as e:
+            results.append(ERROR_PREFIX + str(e))
+        else:
+            results.append((result.numerator, result.denominator))
+    return results
+
+
+def _evaluate_rows_parallel(chunks, compiled, delimiter, jobs):
+    """
+    Evaluate chunks of rows on a pool of worker processes, yielding each chunk with its results in input order. Only a
+    few chunks per worker are in flight at any time
+
+    :param chunks: Iterable of lists of rows as bytes
+    :param compiled: Compiled expression and column indexes, as returned by compile_columns
+    :param delimiter: Field delimiter
+    :param jobs: Number of worker processes, None or 0 for one per CPU
+    :return: Generator of (chunk, results) tuples, see _evaluate_rows
+    """
+    jobs = jobs or os.cpu_count() or 1
+    pending = deque()
+    settings = _worker_settings()
+    with _process_pool(jobs) as pool:
+        for chunk in chunks:
+            pending.append((chunk, pool.submit(_in_worker, settings, _evaluate_rows, chunk, compiled, delimiter)))
+            if len(pending) >= jobs * _CHUNKS_PER_JOB:
+                chunk, future = pending.popleft()
+                yield chunk, _worker_result(future)
+        while pending:
+            chunk, future = pending.popleft()
+            yield chunk, _worker_result(future)
+
+
+def evaluate_columns(
+    path, output_stream, expression, delimiter=None, header=False, jobs=1, chunk_size=BATCH_CHUNK_LINES, formatter=str
+):
+    """
+    Evaluate an expression template over every row of a CSV or TSV file, writing each row back out with the result
+    appended as a new column. The file is memory mapped and read a chunk of rows at a time, so memory use does not
+    grow with the file. Rows which fail to evaluate get an error message in place of the result
+
+    :param path: Path of the input file
+    :param output_stream: Writable text stream for the output rows
+    :param expression: Expression string referencing columns as $1, $2 and so on, see compile_columns
+    :param delimiter: Field delimiter, defaults to a tab for .tsv and .tab files and a comma otherwise
+    :param header: Whether the first row is a header, it is written back with a COLUMN_HEADER column appended
+    :param jobs: Number of worker processes, 1 evaluates in this process and None or 0 uses one per CPU
+    :param chunk_size: Number of rows evaluated at a time
+    :param formatter: Function stringifying each resulting Fraction, see fraction_formatter
+    :return: Number of rows which failed to evaluate
+    """
+    compiled = compile_columns(expression)
+    if delimiter is None:
+        delimiter = "\t" if path.lower().endswith((".tsv", ".tab")) else ","
+
+    errors = 0
+    with open(path, "rb") as input_file:
+        if os.fstat(input_file.fileno()).st_size == 0:
+            return 0
+        with mmap.mmap(input_file.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            rows = iter(mapped.readline, b"")
+            if header:
+                first = next(rows)
+                output_stream.write(first.decode("utf-8").rstrip("\r\n") + delimiter + COLUMN_HEADER + "\n")
+
+            chunks = _chunks(rows, chunk_size)
+            if jobs == 1:
+                evaluated = ((chunk, _evaluate_rows(chunk, compiled, delimiter)) for chunk in chunks)
+            else:
+                evaluated = _evaluate_rows_parallel(chunks, compiled, delimiter, jobs)
+
+            for chunk, results in evaluated:
+                buffer = []
+                for line, result in zip(chunk, results):
+                    text = line.decode("utf-8").rstrip("\r\n")
+                    if result is None:
+                        buffer.append(text)
+                    elif result.__class__ is tuple:
+                        buffer.append(text + delimiter + formatter(Fraction._from_canonical(*result)))
+                    else:
+                        errors += 1
+                        buffer.append(text + delimiter + result)
+                buffer.append("")
+                output_stream.write("\n".join(buffer))
+    output_stream.flush()
+    return errors
+
+
+def parse_address(address):
+    """
+    Split a server address into its kind and target. Addresses holding a / or starting with unix: are Unix domain
+    socket paths, anything else is a TCP port, optionally preceded by a host ( i.e. 127.0.0.1:7777 or 7777 ). The
+    server has no authentication, so the host must be localhost or a loopback address
+
+    :param address: Address string
+    :return: Tuple of ("unix", path) or ("tcp", (host, port)), the host defaults to localhost
+    """
+    if address.startswith("unix:"):
+        return "unix", address[5:]
+    if "/" in address:
+        return "unix", address
+    host, _, port = address.rpartition(":")
+    host = host.strip("[]") or "127.0.0.1"
+    try:
+        port = int(port)
+        loopback = host == "localhost" or ipaddress.ip_address(host).is_loopback
+    except ValueError:
+        raise ValueError(f"Invalid server address: {address}")
+    if not loopback:
+        raise ValueError(f"Server address must be on localhost: {address}")
+    return "tcp", (host, port)
+
+
+async def _handle_connection(reader, writer, formatter):
+    """
+    Serve one client connection. Each request is a line holding an expression and each response is the line
+    evaluate_line returns for it. Clients may pipeline any number of requests, they are read and answered in blocks of
+    up to SERVER_READ_BYTES with responses in request order. Blocks are evaluated on the default executor so the event
+    loop keeps serving other connections meanwhile. A line longer than SERVER_MAX_LINE_BYTES ends the connection
+
+    :param reader: asyncio StreamReader of the connection
+    :param writer: asyncio StreamWriter of the connection
+    :param formatter: Function stringifying each resulting Fraction
+    :return: None
+    """
+    loop = asyncio.get_event_loop()
+    partial_line = b""
+    try:
+        while True:
+            data = await reader.read(SERVER_READ_BYTES)
+            if not data:
+                break
+            lines = (partial_line + data).split(b"\n")
+            partial_line = lines.pop()
+            response = await loop.run_in_executor(None, _respond, lines, formatter)
+            too_long = len(partial_line) > SERVER_MAX_LINE_BYTES
+            if too_long:
+                response += f"{ERROR_PREFIX}Request line exceeds {SERVER_MAX_LINE_BYTES} bytes\n".encode()
+                partial_line = b""
+            writer.write(response)
+            await writer.drain()
+            if too_long:
+                break
+        if partial_line:
+            writer.write(await loop.run_in_executor(None, _respond, [partial_line], formatter))
+            await writer.drain()
+    except ConnectionError:
+        pass
+    finally:
+        writer.close()
+
+
+def _respond(lines, formatter):
+    """
+    Evaluate request lines into the bytes of their response lines
+
+    :param lines: List of request lines as bytes, without newlines
+    :param formatter: Function stringifying each resulting Fraction
+    :return: bytes holding one response line per request
+    """
+    responses = [evaluate_line(line.decode("utf-8", "replace"), formatter) for line in lines]
+    responses.append("")
+    return "\n".join(responses).encode()
+
+
+def start_server(address, formatter=str):
+    """
+    Coroutine starting an evaluation server on the current event loop
+
+    :param address: Address to listen on, see parse_address
+    :param formatter: Function stringifying each resulting Fraction, see fraction_formatter
+    :return: Coroutine returning the asyncio Server
+    """
+    kind, target = parse_address(address)
+
+    async def handler(reader, writer):
+        await _handle_connection(reader, writer, formatter)
+
+    if kind == "unix":
+        return asyncio.start_unix_server(handler, path=target)
+    return asyncio.start_server(handler, *target)
+
+
+def serve(address, formatter=str):
+    """
+    Run an evaluation server until interrupted, so callers can skip interpreter startup and module import on every
+    expression. See fractulator_client.py for a client
+
+    :param address: Address to listen on, see parse_address
+    :param formatter: Function stringifying each resulting Fraction, see fraction_formatter
+    :return: None
+    """
+    loop = asyncio.new_event_loop()
+    server = loop.run_until_complete(start_server(address, formatter))
+    try:
+        # Stopping the loop from a handler rather than raising KeyboardInterrupt lets open connections close cleanly
+        for stop_signal in (signal.SIGINT, signal.SIGTERM):
+            loop.add_signal_handler(stop_signal, loop.stop)
+    except (NotImplementedError, AttributeError):  # pragma: no cover
+        pass
+    try:
+        loop.run_forever()
+    except KeyboardInterrupt:  # pragma: no cover
+        pass
+    finally:
+        server.close()
+        loop.run_until_complete(server.wait_closed())
+        loop.close()
+        kind, target = parse_address(address)
+        if kind == "unix" and os.path.exists(target):
+            os.remove(target)
+
+
+def parse_options(arguments):
+    """
+    Split the leading -- options off the command line arguments. Options must come before the expression, so the
+    minus sign of a negative fraction is never mistaken for an option
+
+    :param arguments: Command line arguments, excluding the program name
+    :return: Tuple of a dict of option values keyed by name without dashes ( i.e. chunk_size ), and remaining arguments
+    """
+    options = {}
+    index = 0
+    while index < len(arguments) and arguments[index].startswith("--"):
+        name = arguments[index]
+        key = name[2:].replace("-", "_")
+        if name in FLAG_OPTIONS:
+            options[key] = True
+            index += 1
+        elif name in VALUE_OPTIONS:
+            if index + 1 >= len(arguments):
+                raise ValueError(f"Missing value for option {name}")
+            try:
+                options[key] = VALUE_OPTIONS[name](arguments[index + 1])
+            except ValueError:
+                raise ValueError(f"Invalid value for option {name}: {arguments[index + 1]}")
+            index += 2
+        else:
+            raise ValueError(f"Unknown option: {name}")
+    return options, arguments[index:]
+
+
+def main(arguments):
+    """
+    Command line entry point, evaluates a single expression or runs batch mode
+
+    :param arguments: Command line arguments, excluding the program name
+    :return: Process exit code
+    """
+    if not arguments or {"-h", "--help"}.intersection(arguments):
+        print("\n")
+        print(helptext)
+        return 0
+
+    try:
+        options, arguments = parse_options(arguments)
+        if not (options.get("batch") or options.get("columns")) and ("jobs" in options or "chunk_size" in options):
+            raise ValueError("--jobs and --chunk-size can only be used with --batch or --columns")
+        if not options.get("columns") and ({"expr", "delimiter", "header"} & set(options)):
+            raise ValueError("--expr, --delimiter and --header can only be used with --columns")
+        if options.get("columns") and ("expr" not in options or len(arguments) != 1):
+            raise ValueError("--columns needs an --expr and a FILE")
+        if options.get("columns"):
+            compile_columns(options["expr"])
+        if options.get("delimiter") == "tab":
+            options["delimiter"] = "\t"
+        if len(options.get("delimiter", ",")) != 1:
+            raise ValueError("--delimiter must be a single character, or tab")
+        if options.get("jobs", 1) < 0 or options.get("chunk_size", 1) < 1:
+            raise ValueError("--jobs cannot be negative and --chunk-size must be at least 1")
+        formatter = fraction_formatter(options.get("format", "mixed"), options.get("digits", DECIMAL_DIGITS))
+        if "serve" in options:
+            parse_address(options["serve"])
+            options.setdefault("max_bits", SERVER_MAX_BITS)
+        if options.get("approximate") and "max_bits" not in options:
+            raise ValueError("--approximate can only be used with --max-bits")
+        if options.get("max_bits", 1) < 1:
+            raise ValueError("--max-bits must be at least 1")
+    except ValueError as e:
+        print("\n")
+        print(str(e), "\n")
+        print(helptext)
+        return 1
+
+    limit = MAX_RESULT_BITS, APPROXIMATE_RESULTS
+    if "max_bits" in options:
+        set_bit_limit(options["max_bits"], options.get("approximate", False))
+    collect_stats = options.get("stats") and STATS is None
+    if collect_stats:
+        enable_stats()
+    try:
+        return _run_command(options, arguments, formatter)
+    finally:
+        if "max_bits" in options:
+            set_bit_limit(*limit)
+        if collect_stats:
+            sys.stderr.write(format_stats(stats_snapshot()))
+            disable_stats()
+
+
+def _run_command(options, arguments, formatter):
+    """
+    Run the server, batch mode or single expression evaluation selected by the parsed command line
+
+    :param options: Dict of option values from parse_options
+    :param arguments: Remaining command line arguments
+    :param formatter: Callable turning a Fraction into its output string
+    :return: Process exit code
+    """
+    if "serve" in options:
+        serve(options["serve"], formatter)
+        return 0
+
+    if options.get("columns"):
+        errors = evaluate_columns(
+            arguments[0],
+            sys.stdout,
+            options["expr"],
+            delimiter=options.get("delimiter"),
+            header=options.get("header", False),
+            jobs=options.get("jobs", 1),
+            chunk_size=options.get("chunk_size", BATCH_CHUNK_LINES),
+            formatter=formatter,
+        )
+        return 1 if errors else 0
+
+    if options.get("batch"):
+        path = arguments[0] if arguments else "-"
+        batch_options = {
+            "jobs": options.get("jobs", 1),
+            "chunk_size": options.get("chunk_size", BATCH_CHUNK_LINES),
+            "formatter": formatter,
+        }
+        if path == "-":
+            errors = run_batch(sys.stdin, sys.stdout, **batch_options)
+        else:
+            with open(path) as input_stream:
+                errors = run_batch(input_stream, sys.stdout, **batch_options)
+        return 1 if errors else 0
+
+    try:
+        print(formatter(parse_command_line(arguments)))
+    except Exception as e:
+        print("\n")
+        print(str(e), "\n")
+        print(helptext)
+        return 1
+    return 0
+
+
+if os.environ.get(STATS_VARIABLE):
+    enable_stats()
+    atexit.register(_write_stats_at_exit)
+
+
 # Note: argparse does not play well with - characters, so it made negative numbers an issue. Raw argv parsing works
 #       just as well for simple string data
 if __name__ == "__main__":   # pragma: no cover
-    if len(argv) == 1 or {"-h", "--help"}.intersection(argv):
-        print("\n")
-        print(helptext)
-    else:
-        try:
-            print(parse_command_line(argv[1:]))
-        except Exception as e:
-            print("\n")
-            print(str(e), "\n")
-            print(helptext)
+    sys.exit(main(sys.argv[1:]))
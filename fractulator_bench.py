@@ -0,0 +1,439 @@
+#!/usr/bin/env python
+"""
+Correctness and throughput benchmark for the fractulator integer core, using the standard library fractions.Fraction
+and math.gcd as the reference. Run with `./fractulator_bench.py` or `./fractulator_bench.py --digits 64 1000`
+
+The benchmark suite covers gcf/lcm, every Fraction operator with fraction and int operands, parsing, str and
+parse_command_line, and reports operations per second and peak allocated bytes. Save a baseline and check later runs
+against it with `./fractulator_bench.py --suite --save baseline.json` and
+`./fractulator_bench.py --baseline baseline.json`
+
+Exact linear algebra is timed with `./fractulator_bench.py --matrix`, solving, inverting and taking the determinant of
+random 50x50 and 200x200 matrices (or the sizes given) against naive fractions.Fraction elimination
+"""
+import argparse
+import fractions
+import json
+import math
+import platform
+import random
+import time
+import timeit
+import tracemalloc
+
+import fractulator
+from fractulator import Fraction, FractionMatrix, gcf, gcf_many, binary_gcf, lehmer_gcf, lcm
+from fractulator import cache_stats, configure_caches, parse_command_line
+
+__author__ = "John Mahoney"
+
+DEFAULT_DIGITS = [64, 1000, 10000]
+BITS_PER_DIGIT = math.log2(10)
+# Matrix sizes timed by --matrix when no sizes are given
+DEFAULT_MATRIX_SIZES = [50, 200]
+# Largest matrix size the naive fractions.Fraction elimination is timed at, beyond it the reference takes minutes
+NAIVE_MATRIX_LIMIT = 50
+
+
+def random_int(digits, rng):
+    """
+    Build a random positive integer with roughly the given number of decimal digits
+
+    :param digits: Number of decimal digits
+    :param rng: random.Random instance to draw from
+    :return: Random integer
+    """
+    return rng.getrandbits(int(digits * BITS_PER_DIGIT)) | 1
+
+
+def operand_pairs(digits, count, rng):
+    """
+    Build pairs of operands sharing a sizeable common factor so that the gcd is not trivially 1
+
+    :param digits: Number of decimal digits per operand
+    :param count: Number of pairs to build
+    :param rng: random.Random instance to draw from
+    :return: List of (a, b) integer tuples
+    """
+    pairs = []
+    for _ in range(count):
+        common = random_int(max(digits // 4, 1), rng)
+        pairs.append(
+            (random_int(digits, rng) * common, -random_int(digits, rng) * common)
+        )
+    return pairs
+
+
+def pure_gcf(a, b):
+    """
+    Run gcf with math.gcd dispatch switched off
+
+    :param a: First integer
+    :param b: Second integer
+    :return: Greatest common factor of both integers
+    """
+    native = fractulator.USE_NATIVE_GCD
+    fractulator.USE_NATIVE_GCD = False
+    try:
+        return gcf(a, b)
+    finally:
+        fractulator.USE_NATIVE_GCD = native
+
+
+def check_correctness(digits, count, rng):
+    """
+    Compare gcf, lcm and every Fraction operator against the standard library for operands of the given size
+
+    :param digits: Number of decimal digits per operand
+    :param count: Number of random cases to check
+    :param rng: random.Random instance to draw from
+    :return: Number of mismatches found
+    """
+    failures = 0
+    for a, b in operand_pairs(digits, count, rng):
+        expected_gcd = math.gcd(a, b)
+        for engine in (gcf, pure_gcf, binary_gcf, lehmer_gcf):
+            if engine(a, b) != expected_gcd:
+                failures += 1
+        if gcf_many([a, b, a + b]) != expected_gcd:
+            failures += 1
+        if lcm(a, b) != abs(a * b) // expected_gcd:
+            failures += 1
+
+    for (a, b), (c, d) in zip(
+        operand_pairs(digits, count, rng), operand_pairs(digits, count, rng)
+    ):
+        ours = Fraction(a, b), Fraction(c, d)
+        theirs = fractions.Fraction(a, b), fractions.Fraction(c, d)
+        for op in ("__add__", "__sub__", "__mul__", "__truediv__"):
+            result = getattr(ours[0], op)(ours[1]).simplified()
+            expected = getattr(theirs[0], op)(theirs[1])
+            if (result.numerator, result.denominator) != (
+                expected.numerator,
+                expected.denominator,
+            ):
+                failures += 1
+    return failures
+
+
+def time_per_call(func, number):
+    """
+    Best of three timings of func, expressed per call
+
+    :param func: Zero argument callable to time
+    :param number: Number of calls per timing run
+    :return: Seconds per call
+    """
+    return min(timeit.repeat(func, number=number, repeat=3)) / number
+
+
+def measure_throughput(digits, rng):
+    """
+    Measure operations per second of the gcf engines and Fraction operators against the standard library
+
+    :param digits: Number of decimal digits per operand
+    :param rng: random.Random instance to draw from
+    :return: List of (name, ours ops/sec, reference ops/sec) tuples
+    """
+    number = max(1, 20000 // digits)
+    (a, b), (c, d) = operand_pairs(digits, 2, rng)
+    ours = Fraction(a, b), Fraction(c, d)
+    theirs = fractions.Fraction(a, b), fractions.Fraction(c, d)
+
+    rows = []
+    reference = time_per_call(lambda: math.gcd(a, b), number)
+    for engine in (gcf, pure_gcf, binary_gcf, lehmer_gcf):
+        rows.append(
+            (engine.__name__, 1 / time_per_call(lambda: engine(a, b), number), 1 / reference)
+        )
+
+    for name, op in (("+", "__add__"), ("-", "__sub__"), ("*", "__mul__"), ("/", "__truediv__")):
+        ours_op = getattr(ours[0], op)
+        theirs_op = getattr(theirs[0], op)
+        rows.append(
+            (
+                f"Fraction {name}",
+                1 / time_per_call(lambda: ours_op(ours[1]), number),
+                1 / time_per_call(lambda: theirs_op(theirs[1]), number),
+            )
+        )
+    return rows
+
+
+def random_matrix(size, rng):
+    """
+    Build a random square matrix of small fractions
+
+    :param size: Number of rows and columns
+    :param rng: random.Random instance to draw from
+    :return: List of rows, each a list of Fractions
+    """
+    return [[Fraction(rng.randint(-99, 99), rng.randint(1, 9)) for _ in range(size)] for _ in range(size)]
+
+
+def naive_solve(rows, values):
+    """
+    Reference solver, Gauss-Jordan elimination with fractions.Fraction reducing every intermediate value
+
+    :param rows: Square matrix as a list of rows of fractions.Fraction
+    :param values: Right hand side, one fractions.Fraction per row
+    :return: List of fractions.Fraction solutions
+    """
+    rows = [list(row) + [value] for row, value in zip(rows, values)]
+    size = len(rows)
+    for k in range(size):
+        pivot = next(i for i in range(k, size) if rows[i][k])
+        rows[k], rows[pivot] = rows[pivot], rows[k]
+        pivot_row = [value / rows[k][k] for value in rows[k]]
+        rows[k] = pivot_row
+        for i in range(size):
+            if i != k and rows[i][k]:
+                factor = rows[i][k]
+                rows[i] = [a - factor * b for a, b in zip(rows[i], pivot_row)]
+    return [row[size] for row in rows]
+
+
+def measure_matrix(size, rng):
+    """
+    Time single FractionMatrix solve, determinant, inverse and product calls on a random matrix, and check the solve
+    against naive_solve for sizes up to NAIVE_MATRIX_LIMIT
+
+    :param size: Number of rows and columns
+    :param rng: random.Random instance to draw from
+    :return: List of (name, seconds, reference seconds or None) tuples, raises AssertionError on a wrong solution
+    """
+    rows = random_matrix(size, rng)
+    values = [Fraction(rng.randint(-99, 99)) for _ in range(size)]
+    matrix = FractionMatrix(rows)
+
+    def timed(func):
+        start = time.perf_counter()
+        result = func()
+        return result, time.perf_counter() - start
+
+    solution, seconds = timed(lambda: matrix.solve(values))
+    reference_seconds = None
+    if size <= NAIVE_MATRIX_LIMIT:
+        expected, reference_seconds = timed(lambda: naive_solve(
+            [[fractions.Fraction(value.numerator, value.denominator) for value in row] for row in rows],
+            [fractions.Fraction(value.numerator) for value in values],
+        ))
+        assert [(value.numerator, value.denominator) for value in solution] == [
+            (value.numerator, value.denominator) for value in expected
+        ], f"{size}x{size} solve does not match fractions.Fraction"
+    results = [(f"solve {size}x{size}", seconds, reference_seconds)]
+    for name, func in (
+        ("determinant", matrix.determinant),
+        ("inverse", matrix.inverse),
+        ("product", lambda: matrix @ matrix),
+    ):
+        results.append((f"{name} {size}x{size}", timed(func)[1], None))
+    return results
+
+
+def build_suite(rng):
+    """
+    Build the benchmark suite covering the gcf engines, every Fraction operator, parsing, stringifying and expression
+    evaluation. Each case pairs a call into fractulator with the equivalent standard library call where there is one
+
+    :param rng: random.Random instance to draw operands from
+    :return: List of (name, callable, reference callable or None) tuples
+    """
+    cases = []
+    for label, digits in (("small", 3), ("word", 18), ("4k digit", 4000)):
+        (a, b), = operand_pairs(digits, 1, rng)
+        cases.append((f"gcf {label}", lambda a=a, b=b: gcf(a, b), lambda a=a, b=b: math.gcd(a, b)))
+        cases.append((f"lcm {label}", lambda a=a, b=b: lcm(a, b), lambda a=a, b=b: abs(a * b) // math.gcd(a, b)))
+
+    ours = Fraction(355, 113), Fraction(-22, 7)
+    theirs = fractions.Fraction(355, 113), fractions.Fraction(-22, 7)
+    for name, op in (
+        ("+", "__add__"),
+        ("-", "__sub__"),
+        ("*", "__mul__"),
+        ("/", "__truediv__"),
+        ("==", "__eq__"),
+        ("<", "__lt__"),
+    ):
+        cases.append(
+            (
+                f"Fraction {name}",
+                lambda op=getattr(ours[0], op): op(ours[1]),
+                lambda op=getattr(theirs[0], op): op(theirs[1]),
+            )
+        )
+
+    cases.append(("Fraction + int", lambda: ours[0] + 7, lambda: theirs[0] + 7))
+    cases.append(("Fraction * int", lambda: ours[0] * 14, lambda: theirs[0] * 14))
+    cases.append(("int / Fraction", lambda: 14 / ours[0], lambda: 14 / theirs[0]))
+
+    for label, text, reference in (
+        ("whole", "-12345", lambda: fractions.Fraction("-12345")),
+        ("proper", "355/113", lambda: fractions.Fraction("355/113")),
+        ("mixed", "-3_16/113", lambda: -(fractions.Fraction(3) + fractions.Fraction("16/113"))),
+    ):
+        cases.append((f"parse {label}", lambda text=text: Fraction.parse(text), reference))
+
+    cases.append(("hash", lambda: hash(ours[0]), lambda: hash(theirs[0])))
+    values = [Fraction(rng.randrange(-1000, 1000), rng.randrange(1, 1000)) for _ in range(1000)]
+    references = [fractions.Fraction(value.numerator, value.denominator) for value in values]
+    cases.append(("sort 1000", lambda: Fraction.sort_many(values), lambda: sorted(references)))
+
+    mixed = Fraction(-355, 113)
+    mixed_reference = fractions.Fraction(-355, 113)
+    rows = random_matrix(10, rng)
+    matrix = FractionMatrix(rows)
+    reference_rows = [[fractions.Fraction(value.numerator, value.denominator) for value in row] for row in rows]
+    ones = [fractions.Fraction(1)] * 10
+    cases.append(("matrix solve 10x10", lambda: matrix.solve([1] * 10), lambda: naive_solve(reference_rows, ones)))
+
+    cases.append(("str", lambda: str(mixed), lambda: str(mixed_reference)))
+
+    short = ["1/2", "+", "3/4"]
+    long = " ".join(f"{n}_{n}/{n + 1} {'+-*/'[n % 4]}" for n in range(1, 40)).split() + ["7"]
+    cases.append(("parse_command_line short", lambda: parse_command_line(short), None))
+    cases.append(("parse_command_line long", lambda: parse_command_line(long), None))
+    return cases
+
+
+def measure_ops(func):
+    """
+    Operations per second of func, timing enough calls for at least 0.2 seconds, best of three
+
+    :param func: Zero argument callable
+    :return: Calls per second
+    """
+    timer = timeit.Timer(func)
+    number, _ = timer.autorange()
+    return number / min(timer.repeat(repeat=3, number=number))
+
+
+def measure_peak_bytes(func):
+    """
+    Peak memory allocated during a single call of func, as traced by tracemalloc
+
+    :param func: Zero argument callable
+    :return: Peak allocated bytes
+    """
+    func()
+    tracemalloc.start()
+    try:
+        func()
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def run_suite(cases):
+    """
+    Run every benchmark case with the memoization caches disabled, so repeated calls measure the real work
+
+    :param cases: List of (name, callable, reference callable or None) tuples from build_suite
+    :return: Dict of case name to a dict of ops_per_sec, reference_ops_per_sec and peak_bytes
+    """
+    sizes = {name: stats["capacity"] for name, stats in cache_stats().items() if name != "expression"}
+    configure_caches(parse_size=0, result_size=0, gcf_size=0)
+    results = {}
+    try:
+        for name, func, reference in cases:
+            results[name] = {
+                "ops_per_sec": measure_ops(func),
+                "reference_ops_per_sec": measure_ops(reference) if reference else None,
+                "peak_bytes": measure_peak_bytes(func),
+            }
+    finally:
+        configure_caches(parse_size=sizes["parse"], result_size=sizes["result"], gcf_size=sizes["gcf"])
+    return results
+
+
+def print_results(results):
+    """
+    Print suite results as a table
+
+    :param results: Dict returned by run_suite
+    :return: None
+    """
+    print(f"{'case':<28}{'ops/sec':>14}{'reference':>14}{'ratio':>8}{'peak bytes':>12}")
+    for name, result in results.items():
+        reference = result["reference_ops_per_sec"]
+        ratio = f"{result['ops_per_sec'] / reference:>8.2f}" if reference else f"{'-':>8}"
+        reference = f"{reference:>14.1f}" if reference else f"{'-':>14}"
+        print(f"{name:<28}{result['ops_per_sec']:>14.1f}{reference}{ratio}{result['peak_bytes']:>12}")
+
+
+def find_regressions(results, baseline, threshold):
+    """
+    Compare suite results against a saved baseline
+
+    :param results: Dict returned by run_suite
+    :param baseline: Dict returned by run_suite for an earlier run, as saved with --save
+    :param threshold: Allowed fractional slowdown, 0.2 flags cases running at less than 80% of their baseline speed
+    :return: List of (name, baseline ops/sec, current ops/sec) tuples for every regressed case
+    """
+    regressions = []
+    for name, result in results.items():
+        if name in baseline:
+            expected = baseline[name]["ops_per_sec"]
+            if result["ops_per_sec"] < expected * (1 - threshold):
+                regressions.append((name, expected, result["ops_per_sec"]))
+    return regressions
+
+
+def main(args=None):
+    """
+    Run the correctness check and throughput benchmark for each requested operand size, or the benchmark suite with
+    --suite
+
+    :param args: Argument list, defaults to sys.argv
+    :return: Process exit code, non zero if any correctness check failed or any case regressed against the baseline
+    """
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--digits", type=int, nargs="+", default=DEFAULT_DIGITS)
+    parser.add_argument("--cases", type=int, default=20, help="random cases per size for the correctness check")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--suite", action="store_true", help="run the benchmark suite instead")
+    parser.add_argument("--save", metavar="PATH", help="save suite results as JSON")
+    parser.add_argument("--baseline", metavar="PATH", help="fail if the suite regresses against these saved results")
+    parser.add_argument("--threshold", type=float, default=0.2, help="allowed slowdown against the baseline")
+    parser.add_argument("--matrix", type=int, nargs="*", metavar="SIZE", help="time exact linear algebra instead")
+    options = parser.parse_args(args)
+
+    rng = random.Random(options.seed)
+    if options.matrix is not None:
+        print(f"{'operation':<24}{'seconds':>12}{'reference':>12}{'ratio':>8}")
+        for size in options.matrix or DEFAULT_MATRIX_SIZES:
+            for name, seconds, reference in measure_matrix(size, rng):
+                ratio = f"{reference / seconds:>8.2f}" if reference else f"{'-':>8}"
+                reference = f"{reference:>12.3f}" if reference else f"{'-':>12}"
+                print(f"{name:<24}{seconds:>12.3f}{reference}{ratio}")
+        return 0
+
+    if options.suite or options.save or options.baseline:
+        results = run_suite(build_suite(rng))
+        print_results(results)
+        if options.save:
+            with open(options.save, "w") as results_file:
+                json.dump({"python": platform.python_version(), "results": results}, results_file, indent=2)
+        if options.baseline:
+            with open(options.baseline) as baseline_file:
+                baseline = json.load(baseline_file)["results"]
+            regressions = find_regressions(results, baseline, options.threshold)
+            for name, expected, actual in regressions:
+                print(f"REGRESSION {name}: {actual:.1f} ops/sec against a baseline of {expected:.1f}")
+            return 1 if regressions else 0
+        return 0
+
+    total_failures = 0
+    for digits in options.digits:
+        failures = check_correctness(digits, options.cases, rng)
+        total_failures += failures
+        print(f"\n{digits} digits: {failures} mismatches against fractions.Fraction")
+        print(f"{'operation':<16}{'ops/sec':>14}{'reference':>14}{'ratio':>8}")
+        for name, ours, reference in measure_throughput(digits, rng):
+            print(f"{name:<16}{ours:>14.1f}{reference:>14.1f}{ours / reference:>8.2f}")
+
+    return 1 if total_failures else 0
+
+
+if __name__ == "__main__":  # pragma: no cover
+    raise SystemExit(main())
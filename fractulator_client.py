@@ -0,0 +1,113 @@
+#!/usr/bin/env python
+"""
+Thin client for a fractulator server started with `./fractulator.py --serve ADDRESS`. Only the standard library socket
+module is imported, so a call costs interpreter startup plus one round trip instead of a full fractulator import.
+
+    ./fractulator_client.py --server /tmp/fractulator.sock 6/3 + 14/2
+    FRACTULATOR_SERVER=7777 ./fractulator_client.py 6/3 + 14/2
+    ./fractulator_client.py --server 7777 < expressions.txt
+"""
+import os
+import socket
+import sys
+import threading
+
+__author__ = "John Mahoney"
+
+# Environment variable holding the server address when --server is not given
+ADDRESS_VARIABLE = "FRACTULATOR_SERVER"
+# Prefix of a response line reporting that an expression failed to evaluate, matches fractulator.ERROR_PREFIX
+ERROR_PREFIX = "error: "
+
+
+def parse_address(address):
+    """
+    Split a server address into its kind and target, following the rules of fractulator.parse_address without
+    importing it. Addresses holding a / or starting with unix: are Unix domain socket paths, anything else is a TCP
+    port, optionally preceded by a host which may be bracketed ( i.e. [::1]:7777 )
+
+    :param address: Address string
+    :return: Tuple of ("unix", path) or ("tcp", (host, port)), the host defaults to localhost
+    """
+    if address.startswith("unix:"):
+        return "unix", address[5:]
+    if "/" in address:
+        return "unix", address
+    host, _, port = address.rpartition(":")
+    try:
+        return "tcp", (host.strip("[]") or "127.0.0.1", int(port))
+    except ValueError:
+        raise ValueError(f"Invalid server address: {address}")
+
+
+def connect(address):
+    """
+    Open a connection to a fractulator server
+
+    :param address: Unix socket path, or [HOST:]PORT with the host defaulting to localhost, see parse_address
+    :return: Connected socket
+    """
+    kind, target = parse_address(address)
+    if kind == "unix":
+        connection = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            connection.connect(target)
+        except OSError:
+            connection.close()
+            raise
+        return connection
+    return socket.create_connection(target)
+
+
+def evaluate(address, expressions):
+    """
+    Send expressions to the server, pipelined over one connection, and collect the responses. Requests are written
+    from a separate thread so neither side can block on a full socket buffer
+
+    :param address: Server address, see connect
+    :param expressions: Iterable of expression strings, one per request
+    :return: List of response lines, one per expression, in order
+    """
+    connection = connect(address)
+
+    def send():
+        for expression in expressions:
+            connection.sendall(" ".join(expression.split()).encode() + b"\n")
+        connection.shutdown(socket.SHUT_WR)
+
+    sender = threading.Thread(target=send)
+    sender.start()
+    with connection, connection.makefile("r", encoding="utf-8") as responses:
+        results = [response.rstrip("\n") for response in responses]
+    sender.join()
+    return results
+
+
+def main(arguments):
+    """
+    Forward the expression in arguments to the server and print its response. With no expression, every line of
+    standard input is forwarded instead and the responses are printed in order
+
+    :param arguments: Command line arguments, excluding the program name
+    :return: Process exit code, 1 if any expression failed to evaluate and 2 if the server could not be reached
+    """
+    address = os.environ.get(ADDRESS_VARIABLE)
+    if arguments[:1] == ["--server"]:
+        address = arguments[1] if len(arguments) > 1 else None
+        arguments = arguments[2:]
+    if not address:
+        print(f"No server address, use --server ADDRESS or set {ADDRESS_VARIABLE}")
+        return 2
+
+    expressions = [" ".join(arguments)] if arguments else sys.stdin
+    try:
+        responses = evaluate(address, expressions)
+    except (OSError, ValueError) as e:
+        print(f"Cannot reach the server at {address}: {e}")
+        return 2
+    sys.stdout.write("".join(response + "\n" for response in responses))
+    return 1 if any(response.startswith(ERROR_PREFIX) for response in responses) else 0
+
+
+if __name__ == "__main__":  # pragma: no cover
+    sys.exit(main(sys.argv[1:]))
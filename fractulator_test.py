@@ -1,5 +1,66 @@
+import io
+import asyncio
+import bisect
+import fractions
+import functools
+import heapq
+import math
+import mmap
+import multiprocessing
+import operator
+import os
+import pickle
+import signal
+import socket
+import sys
+import tempfile
+import threading
+import time
 import unittest
-from fractulator import Fraction, parse_command_line, gcf, lcm
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import redirect_stderr, redirect_stdout
+from decimal import Decimal
+from itertools import islice
+from unittest import mock
+
+try:
+    import numpy
+except ImportError:  # pragma: no cover
+    numpy = None
+import fractulator
+import fractulator_bench
+import fractulator_client
+from fractulator import (
+    Fraction,
+    FractionArray,
+    FractionMatrix,
+    LRUCache,
+    binary_gcf,
+    cache_stats,
+    clear_caches,
+    compile_expression,
+    configure_caches,
+    decode_fractions,
+    encode_fractions,
+    evaluate_line,
+    format_many,
+    fprod,
+    fsum,
+    gcf,
+    gcf_many,
+    lcm,
+    lehmer_gcf,
+    main,
+    mean,
+    parse_address,
+    parse_command_line,
+    parse_options,
+    run_batch,
+    start_server,
+    tokenize,
+    variance,
+    write_many,
+)
 
 
 class GcmLcfTest(unittest.TestCase):
@@ -17,6 +78,60 @@ class GcmLcfTest(unittest.TestCase):
         self.assertEqual(gcf(-12, -8), 4)
         self.assertEqual(gcf(-9, 12), 3)
 
+    def test_gcf_zero(self):
+        self.assertEqual(gcf(0, 5), 5)
+        self.assertEqual(gcf(-5, 0), 5)
+        self.assertEqual(gcf(0, 0), 0)
+        self.assertEqual(lcm(0, 5), 0)
+
+    def test_gcf_engines(self):
+        for engine in (binary_gcf, lehmer_gcf):
+            self.assertEqual(engine(14, 8), 2)
+            self.assertEqual(engine(-12, -8), 4)
+            self.assertEqual(engine(0, -9), 9)
+            self.assertEqual(engine(7, 0), 7)
+
+    def test_gcf_large(self):
+        common = 3 ** 2000 * 7
+        a = common * (2 ** 9000 + 1)
+        b = -common * (5 ** 4000 + 2)
+        expected = math.gcd(a, b)
+        self.assertEqual(gcf(a, b), expected)
+        self.assertEqual(binary_gcf(a, b), expected)
+        self.assertEqual(lehmer_gcf(a, b), expected)
+        self.assertEqual(lcm(a, b), abs(a * b) // expected)
+
+    def test_lcm_exact_past_float_range(self):
+        a = 2 ** 64 + 1
+        b = 2 ** 64 - 1
+        self.assertEqual(lcm(a, b), a * b)
+
+    def test_gcf_fibonacci(self):
+        a, b = 1, 1
+        for _ in range(5000):
+            a, b = b, a + b
+        self.assertEqual(gcf(a, b), 1)
+        self.assertEqual(gcf(a * 6, -b * 6), 6)
+
+    def test_gcf_many(self):
+        self.assertEqual(gcf_many([12, 18, -30]), 6)
+        self.assertEqual(gcf_many(iter([7])), 7)
+        self.assertEqual(gcf_many([4, 9, 2 ** 100]), 1)
+        self.assertEqual(gcf_many([]), 0)
+
+
+class PureGcmLcfTest(GcmLcfTest):
+    """
+    Rerun the gcf/lcm tests with math.gcd dispatch switched off so the pure Python engines run
+    """
+
+    def setUp(self):
+        self.native = fractulator.USE_NATIVE_GCD
+        fractulator.USE_NATIVE_GCD = False
+
+    def tearDown(self):
+        fractulator.USE_NATIVE_GCD = self.native
+
 
 class FractulatorTest(unittest.TestCase):
     f1 = Fraction(1, 2)
@@ -95,6 +210,41 @@ class FractulatorTest(unittest.TestCase):
 
         self.assertEqual(result, Fraction(3, 2))
 
+    def test_cross_cancellation(self):
+        result = Fraction(4, 9) * Fraction(3, 8)
+        self.assertEqual((result.numerator, result.denominator), (1, 6))
+        result = Fraction(4, 9) / Fraction(-8, 3)
+        self.assertEqual((result.numerator, result.denominator), (-1, 6))
+        result = Fraction(1, 6) + Fraction(1, 10)
+        self.assertEqual((result.numerator, result.denominator), (4, 15))
+        result = Fraction(1, 6) - Fraction(1, 6)
+        self.assertEqual((result.numerator, result.denominator), (0, 1))
+
+    def test_product_chain_stays_reduced(self):
+        result = Fraction(1)
+        for k in range(1, 200):
+            result = result * Fraction(k + 1, k)
+        self.assertEqual(result, Fraction(200))
+
+    def test_division_by_zero(self):
+        with self.assertRaises(ZeroDivisionError):
+            self.f1 / Fraction(0)
+
+    def test_negation(self):
+        self.assertEqual(-Fraction(6, 4), Fraction(-3, 2))
+        self.assertEqual(-Fraction(-1, 3), Fraction(1, 3))
+
+    def test_power(self):
+        self.assertEqual(Fraction(-2, 3) ** 3, Fraction(-8, 27))
+        self.assertEqual(Fraction(-2, 3) ** Fraction(-2), Fraction(9, 4))
+        self.assertEqual(Fraction(-2, 3) ** -1, Fraction(-3, 2))
+        self.assertEqual(Fraction(5, 7) ** 0, Fraction(1))
+        self.assertEqual((Fraction(3, 2) ** 200).denominator, 2 ** 200)
+        with self.assertRaises(ValueError):
+            Fraction(2) ** Fraction(1, 2)
+        with self.assertRaises(ZeroDivisionError):
+            Fraction(0) ** -1
+
     def test_equals(self):
         self.assertEqual(self.f1, Fraction(1, 2))
 
@@ -114,6 +264,16 @@ class FractulatorTest(unittest.TestCase):
         self.assertEqual(result.numerator, -4)
         self.assertEqual(result.denominator, 3)
 
+    def test_simplify_exact_past_float_range(self):
+        result = Fraction(3 * (10 ** 30 + 1), 3 * (10 ** 30 + 7), simplify=True)
+        self.assertEqual(result.numerator, 10 ** 30 + 1)
+        self.assertEqual(result.denominator, 10 ** 30 + 7)
+
+    def test_addition_exact_past_float_range(self):
+        result = Fraction(1, 2 ** 60 + 1) + Fraction(1, 2 ** 60 - 1)
+        self.assertEqual(result.numerator, 2 ** 61)
+        self.assertEqual(result.denominator, 2 ** 120 - 1)
+
     def test_simplified(self):
         result = Fraction(12, 4).simplified()
         self.assertEqual(result.numerator, 3)
@@ -121,13 +281,167 @@ class FractulatorTest(unittest.TestCase):
 
     def test_scale(self):
         result = Fraction(18, 9).scale(4)
-        self.assertEqual(result.numerator, 72)
-        self.assertEqual(result.denominator, 36)
+        self.assertEqual(result.numerator, 2)
+        self.assertEqual(result.denominator, 1)
 
     def test_inverse(self):
         result = Fraction(56, 49).inverse()
-        self.assertEqual(result.numerator, 49)
-        self.assertEqual(result.denominator, 56)
+        self.assertEqual(result.numerator, 7)
+        self.assertEqual(result.denominator, 8)
+
+    def test_inverse_negative(self):
+        result = Fraction(-2, 3).inverse()
+        self.assertEqual(result.numerator, -3)
+        self.assertEqual(result.denominator, 2)
+
+    def test_inverse_zero(self):
+        with self.assertRaises(ZeroDivisionError):
+            Fraction(0, 3).inverse()
+
+    def test_canonical_on_construction(self):
+        result = Fraction(6, -4)
+        self.assertEqual(result.numerator, -3)
+        self.assertEqual(result.denominator, 2)
+
+    def test_immutable(self):
+        with self.assertRaises(AttributeError):
+            self.f1.numerator = 3
+        with self.assertRaises(AttributeError):
+            self.f1.extra = 3
+
+    def test_hashable(self):
+        self.assertEqual(hash(Fraction(2, 4)), hash(self.f1))
+        self.assertEqual(len({Fraction(2, 4), self.f1, Fraction(-3, -6), self.f2}), 2)
+
+    def test_not_equal_other_type(self):
+        self.assertNotEqual(self.f1, "1/2")
+
+    def test_hash_matches_standard_library(self):
+        modulus = sys.hash_info.modulus
+        values = (
+            (1, 2), (-3, 4), (7, 1), (-7, 1), (0, 5),
+            (modulus, 3), (2, modulus), (-1, modulus * 6), (10 ** 9, 7),
+        )
+        for n, d in values:
+            self.assertEqual(hash(Fraction(n, d)), hash(fractions.Fraction(n, d)), (n, d))
+        self.assertEqual(hash(Fraction(-2, -1)), hash(2))
+        self.assertEqual({2: "two"}[Fraction(4, 2)], "two")
+
+    def test_compare_int(self):
+        self.assertEqual(Fraction(6, 3), 2)
+        self.assertEqual(2, Fraction(6, 3))
+        self.assertNotEqual(self.f1, 0)
+        self.assertTrue(self.f1 < 1 and self.f1 > 0 and self.f1 <= 1 and self.f1 >= -1)
+        self.assertTrue(1 > self.f1 and 0 < self.f1)
+
+    def test_int_operands(self):
+        self.assertEqual(self.f1 + 2, Fraction(5, 2))
+        self.assertEqual(self.f1 - 2, Fraction(-3, 2))
+        self.assertEqual(self.f1 * 4, Fraction(2))
+        self.assertEqual(self.f1 / -3, Fraction(-1, 6))
+        self.assertEqual((Fraction(6, 4) * 2).denominator, 1)
+        with self.assertRaises(ZeroDivisionError):
+            self.f1 / 0
+        with self.assertRaises(TypeError):
+            self.f1 + 0.5
+
+    def test_reflected_operators(self):
+        self.assertEqual(2 + self.f1, Fraction(5, 2))
+        self.assertEqual(2 - self.f1, Fraction(3, 2))
+        self.assertEqual(-3 * self.f1, Fraction(-3, 2))
+        self.assertEqual(3 / Fraction(-9, 2), Fraction(-2, 3))
+        self.assertEqual(2 ** Fraction(-2), Fraction(1, 4))
+        self.assertEqual(sum([self.f1, self.f2]), self.f1 + self.f2)
+        with self.assertRaises(ZeroDivisionError):
+            1 / Fraction(0)
+        with self.assertRaises(ValueError):
+            2 ** self.f1
+
+    def test_int_operands_match_standard_library(self):
+        cases = ((1, 3, 6), (-5, 12, 8), (7, 1, -7), (0, 1, 3), (2 ** 80 + 1, 3 ** 40, 3 ** 5))
+        for a, b, n in cases:
+            ours, theirs = Fraction(a, b), fractions.Fraction(a, b)
+            for op in (operator.add, operator.sub, operator.mul, operator.truediv):
+                pairs = [(op(ours, n), op(theirs, n))]
+                if a:
+                    pairs.append((op(n, ours), op(n, theirs)))
+                for result, expected in pairs:
+                    self.assertEqual(
+                        (result.numerator, result.denominator),
+                        (expected.numerator, expected.denominator),
+                    )
+
+    def test_from_float(self):
+        self.assertEqual(Fraction.from_float(0.75), Fraction(3, 4))
+        self.assertEqual(Fraction.from_float(-2.0), Fraction(-2))
+        self.assertEqual(Fraction.from_float(0.1), Fraction(*(0.1).as_integer_ratio()))
+        self.assertEqual(Fraction.from_float(1e300).denominator, 1)
+        self.assertEqual(Fraction.from_float(3), Fraction(3))
+        for value in (float("inf"), float("nan")):
+            with self.assertRaises(ValueError):
+                Fraction.from_float(value)
+        with self.assertRaises(TypeError):
+            Fraction.from_float("0.5")
+
+    def test_from_decimal(self):
+        self.assertEqual(Fraction.from_decimal(Decimal("1.250")), Fraction(5, 4))
+        self.assertEqual(Fraction.from_decimal(Decimal("-3E+2")), Fraction(-300))
+        self.assertEqual(Fraction.from_decimal(Decimal("0.1")), Fraction(1, 10))
+        with self.assertRaises(ValueError):
+            Fraction.from_decimal(Decimal("Infinity"))
+        with self.assertRaises(TypeError):
+            Fraction.from_decimal(0.5)
+
+    def test_compare_float_and_decimal(self):
+        self.assertEqual(self.f1, 0.5)
+        self.assertEqual(0.5, self.f1)
+        self.assertEqual(self.f1, Decimal("0.5"))
+        self.assertEqual(hash(self.f1), hash(0.5))
+        self.assertNotEqual(Fraction(1, 10), 0.1)
+        self.assertTrue(Fraction(1, 10) < 0.1 and Fraction(1, 10) == Decimal("0.1"))
+        self.assertTrue(self.f1 < float("inf") and self.f1 > float("-inf"))
+        self.assertTrue(self.f1 >= Decimal("-Infinity"))
+        nan = float("nan")
+        self.assertFalse(self.f1 == nan or self.f1 < nan or self.f1 >= nan)
+
+    def test_ordering(self):
+        self.assertTrue(self.f1_negative < self.f1 < self.f2)
+        self.assertTrue(self.f2 > self.f1 > self.f1_negative)
+        self.assertTrue(self.f1 <= Fraction(2, 4) <= self.f1)
+        self.assertTrue(self.f1 >= Fraction(2, 4) >= self.f1)
+        self.assertFalse(self.f2 < self.f1)
+        self.assertFalse(self.f1 > self.f2)
+        self.assertEqual(max(self.f1, self.f2, self.f2_negative), self.f2)
+        with self.assertRaises(TypeError):
+            self.f1 < "1/2"
+
+    def test_sort_many(self):
+        values = [Fraction(n, d) for n in range(-6, 7) for d in range(1, 7)]
+        values.append(Fraction(10 ** 400 + 1, 3))
+        values.append(Fraction(10 ** 400, 3))
+        values.append(Fraction(1, 10 ** 400))
+        values.append(Fraction(2, 10 ** 400))
+        expected = sorted(fractions.Fraction(f.numerator, f.denominator) for f in values)
+        expected = [Fraction(f.numerator, f.denominator) for f in expected]
+        self.assertEqual(Fraction.sort_many(values), expected)
+        self.assertEqual(Fraction.sort_many(values, reverse=True), expected[::-1])
+        self.assertEqual(sorted(values, key=Fraction.sort_key), expected)
+        self.assertEqual(sorted(values), expected)
+        unique = Fraction.sort_many(values, unique=True)
+        self.assertEqual(unique, sorted(set(values)))
+        self.assertEqual(len(unique), len(set(expected)))
+
+    def test_sort_key_heapq_bisect(self):
+        values = [Fraction(5, 3), Fraction(-1, 2), Fraction(1, 3), Fraction(2, 6)]
+        heap = [value.sort_key() for value in values]
+        heapq.heapify(heap)
+        self.assertEqual(heapq.heappop(heap)[1], Fraction(-1, 2))
+        ordered = Fraction.sort_many(values)
+        self.assertEqual(bisect.bisect_left(ordered, Fraction(1, 3)), 1)
+        self.assertEqual(bisect.bisect_right(ordered, Fraction(1, 3)), 3)
+
+    def test_pickle(self):
+        self.assertEqual(pickle.loads(pickle.dumps(self.f2_negative)), self.f2_negative)
 
     def test_inverse_simplify(self):
         result = Fraction(100, 50).inverse(simplify=True)
@@ -232,6 +546,45 @@ class FractulatorTest(unittest.TestCase):
             str(too_many_items_exc.exception), "Invalid fraction input: x_3_/7"
         )
 
+    def test_parse_extra_separators(self):
+        for parse_val in ["2_3", "1/2/3", "1_2_3/4", "", "1/"]:
+            with self.assertRaises(ValueError) as bad_fraction_exc:
+                Fraction.parse(parse_val)
+            message = str(bad_fraction_exc.exception)
+            self.assertEqual(message, f"Invalid fraction input: {parse_val}")
+
+    def test_parse_zero_denominator(self):
+        with self.assertRaises(ZeroDivisionError):
+            Fraction.parse("3_1/0")
+
+    def test_parse_reduces(self):
+        result = Fraction.parse("-2_6/8")
+        self.assertEqual((result.numerator, result.denominator), (-11, 4))
+        result = Fraction.parse("6/-8")
+        self.assertEqual((result.numerator, result.denominator), (-3, 4))
+
+    def test_parse_many(self):
+        self.assertEqual(
+            Fraction.parse_many(["7", "2/3", "-2_3/7"]),
+            [Fraction(7), self.f2, Fraction(-17, 7)],
+        )
+
+    def test_parse_buffer(self):
+        data = b"7\n2/3\r\n\n-2_3/7"
+        expected = [Fraction(7), self.f2, Fraction(-17, 7)]
+        self.assertEqual(list(Fraction.parse_buffer(data)), expected)
+        with self.assertRaises(ValueError) as bad_fraction_exc:
+            list(Fraction.parse_buffer(b"1/2\nz/7\n"))
+        self.assertEqual(str(bad_fraction_exc.exception), "Invalid fraction input: z/7")
+
+    def test_parse_buffer_mmap(self):
+        with tempfile.TemporaryFile() as values_file:
+            values_file.write(b"1_1/2\n-3/9\n")
+            values_file.flush()
+            with mmap.mmap(values_file.fileno(), 0, access=mmap.ACCESS_READ) as buffer:
+                values = list(Fraction.parse_buffer(buffer))
+                self.assertEqual(values, [Fraction(3, 2), Fraction(-1, 3)])
+
     def test_parse_bad_fraction(self):
         parse_val = "z/7"
         with self.assertRaises(ValueError) as bad_fraction_exc:
@@ -239,6 +592,541 @@ class FractulatorTest(unittest.TestCase):
         self.assertEqual(str(bad_fraction_exc.exception), "Invalid fraction input: z/7")
 
 
+class LazyReductionTest(FractulatorTest):
+    """
+    Rerun the Fraction tests with lazy reduction switched on
+    """
+
+    def setUp(self):
+        self.lazy = fractulator.LAZY_REDUCTION
+        fractulator.LAZY_REDUCTION = True
+
+    def tearDown(self):
+        fractulator.LAZY_REDUCTION = self.lazy
+
+    def test_reduction_deferred_until_observed(self):
+        result = Fraction(1, 6) + Fraction(1, 3)
+        self.assertFalse(result._reduced)
+        self.assertEqual(result.denominator, 2)
+        self.assertTrue(result._reduced)
+        self.assertEqual(result.numerator, 1)
+
+    def test_reduction_past_threshold(self):
+        big = Fraction(2 ** fractulator.LAZY_REDUCTION_BITS, 3)
+        result = big * Fraction(3, 2)
+        self.assertTrue(result._reduced)
+        self.assertEqual(result, Fraction(2 ** (fractulator.LAZY_REDUCTION_BITS - 1)))
+
+    def test_lazy_chain(self):
+        result = Fraction(0)
+        for denominator in range(1, 20):
+            result = result + Fraction(1, denominator * (denominator + 1))
+        self.assertEqual(result, Fraction(19, 20))
+
+
+class ReductionTest(unittest.TestCase):
+    pairs = [(1, 3), (-5, 6), (7, 100), (22, 7), (3, 1), (-1, 250), (9, 14)]
+    values = [Fraction(n, d) for n, d in pairs] * 30
+
+    def reference(self):
+        return [fractions.Fraction(f.numerator, f.denominator) for f in self.values]
+
+    def assertMatches(self, result, expected):
+        self.assertEqual(
+            (result.numerator, result.denominator), (expected.numerator, expected.denominator)
+        )
+
+    def test_fsum(self):
+        expected = sum(self.reference())
+        for tree in (False, True):
+            for chunk_size in (1, 4, 64):
+                result = fsum(iter(self.values), tree=tree, chunk_size=chunk_size)
+                self.assertMatches(result, expected)
+        self.assertEqual(fsum([]), Fraction(0))
+        self.assertEqual(fsum([1, Fraction(1, 2), -3]), Fraction(-3, 2))
+
+    def test_fprod(self):
+        expected = functools.reduce(operator.mul, self.reference()[:40])
+        for tree in (False, True):
+            for chunk_size in (1, 3, 64):
+                result = fprod(iter(self.values[:40]), tree=tree, chunk_size=chunk_size)
+                self.assertMatches(result, expected)
+        self.assertEqual(fprod([]), Fraction(1))
+
+    def test_mean_variance(self):
+        reference = self.reference()
+        count = len(reference)
+        expected_mean = sum(reference) / count
+        self.assertMatches(mean(self.values, chunk_size=8), expected_mean)
+        population = sum((x - expected_mean) ** 2 for x in reference) / count
+        self.assertMatches(variance(self.values, chunk_size=8), population)
+        sample = population * count / (count - 1)
+        self.assertMatches(variance(iter(self.values), sample=True), sample)
+        self.assertEqual(variance([Fraction(5, 2)]), Fraction(0))
+
+    def test_reduction_errors(self):
+        with self.assertRaises(ValueError):
+            mean([])
+        with self.assertRaises(ValueError):
+            variance([Fraction(1)], sample=True)
+        with self.assertRaises(ValueError):
+            fsum([1], chunk_size=0)
+        with self.assertRaises(ValueError):
+            fprod([1], chunk_size=0)
+        with self.assertRaises(TypeError):
+            fsum([0.5])
+
+
+class FormattingTest(unittest.TestCase):
+    values = [Fraction(7, 3), Fraction(-7, 3), Fraction(0), Fraction(-4), Fraction(1, -8)]
+
+    def test_tostring_past_float_range(self):
+        result = str(Fraction(10 ** 30 + 1, 3))
+        self.assertEqual(result, "333333333333333333333333333333_2/3")
+        self.assertEqual(str(Fraction(-(10 ** 30) - 1, 3)), "-333333333333333333333333333333_2/3")
+
+    def test_to_string_forms(self):
+        self.assertEqual(
+            [f.to_string() for f in self.values], ["2_1/3", "-2_1/3", "0", "-4", "-1/8"]
+        )
+        self.assertEqual(
+            [f.to_string("improper") for f in self.values], ["7/3", "-7/3", "0", "-4", "-1/8"]
+        )
+        self.assertEqual(
+            [f.to_string("decimal", 2) for f in self.values],
+            ["2.33", "-2.33", "0.00", "-4.00", "-0.13"],
+        )
+        self.assertEqual(Fraction(-1, 3).to_string("decimal", 0), "0")
+        self.assertEqual(Fraction(5, 2).to_string("decimal", 0), "3")
+
+    def test_invalid_form(self):
+        with self.assertRaises(ValueError):
+            self.values[0].to_string("roman")
+        with self.assertRaises(ValueError):
+            self.values[0].to_string("decimal", -1)
+
+    def test_format_many(self):
+        self.assertEqual(format_many(self.values[:2]), "2_1/3\n-2_1/3")
+        self.assertEqual(format_many(self.values[:2], "improper", separator=","), "7/3,-7/3")
+
+    def test_write_many(self):
+        output = io.StringIO()
+        self.assertEqual(write_many(self.values, output, "improper", block_size=2), 5)
+        self.assertEqual(output.getvalue(), "7/3\n-7/3\n0\n-4\n-1/8\n")
+
+    def test_repeating_form(self):
+        self.assertEqual(Fraction(1, 7).to_decimal(), "0.(142857)")
+        self.assertEqual(Fraction(-7, 6).to_decimal(), "-1.1(6)")
+        self.assertEqual(Fraction(1, 12).to_string("repeating"), "0.08(3)")
+        self.assertEqual(Fraction(3, 8).to_decimal(), "0.375")
+        self.assertEqual(Fraction(-4).to_decimal(), "-4")
+        self.assertEqual(Fraction(1, 6).to_decimal(base=2), "0.0(01)")
+        self.assertEqual(Fraction(31, 3).to_decimal(base=16), "a.(5)")
+        self.assertEqual(Fraction(-511, 3).to_decimal(base=16), "-aa.(5)")
+        self.assertEqual(format_many(self.values, "repeating"), "2.(3)\n-2.(3)\n0\n-4\n-0.125")
+
+    def test_to_decimal_digits(self):
+        self.assertEqual(Fraction(1, 3).to_decimal(5), "0.33333")
+        self.assertEqual(Fraction(-2, 3).to_decimal(3), "-0.666")
+        self.assertEqual(Fraction(1, 4).to_decimal(50), "0.25")
+        self.assertEqual(Fraction(7, 2).to_decimal(0), "3")
+        self.assertEqual(Fraction(13, 2).to_decimal(2, base=2), "110.1")
+        self.assertEqual(Fraction(0).to_decimal(3, base=8), "0")
+        huge = Fraction(1, 3 ** 2000000)
+        self.assertEqual(huge.to_decimal(50), "0." + "0" * 50)
+        with self.assertRaises(ValueError):
+            Fraction(1, 3).to_decimal(-1)
+        with self.assertRaises(ValueError):
+            Fraction(1, 3).to_decimal(base=37)
+
+    def test_decimal_digits(self):
+        self.assertEqual(list(Fraction(-27, 8).decimal_digits()), [3, 7, 5])
+        self.assertEqual(list(islice(Fraction(1, 7).decimal_digits(), 8)), [1, 4, 2, 8, 5, 7, 1, 4])
+        self.assertEqual(list(Fraction(5).decimal_digits()), [])
+        self.assertEqual(list(islice(Fraction(1, 3).decimal_digits(base=2), 4)), [0, 1, 0, 1])
+
+    def test_continued_fraction(self):
+        self.assertEqual(list(Fraction(415, 93).continued_fraction()), [4, 2, 6, 7])
+        self.assertEqual(list(Fraction(-415, 93).continued_fraction()), [-5, 1, 1, 6, 7])
+        self.assertEqual(list(Fraction(3).continued_fraction()), [3])
+        terms = list(Fraction(355, 113).continued_fraction())
+        value = fractions.Fraction(terms[-1])
+        for term in reversed(terms[:-1]):
+            value = term + 1 / value
+        self.assertEqual(value, fractions.Fraction(355, 113))
+
+    def test_binary_round_trip(self):
+        values = self.values + [Fraction(-(2 ** 200) + 1, 3 ** 90), Fraction(255, 256)]
+        data = encode_fractions(values)
+        self.assertEqual(list(decode_fractions(data)), values)
+        self.assertEqual(len(encode_fractions([Fraction(1, 2)])), 4)
+        self.assertEqual(list(decode_fractions(memoryview(data))), values)
+
+    def test_binary_invalid_denominator(self):
+        with self.assertRaises(ValueError):
+            list(decode_fractions(b"\x02\x01\x00"))
+
+    def test_main_format_option(self):
+        output = io.StringIO()
+        with redirect_stdout(output):
+            self.assertEqual(main(["--format", "decimal", "--digits", "3", "-2/3"]), 0)
+            self.assertEqual(main(["--format", "improper", "-2_2/3", "+", "1"]), 0)
+        self.assertEqual(output.getvalue(), "-0.667\n-5/3\n")
+
+
+@unittest.skipIf(numpy is None, "numpy is not installed")
+class FractionArrayTest(unittest.TestCase):
+    pairs_a = [(1, 2), (2, 4), (3, -9), (-4, 6), (2 ** 62, 3), (7, 2 ** 40)]
+    pairs_b = [(5, 3), (1, 2 ** 62 + 1), (1, 1), (7, 1), (3, 2 ** 62), (-2 ** 33, 9)]
+
+    def setUp(self):
+        self.a = FractionArray(*zip(*self.pairs_a))
+        self.b = FractionArray(*zip(*self.pairs_b))
+        self.ref_a = [fractions.Fraction(n, d) for n, d in self.pairs_a]
+        self.ref_b = [fractions.Fraction(n, d) for n, d in self.pairs_b]
+
+    def assertMatches(self, array, expected):
+        self.assertEqual([(f.numerator, f.denominator) for f in array.tolist()],
+                         [(f.numerator, f.denominator) for f in expected])
+
+    def test_construction_reduces(self):
+        self.assertMatches(self.a, self.ref_a)
+        self.assertEqual(self.a.numerators.dtype, numpy.int64)
+
+    def test_zero_denominator(self):
+        with self.assertRaises(ZeroDivisionError):
+            FractionArray([1, 2], [3, 0])
+
+    def test_elementwise_arithmetic(self):
+        for op in ("__add__", "__sub__", "__mul__", "__truediv__"):
+            expected = [getattr(x, op)(y) for x, y in zip(self.ref_a, self.ref_b)]
+            self.assertMatches(getattr(self.a, op)(self.b), expected)
+
+    def test_overflow_falls_back_to_python_ints(self):
+        result = self.a * self.a
+        self.assertEqual(result.numerators.dtype, object)
+        self.assertMatches(result, [x * x for x in self.ref_a])
+        self.assertMatches(result / self.a, self.ref_a)
+        self.assertEqual((result / self.a).numerators.dtype, numpy.int64)
+        self.assertMatches(self.a - self.a, [fractions.Fraction(0)] * len(self.ref_a))
+        self.assertEqual((self.a - self.a).numerators.dtype, numpy.int64)
+
+    def test_broadcast_scalars(self):
+        third = fractions.Fraction(1, 3)
+        self.assertMatches(self.a + Fraction(1, 3), [x + third for x in self.ref_a])
+        self.assertMatches(Fraction(1, 3) - self.a, [third - x for x in self.ref_a])
+        self.assertMatches(3 * self.a, [3 * x for x in self.ref_a])
+        self.assertMatches(2 / self.a, [2 / x for x in self.ref_a])
+
+    def test_subtract_big_scalar(self):
+        big = fractions.Fraction(2 ** 63, 3)
+        self.assertMatches(self.a - 2 ** 63, [x - 2 ** 63 for x in self.ref_a])
+        self.assertMatches(self.a - Fraction(2 ** 63, 3), [x - big for x in self.ref_a])
+        self.assertMatches(Fraction(2 ** 63, 3) - self.a, [big - x for x in self.ref_a])
+
+    def test_division_by_zero(self):
+        with self.assertRaises(ZeroDivisionError):
+            self.a / FractionArray([1, 0, 1, 1, 1, 1])
+
+    def test_comparison(self):
+        pairs = list(zip(self.ref_a, self.ref_b))
+        self.assertEqual((self.a < self.b).tolist(), [x < y for x, y in pairs])
+        self.assertEqual((self.a >= self.b).tolist(), [x >= y for x, y in pairs])
+        half = Fraction(1, 2)
+        self.assertEqual((self.a == half).tolist(), [True, True, False, False, False, False])
+        self.assertEqual((self.a != self.a).tolist(), [False] * 6)
+        self.assertEqual((self.a <= 0).tolist(), [x <= 0 for x in self.ref_a])
+        self.assertEqual((self.a > self.b).tolist(), [x > y for x, y in pairs])
+
+    def test_unsupported_operands(self):
+        binary = (
+            operator.add, operator.sub, operator.mul, operator.truediv,
+            operator.lt, operator.le, operator.gt, operator.ge,
+        )
+        for other in ("1/2", [1, 2, 3, 4, 5, 6], object(), 0.5):
+            for op in binary:
+                with self.assertRaises(TypeError, msg=(op, other)):
+                    op(self.a, other)
+                with self.assertRaises(TypeError, msg=(other, op)):
+                    op(other, self.a)
+            self.assertIs(self.a == other, False)
+            self.assertIs(self.a != other, True)
+
+    def test_reflected_operators(self):
+        third = fractions.Fraction(1, 3)
+        self.assertMatches(Fraction(1, 3) / self.a, [third / x for x in self.ref_a])
+        self.assertMatches(2 - self.a, [2 - x for x in self.ref_a])
+        self.assertMatches(1 + self.a, [1 + x for x in self.ref_a])
+        half = fractions.Fraction(1, 2)
+        self.assertEqual((Fraction(1, 2) < self.a).tolist(), [half < x for x in self.ref_a])
+        self.assertMatches(1 / FractionArray([-1, 2], [3, 5]), [fractions.Fraction(-3), half * 5])
+        smallest = FractionArray([-2 ** 63, 1], [1, 1])
+        self.assertMatches(-smallest, [fractions.Fraction(2 ** 63), fractions.Fraction(-1)])
+        self.assertMatches(self.a / 2, [x / 2 for x in self.ref_a])
+        self.assertIs(self.a.simplified(), self.a)
+        self.assertEqual(str(FractionArray([1, -3], [2, 4])), "[1/2, -3/4]")
+
+    def test_reductions(self):
+        total = sum(self.ref_a)
+        product = functools.reduce(operator.mul, self.ref_b)
+        self.assertEqual(self.a.sum(), Fraction(total.numerator, total.denominator))
+        self.assertEqual(self.b.prod(), Fraction(product.numerator, product.denominator))
+        self.assertEqual(FractionArray([]).sum(), Fraction(0))
+        self.assertEqual(FractionArray([]).prod(), Fraction(1))
+
+    def test_indexing(self):
+        self.assertEqual(self.a[0], Fraction(1, 2))
+        self.assertIsInstance(self.a[1:3], FractionArray)
+        self.assertEqual(list(self.a[1:3]), [Fraction(1, 2), Fraction(-1, 3)])
+        self.assertEqual(len(self.a), 6)
+        self.assertEqual(self.a.shape, (6,))
+        self.assertMatches(-self.a, [-x for x in self.ref_a])
+
+    def test_from_fractions(self):
+        array = FractionArray.from_fractions([Fraction(1, 2), Fraction(2 ** 70, 3)])
+        self.assertEqual(array.numerators.dtype, object)
+        self.assertEqual(list(array), [Fraction(1, 2), Fraction(2 ** 70, 3)])
+
+
+class FractionMatrixTest(unittest.TestCase):
+    rows = [["2", "1/2", "-1"], ["1/3", "0", "4"], ["5", "-2", "1_1/2"]]
+
+    def setUp(self):
+        self.matrix = FractionMatrix(self.rows)
+        self.reference = [[fractions.Fraction(value) for value in row]
+                          for row in (["2", "1/2", "-1"], ["1/3", "0", "4"], ["5", "-2", "3/2"])]
+
+    @staticmethod
+    def convert(value, to=Fraction):
+        """
+        Convert between Fraction and fractions.Fraction by numerator and denominator
+        """
+        return to(value.numerator, value.denominator)
+
+    def reference_determinant(self, rows):
+        rows = [list(row) for row in rows]
+        size, determinant = len(rows), fractions.Fraction(1)
+        for k in range(size):
+            pivot = next((i for i in range(k, size) if rows[i][k]), None)
+            if pivot is None:
+                return 0
+            if pivot != k:
+                rows[k], rows[pivot] = rows[pivot], rows[k]
+                determinant = -determinant
+            determinant *= rows[k][k]
+            for i in range(k + 1, size):
+                factor = rows[i][k] / rows[k][k]
+                rows[i] = [a - factor * b for a, b in zip(rows[i], rows[k])]
+        return determinant
+
+    def test_construction(self):
+        self.assertEqual(self.matrix.shape, (3, 3))
+        self.assertEqual(self.matrix[1, 0], Fraction(1, 3))
+        self.assertEqual(self.matrix[2], (Fraction(5), Fraction(-2), Fraction(3, 2)))
+        self.assertEqual(len(self.matrix), 3)
+        self.assertEqual(self.matrix.transpose()[0], (Fraction(2), Fraction(1, 3), Fraction(5)))
+        self.assertEqual(str(FractionMatrix([[1, "1/2"]])), "[1, 1/2]")
+        with self.assertRaises(ValueError):
+            FractionMatrix([[1, 2], [3]])
+        with self.assertRaises(ValueError):
+            FractionMatrix([])
+
+    def test_product(self):
+        product = self.matrix @ self.matrix.transpose()
+        rows = self.reference
+        expected = [[sum(map(operator.mul, row, other)) for other in rows] for row in rows]
+        expected = [[self.convert(value) for value in row] for row in expected]
+        self.assertEqual(product.tolist(), expected)
+        self.assertEqual(self.matrix.multiply(FractionMatrix.identity(3)), self.matrix)
+        self.assertEqual((2 * self.matrix)[0, 1], Fraction(1))
+        with self.assertRaises(ValueError):
+            self.matrix @ FractionMatrix([[1, 2]])
+
+    def test_determinant(self):
+        expected = self.reference_determinant(self.reference)
+        self.assertEqual(self.matrix.determinant(), self.convert(expected))
+        self.assertEqual(FractionMatrix([[0, 1], [1, 0]]).determinant(), Fraction(-1))
+        self.assertEqual(FractionMatrix([[1, 2], ["1/2", 1]]).determinant(), Fraction(0))
+        with self.assertRaises(ValueError):
+            FractionMatrix([[1, 2]]).determinant()
+
+    def test_inverse_and_solve(self):
+        identity = FractionMatrix.identity(3)
+        inverse = self.matrix.inverse()
+        self.assertEqual(self.matrix @ inverse, identity)
+        self.assertEqual(inverse @ self.matrix, identity)
+        solution = self.matrix.solve(["1", 2, Fraction(-3, 4)])
+        self.assertEqual(self.matrix @ FractionMatrix([[value] for value in solution]),
+                         FractionMatrix([[1], [2], ["-3/4"]]))
+        self.assertEqual(self.matrix.solve(identity), inverse)
+        with self.assertRaises(ZeroDivisionError):
+            FractionMatrix([[1, 2], [2, 4]]).inverse()
+        with self.assertRaises(ValueError):
+            self.matrix.solve([1, 2])
+
+    def test_matches_reference_elimination(self):
+        rng = fractulator_bench.random.Random(3)
+        for size in (1, 2, 4, 7):
+            rows = fractulator_bench.random_matrix(size, rng)
+            rows[0][0] = Fraction(0)
+            values = [Fraction(rng.randint(-9, 9), rng.randint(1, 5)) for _ in range(size)]
+            matrix = FractionMatrix(rows)
+            reference_rows = [
+                [self.convert(value, fractions.Fraction) for value in row] for row in rows
+            ]
+            determinant = fractions.Fraction(self.reference_determinant(reference_rows))
+            self.assertEqual(matrix.determinant(), self.convert(determinant))
+            if determinant:
+                expected = fractulator_bench.naive_solve(
+                    reference_rows, [self.convert(value, fractions.Fraction) for value in values]
+                )
+                self.assertEqual(matrix.solve(values), [self.convert(value) for value in expected])
+
+
+class FractionStoreTest(unittest.TestCase):
+    values = [
+        Fraction(7, 3), Fraction(-2 ** 70 - 1, 3), Fraction(0),
+        Fraction(1, 2 ** 64), Fraction(-4), Fraction(2, 9),
+    ]
+
+    def setUp(self):
+        handle, self.path = tempfile.mkstemp(suffix=".fst")
+        os.close(handle)
+
+    def tearDown(self):
+        os.remove(self.path)
+
+    def test_round_trip(self):
+        with fractulator.FractionWriter(self.path, block_size=4) as writer:
+            self.assertEqual(writer.write_many(self.values), 6)
+        with fractulator.FractionStore(self.path) as store:
+            self.assertEqual(len(store), 6)
+            self.assertEqual(list(store), self.values)
+            self.assertEqual(store[1], self.values[1])
+            self.assertEqual(store[-1], Fraction(2, 9))
+            self.assertEqual(store[1:5:2], [self.values[1], self.values[3]])
+            with self.assertRaises(IndexError):
+                store[6]
+
+    def test_append(self):
+        with fractulator.FractionWriter(self.path) as writer:
+            writer.write_many(self.values[:2])
+        with fractulator.FractionWriter(self.path, append=True) as writer:
+            writer.write(self.values[2])
+            writer.write_many(self.values[3:])
+        with fractulator.FractionStore(self.path) as store:
+            self.assertEqual(list(store), self.values)
+
+    def test_empty(self):
+        fractulator.FractionWriter(self.path).close()
+        with fractulator.FractionStore(self.path) as store:
+            self.assertEqual(len(store), 0)
+            self.assertEqual(list(store), [])
+
+    def test_invalid_file(self):
+        with self.assertRaisesRegex(ValueError, "Not a fraction store"):
+            fractulator.FractionStore(self.path)
+        for data in (b"F", b"FRACT", b"FRACTUL\x02" + bytes(16)):
+            with open(self.path, "wb") as store_file:
+                store_file.write(data)
+            with self.assertRaisesRegex(ValueError, "Not a fraction store"):
+                fractulator.FractionStore(self.path)
+        with fractulator.FractionWriter(self.path) as writer:
+            writer.write_many(self.values)
+        with open(self.path, "r+b") as store_file:
+            store_file.truncate(os.path.getsize(self.path) - 1)
+        with self.assertRaisesRegex(ValueError, "Truncated fraction store"):
+            fractulator.FractionStore(self.path)
+
+    @unittest.skipIf(numpy is None, "numpy is not installed")
+    def test_array(self):
+        with fractulator.FractionWriter(self.path, block_size=4) as writer:
+            writer.write_many(self.values)
+            writer.write_many(FractionArray([1, 2, 3], [4, 6, 8]))
+        with fractulator.FractionStore(self.path) as store:
+            whole = store.array()
+            appended = [Fraction(1, 4), Fraction(1, 3), Fraction(3, 8)]
+            self.assertEqual(list(whole), self.values + appended)
+            view = store.array(6, 9)
+            self.assertEqual(view.numerators.dtype, numpy.int64)
+            self.assertFalse(view.numerators.flags.owndata)
+            self.assertEqual(view.sum(), Fraction(23, 24))
+            self.assertEqual(list(store.array(1, 2)), [self.values[1]])
+            self.assertEqual(len(store.array(3, 3)), 0)
+
+
+class CacheTest(unittest.TestCase):
+    def setUp(self):
+        clear_caches()
+
+    def tearDown(self):
+        configure_caches(parse_size=4096, result_size=4096, gcf_size=0)
+        clear_caches()
+
+    def test_lru_eviction(self):
+        cache = LRUCache(2)
+        cache.put("a", 1)
+        cache.put("b", 2)
+        self.assertEqual(cache.get("a"), 1)
+        cache.put("c", 3)
+        self.assertIsNone(cache.get("b"))
+        self.assertEqual(cache.get("c"), 3)
+        self.assertEqual(cache.stats(), {"capacity": 2, "size": 2, "hits": 2, "misses": 1})
+        cache.resize(1)
+        self.assertEqual(len(cache), 1)
+        self.assertEqual(cache.get("c"), 3)
+
+    def test_disabled_cache(self):
+        cache = LRUCache(0)
+        cache.put("a", 1)
+        self.assertIsNone(cache.get("a"))
+        self.assertEqual(cache.stats(), {"capacity": 0, "size": 0, "hits": 0, "misses": 0})
+
+    def test_thread_safety(self):
+        cache = LRUCache(50)
+
+        def worker(offset):
+            for i in range(2000):
+                cache.put((offset, i % 80), i)
+                cache.get((offset, (i * 7) % 80))
+
+        threads = [threading.Thread(target=worker, args=(n,)) for n in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(len(cache), 50)
+        self.assertEqual(cache.hits + cache.misses, 8000)
+
+    def test_parse_cache(self):
+        first = Fraction.parse("3_1/7")
+        self.assertIs(Fraction.parse("3_1/7"), first)
+        self.assertEqual(cache_stats()["parse"]["hits"], 1)
+
+    def test_result_cache(self):
+        first = parse_command_line(["1/3", "+", "1/6"])
+        self.assertIs(parse_command_line(["1/3 + 1/6"]), first)
+        stats = cache_stats()
+        self.assertEqual((stats["result"]["hits"], stats["result"]["misses"]), (1, 1))
+        self.assertEqual(stats["expression"]["misses"], 1)
+
+    def test_gcf_cache(self):
+        configure_caches(gcf_size=16)
+        self.assertEqual(gcf(-12, 18), 6)
+        self.assertEqual(gcf(-12, 18), 6)
+        self.assertEqual(gcf(2 ** 40, 2 ** 35), 2 ** 35)
+        self.assertEqual(cache_stats()["gcf"], {"capacity": 16, "size": 1, "hits": 1, "misses": 1})
+        fractulator.USE_NATIVE_GCD = False
+        try:
+            self.assertEqual(gcf(-9, 6), 3)
+        finally:
+            fractulator.USE_NATIVE_GCD = fractulator._native_gcd is not None
+
+    def test_configure_invalid(self):
+        with self.assertRaises(ValueError):
+            configure_caches(parse_size=-1)
+
+
 class CommandLineParserTest(unittest.TestCase):
     def test_parse_good_expression(self):
         arguments = ["4/3", "+", "1/2"]
@@ -257,6 +1145,110 @@ class CommandLineParserTest(unittest.TestCase):
         result = parse_command_line(arguments)
         self.assertEqual(result, Fraction(-329, 216))
 
+    def test_parse_single_string_expression(self):
+        result = parse_command_line(["4/3 + 1/2  *", "3_1/6"])
+        self.assertEqual(result, Fraction(35, 12))
+
+    def test_parse_single_operand(self):
+        self.assertEqual(parse_command_line(["-2_1/2"]), Fraction(-5, 2))
+
+    def test_parse_empty(self):
+        with self.assertRaises(ValueError) as empty_error:
+            parse_command_line([])
+        self.assertIn("incorrect number of operands", str(empty_error.exception))
+
+    def test_tokenize(self):
+        self.assertEqual(tokenize(["1/2 +", " 3 "]), ["1/2", "+", "3"])
+
+    def test_compiled_expression_program(self):
+        compiled = compile_expression((None, "+", None, "*", None, "-", None))
+        self.assertEqual(compiled.program[:3], (0, 1, 2))
+        self.assertEqual(len(compiled.program), 7)
+        result = compiled.evaluate([Fraction(1), Fraction(2), Fraction(3), Fraction(1, 2)])
+        self.assertEqual(result, Fraction(13, 2))
+
+    def test_compiled_expression_cached(self):
+        clear_caches()
+        parse_command_line(["1/2", "*", "3", "-", "1"])
+        parse_command_line(["7", "*", "2/3", "-", "5_1/4"])
+        info = compile_expression.cache_info()
+        self.assertEqual((info.hits, info.misses), (1, 1))
+
+    def test_parse_parentheses(self):
+        self.assertEqual(parse_command_line(["(4/3 + 1/2) * 3_1/6"]), Fraction(209, 36))
+        self.assertEqual(parse_command_line(["(", "4/3", "+", "1/2", ")", "*", "6"]), Fraction(11))
+        self.assertEqual(parse_command_line(["((1/2 - (-1/2)) / (2 * (1/4)))"]), Fraction(2))
+
+    def test_parse_unary_minus(self):
+        self.assertEqual(parse_command_line(["-(1/2 + 1/3) * 6"]), Fraction(-5))
+        self.assertEqual(parse_command_line(["2 * - 3"]), Fraction(-6))
+        self.assertEqual(parse_command_line(["- -3"]), Fraction(3))
+
+    def test_parse_power(self):
+        self.assertEqual(parse_command_line(["2/3 ** 2"]), Fraction(4, 9))
+        self.assertEqual(parse_command_line(["2 ** 3 ** 2"]), Fraction(512))
+        self.assertEqual(parse_command_line(["-2 ** 2"]), Fraction(-4))
+        self.assertEqual(parse_command_line(["- 2 ** 2"]), Fraction(-4))
+        self.assertEqual(parse_command_line(["-1_1/2 ** 2 + 1"]), Fraction(-5, 4))
+        self.assertEqual(parse_command_line(["2 ** -2"]), Fraction(1, 4))
+        self.assertEqual(parse_command_line(["2 ** -2 ** 2"]), Fraction(1, 16))
+        self.assertEqual(parse_command_line(["-2 * 3"]), Fraction(-6))
+        self.assertEqual(parse_command_line(["1 + 2 ** -1 * 4"]), Fraction(3))
+        with self.assertRaises(ValueError) as exponent_error:
+            parse_command_line(["2 ** 1/2"])
+        self.assertIn("whole number", str(exponent_error.exception))
+
+    def test_parse_unbalanced_parentheses(self):
+        for arguments in (["(1/2 + 1"], ["1/2 + 1)"], ["(1/2))"]):
+            with self.assertRaises(ValueError) as parentheses_error:
+                parse_command_line(arguments)
+            self.assertIn("unbalanced parentheses", str(parentheses_error.exception))
+
+    def test_parse_unknown_operand(self):
+        for arguments, operand in ((["bad + 1"], "bad"), (["1 * (2 - x) / y"], "x")):
+            with self.assertRaises(ValueError) as operand_error:
+                parse_command_line(arguments)
+            self.assertEqual(str(operand_error.exception), f"Invalid fraction input: {operand}")
+        self.assertEqual(evaluate_line("bad + 1"), "error: Invalid fraction input: bad")
+
+    def test_compile_invalid_shape(self):
+        for shape in ((None, None), (None, "+"), ("(", None), ("(", None, "+", None), ("*",), ()):
+            with self.assertRaises(ValueError) as shape_error:
+                fractulator.CompiledExpression(shape)
+            self.assertIn("Invalid expression shape", str(shape_error.exception))
+        with self.assertRaises(ValueError) as variable_error:
+            fractulator.compile_template("a * b + 1").slotted(["a"])
+        self.assertEqual(str(variable_error.exception), "Unbound variable: b")
+
+    def test_tokenize_parentheses(self):
+        self.assertEqual(
+            tokenize(["(-a + -1/2)", "*", "-(b)"]),
+            ["(", "-", "a", "+", "-1/2", ")", "*", "-", "(", "b", ")"],
+        )
+
+    def test_compile_template(self):
+        template = fractulator.compile_template("(a + b) * 3/4 - 1_1/2")
+        self.assertEqual(template.names, ("a", "b"))
+        self.assertEqual(template(a=1, b="1/2"), Fraction(-3, 8))
+        self.assertEqual(template(a=Fraction(1, 3), b=0), Fraction(-5, 4))
+        self.assertEqual(template.evaluate(variables={"a": 2, "b": 2}), Fraction(3, 2))
+        with self.assertRaises(ValueError):
+            template(a=1)
+        with self.assertRaises(TypeError):
+            template(a=1, b=0.5)
+
+    def test_compile_template_folds_constants(self):
+        template = fractulator.compile_template("x * (2 + 1/2) - 2 ** 10 + -(1/2)")
+        self.assertEqual(
+            template.program,
+            (
+                "x", Fraction(5, 2), Fraction.__mul__, Fraction(1024), Fraction.__sub__,
+                Fraction(-1, 2), Fraction.__add__,
+            ),
+        )
+        self.assertEqual(template(x=2), Fraction(-2039, 2))
+        self.assertEqual(fractulator.compile_template("(1 + 1/2) * 2").program, (Fraction(3),))
+
     def test_parse_bad_operator(self):
         bad_op = "#"
         arguments = ["3/4", bad_op, "1/2"]
@@ -277,5 +1269,660 @@ class CommandLineParserTest(unittest.TestCase):
         )
 
 
+class SheetTest(unittest.TestCase):
+    def setUp(self):
+        self.sheet = fractulator.Sheet({
+            "price": Fraction(3, 4),
+            "quantity": 12,
+            "total": "price * quantity",
+            "tax": "total * 1/10",
+            "grand": "total + tax",
+        })
+
+    def test_values(self):
+        self.assertEqual(self.sheet["total"], Fraction(9))
+        self.assertEqual(self.sheet["grand"], Fraction(99, 10))
+        self.assertEqual(len(self.sheet), 5)
+        self.assertIn("tax", self.sheet)
+        self.assertEqual(self.sheet.dependencies("grand"), ("tax", "total"))
+        self.assertEqual(self.sheet.dependents("total"), {"tax", "grand"})
+        self.assertEqual(self.sheet.recalculate(), [])
+
+    def test_recalculates_only_dependents(self):
+        self.sheet["other"] = "price + 1"
+        self.sheet.recalculate()
+        self.sheet["quantity"] = 13
+        self.assertEqual(self.sheet.recalculate(), ["total", "tax", "grand"])
+        self.assertEqual(self.sheet["grand"], Fraction(429, 40))
+        self.sheet["quantity"] = 13
+        self.assertEqual(self.sheet.recalculate(), [])
+
+    def test_unchanged_values_stop_propagation(self):
+        self.sheet.recalculate()
+        self.sheet["price"] = "3/4"
+        self.assertEqual(self.sheet.recalculate(), ["price"])
+        self.sheet["total"] = "quantity * 3/4"
+        self.assertEqual(self.sheet.recalculate(), ["total"])
+
+    def test_cycle(self):
+        cycle = "Circular reference: price -> grand -> total -> price"
+        with self.assertRaisesRegex(ValueError, cycle):
+            self.sheet["price"] = "grand / 2"
+        with self.assertRaisesRegex(ValueError, "Circular reference: x -> x"):
+            self.sheet["x"] = "x + 1"
+        self.assertEqual(self.sheet["price"], Fraction(3, 4))
+
+    def test_errors(self):
+        self.sheet["ratio"] = "1 / (quantity - 12)"
+        self.sheet["next"] = "ratio + 1"
+        with self.assertRaises(ZeroDivisionError):
+            self.sheet["next"]
+        self.assertEqual(self.sheet["grand"], Fraction(99, 10))
+        del self.sheet["quantity"]
+        with self.assertRaisesRegex(ValueError, "Unbound variable: quantity"):
+            self.sheet["total"]
+        self.sheet["quantity"] = 10
+        self.assertEqual(self.sheet["next"], Fraction(1, 2))
+        with self.assertRaises(ValueError):
+            self.sheet["1x"] = 1
+        with self.assertRaises(ValueError):
+            self.sheet["y"] = "1 +"
+
+    def test_fan_out(self):
+        sheet = fractulator.Sheet({f"x{i}": i for i in range(10)})
+        sheet.update({f"c{i}": f"x{i % 10} * {i} + 1/2" for i in range(1000)})
+        self.assertEqual(len(sheet.recalculate()), 1000)
+        sheet["x3"] = Fraction(1, 3)
+        self.assertEqual(sorted(sheet.recalculate()), sorted(f"c{i}" for i in range(3, 1000, 10)))
+        self.assertEqual(sheet["c13"], Fraction(29, 6))
+
+
+class BatchTest(unittest.TestCase):
+    lines = ["1/2 + 1/3\n", "\n", "3 # 4\n", "4 / 0\n", "2_1/2 * 2"]
+    expected = [
+        "5/6",
+        "",
+        "error: Invalid input: 3 # 4, # is not a valid operator",
+        "error: Cannot have 0 as a denominator.",
+        "5",
+    ]
+
+    def test_evaluate_line(self):
+        self.assertEqual([evaluate_line(line) for line in self.lines], self.expected)
+
+    def test_run_batch(self):
+        output = io.StringIO()
+        errors = run_batch(iter(self.lines), output)
+        self.assertEqual(errors, 2)
+        self.assertEqual(output.getvalue(), "\n".join(self.expected) + "\n")
+
+    def test_run_batch_flushes_in_blocks(self):
+        output = io.StringIO()
+        original = fractulator.BATCH_FLUSH_LINES
+        fractulator.BATCH_FLUSH_LINES = 2
+        try:
+            run_batch(["1", "2", "3", "4", "5"], output)
+        finally:
+            fractulator.BATCH_FLUSH_LINES = original
+        self.assertEqual(output.getvalue(), "1\n2\n3\n4\n5\n")
+
+    def test_run_batch_parallel(self):
+        lines = self.lines * 5
+        output = io.StringIO()
+        errors = run_batch(lines, output, jobs=2, chunk_size=3)
+        self.assertEqual(errors, 10)
+        self.assertEqual(output.getvalue().splitlines(), self.expected * 5)
+
+    def test_run_batch_formatter(self):
+        output = io.StringIO()
+        run_batch(["7/2", "1/x"], output, formatter=lambda f: f.to_string("improper"))
+        self.assertEqual(output.getvalue(), "7/2\nerror: Invalid fraction input: 1/x\n")
+
+    def test_parse_options(self):
+        self.assertEqual(
+            parse_options(["--batch", "--jobs", "4", "--chunk-size", "10", "in.txt"]),
+            ({"batch": True, "jobs": 4, "chunk_size": 10}, ["in.txt"]),
+        )
+        self.assertEqual(parse_options(["-1/2", "+", "1"]), ({}, ["-1/2", "+", "1"]))
+        for bad in (["--jobs"], ["--jobs", "x"], ["--nope"]):
+            with self.assertRaises(ValueError):
+                parse_options(bad)
+
+    def test_main_bad_options(self):
+        output = io.StringIO()
+        with redirect_stdout(output):
+            self.assertEqual(main(["--jobs", "2", "1/2"]), 1)
+            self.assertEqual(main(["--batch", "--jobs", "-2"]), 1)
+            self.assertEqual(main(["--frobnicate"]), 1)
+
+    def test_main_batch_file(self):
+        with tempfile.NamedTemporaryFile("w", suffix=".txt", delete=False) as input_file:
+            input_file.writelines(self.lines)
+        output = io.StringIO()
+        try:
+            with redirect_stdout(output):
+                exit_code = main(["--batch", input_file.name])
+        finally:
+            os.remove(input_file.name)
+        self.assertEqual(exit_code, 1)
+        self.assertEqual(output.getvalue().splitlines(), self.expected)
+
+    def test_main_single_expression(self):
+        output = io.StringIO()
+        with redirect_stdout(output):
+            self.assertEqual(main(["1/2", "+", "1/4"]), 0)
+            self.assertEqual(main(["1/2", "+"]), 1)
+            self.assertEqual(main(["--help"]), 0)
+        self.assertTrue(output.getvalue().startswith("3/4\n"))
+
+
+class ColumnsTest(unittest.TestCase):
+    rows = 'a,b,c,name\n1/2,3,1_1/4,x\n\n-2/3,3/4,0,"q, r"\n1,0\n5/6,x/y,1,z\n'
+    expected = [
+        "a,b,c,name,result",
+        "1/2,3,1_1/4,x,2_3/4",
+        "",
+        '-2/3,3/4,0,"q, r",-1/2',
+        "1,0,error: Row has 2 columns, expression reads column 3",
+        "5/6,x/y,1,z,error: Invalid fraction input: x/y",
+    ]
+
+    def setUp(self):
+        with tempfile.NamedTemporaryFile("w", suffix=".csv", delete=False) as input_file:
+            input_file.write(self.rows)
+        self.path = input_file.name
+        self.addCleanup(os.remove, self.path)
+
+    def test_compile_columns(self):
+        program, columns = fractulator.compile_columns("($3 - 1/2) * $1 ** 2")
+        self.assertEqual(columns, (0, 2))
+        self.assertEqual(program.evaluate([Fraction(3), Fraction(1)]), Fraction(9, 2))
+        for bad in ("$0 + 1", "a * $1"):
+            with self.assertRaises(ValueError):
+                fractulator.compile_columns(bad)
+
+    def test_evaluate_columns(self):
+        output = io.StringIO()
+        errors = fractulator.evaluate_columns(self.path, output, "$1 * $2 + $3", header=True)
+        self.assertEqual(errors, 2)
+        self.assertEqual(output.getvalue().splitlines(), self.expected)
+
+    def test_evaluate_columns_parallel(self):
+        output = io.StringIO()
+        errors = fractulator.evaluate_columns(
+            self.path, output, "$1 * $2 + $3", header=True, jobs=2, chunk_size=2
+        )
+        self.assertEqual(errors, 2)
+        self.assertEqual(output.getvalue().splitlines(), self.expected)
+
+    def test_evaluate_columns_tsv(self):
+        with tempfile.NamedTemporaryFile("w", suffix=".tsv", delete=False) as input_file:
+            input_file.write("1/2\t-1_1/2\r\n2\t3\n")
+        self.addCleanup(os.remove, input_file.name)
+        output = io.StringIO()
+        formatter = fractulator.fraction_formatter("improper")
+        errors = fractulator.evaluate_columns(
+            input_file.name, output, "-$2 / $1", formatter=formatter
+        )
+        self.assertEqual(errors, 0)
+        self.assertEqual(output.getvalue(), "1/2\t-1_1/2\t3\n2\t3\t-3/2\n")
+
+    def test_evaluate_columns_empty(self):
+        with tempfile.NamedTemporaryFile("w", suffix=".csv", delete=False) as input_file:
+            pass
+        self.addCleanup(os.remove, input_file.name)
+        output = io.StringIO()
+        self.assertEqual(fractulator.evaluate_columns(input_file.name, output, "$1"), 0)
+        self.assertEqual(output.getvalue(), "")
+
+    def test_main_columns(self):
+        output = io.StringIO()
+        with redirect_stdout(output):
+            exit_code = main(
+                ["--columns", "--header", "--delimiter", ",", "--expr", "$1 * $2 + $3", self.path]
+            )
+        self.assertEqual(exit_code, 1)
+        self.assertEqual(output.getvalue().splitlines(), self.expected)
+
+    def test_main_columns_bad_options(self):
+        output = io.StringIO()
+        with redirect_stdout(output):
+            self.assertEqual(main(["--columns", self.path]), 1)
+            self.assertEqual(main(["--columns", "--expr", "$0", self.path]), 1)
+            self.assertEqual(main(["--columns", "--delimiter", ";;", "--expr", "$1", self.path]), 1)
+            self.assertEqual(main(["--expr", "$1", "1"]), 1)
+        self.assertIn("--columns needs an --expr and a FILE", output.getvalue())
+        self.assertIn("Invalid column reference: $0", output.getvalue())
+        self.assertIn("--delimiter must be a single character", output.getvalue())
+        self.assertIn("can only be used with --columns", output.getvalue())
+
+
+class ServerTest(unittest.TestCase):
+    def start(self, address):
+        loop = asyncio.new_event_loop()
+        formatter = fractulator.fraction_formatter("improper")
+        server = loop.run_until_complete(start_server(address, formatter))
+        thread = threading.Thread(target=loop.run_forever)
+        thread.start()
+
+        def stop():
+            loop.call_soon_threadsafe(loop.stop)
+            thread.join()
+            server.close()
+            loop.run_until_complete(server.wait_closed())
+            loop.close()
+
+        self.addCleanup(stop)
+        return server
+
+    def test_parse_address(self):
+        self.assertEqual(parse_address("unix:f.sock"), ("unix", "f.sock"))
+        self.assertEqual(parse_address("/tmp/f.sock"), ("unix", "/tmp/f.sock"))
+        self.assertEqual(parse_address("7777"), ("tcp", ("127.0.0.1", 7777)))
+        self.assertEqual(parse_address("localhost:7777"), ("tcp", ("localhost", 7777)))
+        self.assertEqual(parse_address("[::1]:7777"), ("tcp", ("::1", 7777)))
+        for address in ("localhost:http", "0.0.0.0:7777", "192.168.1.2:7777", "example.com:7777"):
+            with self.assertRaises(ValueError):
+                parse_address(address)
+
+    def test_slow_request(self):
+        started = threading.Event()
+        release = threading.Event()
+        evaluate_line = fractulator.evaluate_line
+
+        def slow_evaluate_line(line, formatter):
+            if line == "2/3 * 3":
+                started.set()
+                release.wait(10)
+            return evaluate_line(line, formatter)
+
+        def slow_client():
+            responses.extend(fractulator_client.evaluate(address, ["2/3 * 3"]))
+
+        with mock.patch.object(fractulator, "evaluate_line", slow_evaluate_line):
+            address = str(self.start("127.0.0.1:0").sockets[0].getsockname()[1])
+            responses = []
+            thread = threading.Thread(target=slow_client)
+            thread.start()
+            self.assertTrue(started.wait(10))
+            self.assertEqual(fractulator_client.evaluate(address, ["1/2 + 1/3"]), ["5/6"])
+            self.assertFalse(responses)
+            release.set()
+            thread.join()
+        self.assertEqual(responses, ["2"])
+
+    def test_default_bit_limit(self):
+        limits = []
+
+        def serve(*arguments):
+            limits.append(fractulator.MAX_RESULT_BITS)
+
+        with mock.patch.object(fractulator, "serve", serve):
+            self.assertEqual(fractulator.main(["--serve", "7777"]), 0)
+            self.assertEqual(fractulator.main(["--serve", "7777", "--max-bits", "64"]), 0)
+        self.assertEqual(limits, [fractulator.SERVER_MAX_BITS, 64])
+        self.assertIsNone(fractulator.MAX_RESULT_BITS)
+
+    def test_tcp_pipelined(self):
+        server = self.start("127.0.0.1:0")
+        address = str(server.sockets[0].getsockname()[1])
+        expressions = ["1/2 + 1/3", "", "3 # 4", "2_1/2 * 2"] * 2000
+        responses = fractulator_client.evaluate(address, expressions)
+        error = "error: Invalid input: 3 # 4, # is not a valid operator"
+        self.assertEqual(responses[:4], ["5/6", "", error, "5"])
+        self.assertEqual(responses, responses[:4] * 2000)
+
+    @unittest.skipUnless(hasattr(socket, "AF_UNIX"), "Unix sockets are not supported")
+    def test_unix_client_main(self):
+        directory = tempfile.mkdtemp()
+        path = os.path.join(directory, "fractulator.sock")
+        self.start(path)
+        output = io.StringIO()
+        with redirect_stdout(output):
+            self.assertEqual(fractulator_client.main(["--server", path, "-4/3", "+", "1/2"]), 0)
+            self.assertEqual(fractulator_client.main(["--server", path, "4/3", "+"]), 1)
+        os.remove(path)
+        os.rmdir(directory)
+        error = "error: Invalid input: 4/3 +, incorrect number of operands"
+        self.assertEqual(output.getvalue(), f"-5/6\n{error}\n")
+
+    def test_client_without_address(self):
+        output = io.StringIO()
+        environment = os.environ.pop(fractulator_client.ADDRESS_VARIABLE, None)
+        try:
+            with redirect_stdout(output):
+                self.assertEqual(fractulator_client.main(["1/2"]), 2)
+        finally:
+            if environment is not None:
+                os.environ[fractulator_client.ADDRESS_VARIABLE] = environment
+
+    def test_client_unreachable(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(os.rmdir, directory)
+        output = io.StringIO()
+        with redirect_stdout(output):
+            path = os.path.join(directory, "missing.sock")
+            self.assertEqual(fractulator_client.main(["--server", path, "1/2"]), 2)
+            self.assertEqual(fractulator_client.main(["--server", "localhost:http", "1/2"]), 2)
+        self.assertEqual(len(output.getvalue().splitlines()), 2)
+        self.assertTrue(output.getvalue().startswith(f"Cannot reach the server at {path}: "))
+
+    def test_client_parse_address(self):
+        for address in ("unix:f.sock", "/tmp/f.sock", "7777", "localhost:7777", "[::1]:7777"):
+            self.assertEqual(fractulator_client.parse_address(address), parse_address(address))
+        with self.assertRaises(ValueError):
+            fractulator_client.parse_address("localhost:http")
+
+    def test_long_line(self):
+        address = str(self.start("127.0.0.1:0").sockets[0].getsockname()[1])
+        with mock.patch.object(fractulator, "SERVER_MAX_LINE_BYTES", 16):
+            with fractulator_client.connect(address) as connection:
+                connection.sendall(b"1/2 + 1/3\n" + b"1" * 100)
+                with connection.makefile("r") as responses:
+                    lines = responses.read().splitlines()
+        self.assertEqual(lines, ["5/6", "error: Request line exceeds 16 bytes"])
+
+    @unittest.skipUnless(hasattr(signal, "SIGTERM") and hasattr(socket, "AF_UNIX"), "Needs Unix")
+    def test_serve(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(os.rmdir, directory)
+        path = os.path.join(directory, "fractulator.sock")
+        for stop in (signal.SIGTERM, signal.SIGINT):
+            self.assertEqual(self.serve_once(path, stop), ["5/6", "2"])
+            self.assertFalse(os.path.exists(path))
+
+    def serve_once(self, path, stop):
+        responses = []
+
+        def client():
+            try:
+                for _ in range(500):
+                    try:
+                        connection = fractulator_client.connect(path)
+                        break
+                    except OSError:
+                        time.sleep(0.01)
+                with connection:
+                    connection.sendall(b"1/2 + 1/3\n2/3 * 3")
+                    connection.shutdown(socket.SHUT_WR)
+                    with connection.makefile("r") as lines:
+                        responses.extend(lines.read().splitlines())
+            finally:
+                os.kill(os.getpid(), stop)
+
+        thread = threading.Thread(target=client)
+        thread.start()
+        fractulator.serve(path, fractulator.fraction_formatter("improper"))
+        thread.join()
+        return responses
+
+
+class BitLimitTest(unittest.TestCase):
+    def tearDown(self):
+        fractulator.set_bit_limit(None)
+
+    def test_limit_denominator(self):
+        self.assertEqual(Fraction(355, 113).limit_denominator(100), Fraction(311, 99))
+        self.assertEqual(Fraction(-355, 113).limit_denominator(10), Fraction(-22, 7))
+        self.assertEqual(Fraction(3, 7).limit_denominator(7), Fraction(3, 7))
+        self.assertEqual(Fraction(7, 3).limit_denominator(1), Fraction(2))
+        cases = ((123456789, 987654321, 1000), (-10 ** 20 - 7, 3 ** 40, 10 ** 6), (1, 3, 2))
+        for n, d, limit in cases:
+            expected = fractions.Fraction(n, d).limit_denominator(limit)
+            result = Fraction(n, d).limit_denominator(limit)
+            self.assertEqual(
+                (result.numerator, result.denominator), (expected.numerator, expected.denominator)
+            )
+        with self.assertRaises(ValueError):
+            Fraction(1, 3).limit_denominator(0)
+
+    def test_raise(self):
+        fractulator.set_bit_limit(16)
+        self.assertEqual(Fraction(1, 255) * Fraction(1, 255), Fraction(1, 65025))
+        with self.assertRaises(OverflowError):
+            Fraction(1, 256) * Fraction(1, 257)
+        with self.assertRaises(OverflowError):
+            Fraction(70000) + Fraction(1)
+
+    def test_approximate(self):
+        fractulator.set_bit_limit(32, approximate=True)
+        total = Fraction(0)
+        expected = fractions.Fraction(0)
+        for k in range(1, 60):
+            total = total + Fraction(1, k)
+            expected += fractions.Fraction(1, k)
+        self.assertLessEqual(total.numerator.bit_length(), 32)
+        self.assertLessEqual(total.denominator.bit_length(), 32)
+        error = abs(fractions.Fraction(total.numerator, total.denominator) - expected)
+        self.assertLess(error, fractions.Fraction(1, 2 ** 28))
+        with self.assertRaises(OverflowError):
+            Fraction(2 ** 40) * Fraction(3)
+
+    def test_closest_within_limit(self):
+        fractulator.set_bit_limit(16, approximate=True)
+        result = Fraction(-269745808911) / Fraction(471254972560)
+        self.assertEqual(result, Fraction(-36744, 64193))
+        self.assertEqual(fractulator._closest_fraction(3, 7, 10), (3, 7))
+        rng = fractulator_bench.random.Random(5)
+        for _ in range(60):
+            bits = rng.choice((4, 6, 8))
+            largest = (1 << bits) - 1
+            fractulator.set_bit_limit(bits, approximate=True)
+            value = fractions.Fraction(rng.randint(-10 ** 12, 10 ** 12), rng.randint(1, 10 ** 12))
+            candidates = [
+                fractions.Fraction(p, q)
+                for q in range(1, largest + 1)
+                for p in (value.numerator * q // value.denominator + offset for offset in (0, 1))
+                if abs(p) <= largest
+            ]
+            best = min(abs(value - candidate) for candidate in candidates)
+            try:
+                result = Fraction(value.numerator) / Fraction(value.denominator)
+            except OverflowError:
+                self.assertGreater(abs(value), largest)
+                continue
+            result = fractions.Fraction(result.numerator, result.denominator)
+            self.assertEqual(abs(value - result), best)
+
+    def test_approximate_power(self):
+        fractulator.set_bit_limit(16, approximate=True)
+        exact = fractions.Fraction(1001, 1000) ** 5000
+        result = Fraction(1001, 1000) ** 5000
+        fractulator.set_bit_limit(None)
+        expected = fractulator._closest_fraction(exact.numerator, exact.denominator, 65535, 65535)
+        self.assertEqual((result.numerator, result.denominator), expected)
+
+        fractulator.set_bit_limit(16, approximate=True)
+        with mock.patch.object(fractulator, "EXACT_POWER_BITS", 0):
+            result = Fraction(1001, 1000) ** 5000
+        self.assertLessEqual(result.numerator.bit_length(), 16)
+        self.assertLessEqual(result.denominator.bit_length(), 16)
+        error = fractions.Fraction(result.numerator, result.denominator) / exact - 1
+        self.assertLess(abs(error), fractions.Fraction(1, 1000))
+        fractulator.set_bit_limit(16)
+        with self.assertRaises(OverflowError):
+            Fraction(1001, 1000) ** 5000
+
+    def test_lazy_reduction(self):
+        lazy = fractulator.LAZY_REDUCTION
+        fractulator.LAZY_REDUCTION = True
+        try:
+            fractulator.set_bit_limit(8)
+            self.assertEqual(Fraction(100, 3) * Fraction(3, 100), Fraction(1))
+            with self.assertRaises(OverflowError):
+                Fraction(1, 100) / Fraction(100)
+        finally:
+            fractulator.LAZY_REDUCTION = lazy
+
+    def test_result_cache_cleared(self):
+        clear_caches()
+        self.assertEqual(parse_command_line(["1/255 * 1/257"]), Fraction(1, 65535))
+        fractulator.set_bit_limit(16, approximate=True)
+        self.assertEqual(parse_command_line(["1/255 * 1/257"]), Fraction(1, 65535))
+        fractulator.set_bit_limit(15, approximate=True)
+        self.assertEqual(parse_command_line(["1/255 * 1/257"]), Fraction(0))
+        with self.assertRaises(ValueError):
+            fractulator.set_bit_limit(0)
+
+    def test_command_line(self):
+        output = io.StringIO()
+        with redirect_stdout(output):
+            expression = ["1000001/999999", "*", "355/113"]
+            self.assertEqual(main(["--max-bits", "16", "--approximate"] + expression), 0)
+            self.assertEqual(main(["--max-bits", "16"] + expression), 1)
+            self.assertEqual(main(["--approximate", "1/2"]), 1)
+        self.assertTrue(output.getvalue().startswith("3_997/7041\n"))
+        self.assertIn("exceeds the 16 bit limit", output.getvalue())
+        self.assertIn("--approximate can only be used with --max-bits", output.getvalue())
+        self.assertIsNone(fractulator.MAX_RESULT_BITS)
+
+    def test_batch(self):
+        fractulator.set_bit_limit(16)
+        output = io.StringIO()
+        self.assertEqual(run_batch(io.StringIO("1/256 * 1/257\n1/2 + 1/3\n"), output), 1)
+        self.assertEqual(output.getvalue(), "error: Result exceeds the 16 bit limit\n5/6\n")
+
+    @unittest.skipIf(sys.version_info < (3, 7), "ProcessPoolExecutor takes mp_context from 3.7")
+    def test_spawned_workers(self):
+        context = multiprocessing.get_context("spawn")
+        fractulator.set_bit_limit(16)
+
+        def process_pool(jobs):
+            return ProcessPoolExecutor(jobs, context)
+
+        with mock.patch.object(fractulator, "_process_pool", process_pool):
+            lines = ["1/3 ** 40", "1/2 + 1/3"]
+            results = list(fractulator.evaluate_lines_parallel(lines, jobs=2, chunk_size=1))
+            rows = list(fractulator._evaluate_rows_parallel(
+                [[b"1/3\t40"]], fractulator.compile_columns("$1 ** $2"), "\t", 1
+            ))
+        self.assertEqual(results, ["error: Result exceeds the 16 bit limit", "5/6"])
+        self.assertEqual(rows, [([b"1/3\t40"], ["error: Result exceeds the 16 bit limit"])])
+
+
+class InstrumentationTest(unittest.TestCase):
+    def tearDown(self):
+        fractulator.disable_stats()
+
+    def test_disabled_by_default(self):
+        gcf_function = fractulator.gcf
+        init = Fraction.__dict__["__init__"]
+        self.assertIsNone(fractulator.stats_snapshot())
+        fractulator.enable_stats()
+        self.assertIsNot(fractulator.gcf, gcf_function)
+        fractulator.disable_stats()
+        self.assertIs(fractulator.gcf, gcf_function)
+        self.assertIs(Fraction.__dict__["__init__"], init)
+        self.assertIsNone(fractulator.stats_snapshot())
+
+    def test_counters(self):
+        clear_caches()
+        fractulator.enable_stats()
+        self.assertEqual(fractulator.parse_command_line(["1/2 + 3_1/4 * 5"]), Fraction(67, 4))
+        Fraction(6, 4).simplified()
+        snapshot = fractulator.stats_snapshot()
+        self.assertGreater(snapshot["gcf"]["calls"], 0)
+        self.assertGreater(snapshot["fractions"], 0)
+        self.assertEqual(snapshot["calls"]["simplified"], 1)
+        self.assertEqual(snapshot["parse_command_line"]["calls"], 1)
+        self.assertEqual(snapshot["parse_command_line"]["evaluations"], 1)
+        self.assertGreater(snapshot["parse_command_line"]["parse_seconds"], 0)
+
+        fractulator.reset_stats()
+        fractulator.parse_command_line(["1/2 + 3_1/4 * 5"])
+        snapshot = fractulator.stats_snapshot()
+        self.assertEqual(snapshot["parse_command_line"]["calls"], 1)
+        self.assertEqual(snapshot["parse_command_line"]["evaluations"], 0)
+
+    def test_euclid_steps(self):
+        native = fractulator.USE_NATIVE_GCD
+        fractulator.USE_NATIVE_GCD = False
+        try:
+            fractulator.enable_stats()
+            self.assertEqual(fractulator.gcf(21, -13), 1)
+            self.assertEqual(fractulator.gcf(2 ** 100, 6), 2)
+        finally:
+            fractulator.USE_NATIVE_GCD = native
+        snapshot = fractulator.stats_snapshot()["gcf"]
+        self.assertEqual(snapshot["calls"], 2)
+        self.assertEqual(snapshot["max_bits"], 101)
+        self.assertEqual(snapshot["bits"], {8: 1, 128: 1})
+        self.assertEqual(snapshot["max_steps"], 6)
+
+    def test_command_line_stats(self):
+        output = io.StringIO()
+        errors = io.StringIO()
+        with redirect_stdout(output), redirect_stderr(errors):
+            self.assertEqual(main(["--stats", "1/2", "+", "1/3"]), 0)
+        self.assertEqual(output.getvalue(), "5/6\n")
+        self.assertIn("gcf calls:", errors.getvalue())
+        self.assertIn("parse_command_line calls: 1", errors.getvalue())
+        self.assertIsNone(fractulator.stats_snapshot())
+
+    def test_worker_stats(self):
+        clear_caches()
+        fractulator.enable_stats()
+        lines = ["1/2 + 1/3", "1/7 * 3", "", "3_1/4 - 1/4"]
+        results = list(fractulator.evaluate_lines_parallel(lines, 2, 1))
+        self.assertEqual(results, ["5/6", "3/7", "", "3"])
+
+        snapshot = fractulator.stats_snapshot()
+        self.assertGreater(snapshot["gcf"]["calls"], 0)
+        self.assertGreater(snapshot["fractions"], 0)
+        self.assertEqual(snapshot["parse_command_line"]["calls"], 3)
+        self.assertGreater(snapshot["parse_command_line"]["parse_seconds"], 0)
+
+        fractulator.reset_stats()
+        rows = list(fractulator._evaluate_rows_parallel(
+            [[b"1,2"], [b"3,4"]], fractulator.compile_columns("$1 / $2"), ",", 2
+        ))
+        self.assertEqual(rows, [([b"1,2"], [(1, 2)]), ([b"3,4"], [(3, 4)])])
+        self.assertGreater(fractulator.stats_snapshot()["fractions"], 0)
+
+
+class BenchmarkTest(unittest.TestCase):
+    def test_suite_cases(self):
+        suite = fractulator_bench.build_suite(fractulator_bench.random.Random(0))
+        for name, func, reference in suite:
+            if reference is not None and name != "str":
+                ours, theirs = func(), reference()
+                if isinstance(ours, list):
+                    ours = [(value.numerator, value.denominator) for value in ours]
+                    theirs = [(value.numerator, value.denominator) for value in theirs]
+                elif isinstance(ours, Fraction):
+                    ours = (ours.numerator, ours.denominator)
+                    theirs = (theirs.numerator, theirs.denominator)
+                self.assertEqual(ours, theirs, name)
+
+    def test_run_suite_restores_caches(self):
+        before = cache_stats()
+        results = fractulator_bench.run_suite([("gcf", lambda: gcf(12, 18), None)])
+        self.assertEqual(
+            set(results["gcf"]), {"ops_per_sec", "reference_ops_per_sec", "peak_bytes"}
+        )
+        self.assertIsNone(results["gcf"]["reference_ops_per_sec"])
+        self.assertEqual(
+            {name: stats["capacity"] for name, stats in cache_stats().items()},
+            {name: stats["capacity"] for name, stats in before.items()},
+        )
+
+    def test_measure_matrix(self):
+        results = fractulator_bench.measure_matrix(4, fractulator_bench.random.Random(0))
+        self.assertEqual([name for name, _, _ in results],
+                         ["solve 4x4", "determinant 4x4", "inverse 4x4", "product 4x4"])
+        self.assertIsNotNone(results[0][2])
+
+    def test_find_regressions(self):
+        baseline = {"gcf": {"ops_per_sec": 1000.0}, "lcm": {"ops_per_sec": 1000.0}}
+        results = {
+            "gcf": {"ops_per_sec": 850.0},
+            "lcm": {"ops_per_sec": 700.0},
+            "new": {"ops_per_sec": 1.0},
+        }
+        regressions = fractulator_bench.find_regressions(results, baseline, 0.2)
+        self.assertEqual(regressions, [("lcm", 1000.0, 700.0)])
+        self.assertEqual(fractulator_bench.find_regressions(results, baseline, 0.5), [])
+
+
 if __name__ == "__main__":
     unittest.main()